@@ -3,6 +3,13 @@ ASGI config for acadegrade project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The API views are ``async def``, so under ASGI one worker keeps serving
+while requests wait on the database, Firebase or SMTP; ``procfile.asgi``
+runs it with uvicorn in place of the gunicorn ``procfile``. The
+/api/events/ stream needs ASGI (LIVE_EVENTS, set here, offers it to the
+dashboard) and a single worker while acadegradecore.events is
+in-process. Compare the two deployments with ``manage.py bench_api``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +19,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'acadegrade.settings')
+os.environ.setdefault('LIVE_EVENTS', 'True')
 
 application = get_asgi_application()
@@ -56,6 +56,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'acadegradecore.middleware.ProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -113,6 +114,42 @@ EMAIL_HOST_USER = config("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Verified Firebase ID tokens and Google's token-signing certificates can
+# be shared between workers, and kept across restarts, in a file cache (see
+# acadegradecore.tokens). Off unless FIREBASE_CACHE_DIR names a directory
+# only this app can write to: the cache holds pickles that are trusted as
+# verified claims. FIREBASE_CACHE may instead name another cache alias.
+FIREBASE_CACHE_DIR = config("FIREBASE_CACHE_DIR", default="")
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+}
+if FIREBASE_CACHE_DIR:
+    CACHES["firebase"] = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": FIREBASE_CACHE_DIR,
+    }
+FIREBASE_CACHE = config("FIREBASE_CACHE", default="firebase" if FIREBASE_CACHE_DIR else "")
+
+# Rendered PDF transcripts, one file per sheet version (see
+# acadegradecore.transcripts). Cached files are served as they are, so keep
+# it out of shared temp dirs; point it at shared storage when workers run
+# on several hosts.
+TRANSCRIPT_CACHE_DIR = config("TRANSCRIPT_CACHE_DIR", default=os.path.join(BASE_DIR, "transcript-cache"))
+
+# Processes rendering transcripts for the PDF job and bulk ZIP endpoints
+# (see acadegradecore.jobs); started on first use. Each web worker process
+# has its own pool, so N web workers may run N x RENDER_WORKERS renderers.
+RENDER_WORKERS = config("RENDER_WORKERS", default=2, cast=int)
+
+# The dashboard's live updates (/api/events/) hold a connection open per
+# tab, so they are only offered when served by acadegrade.asgi, which
+# turns this on; under gunicorn's sync workers each tab would hold a worker.
+LIVE_EVENTS = config("LIVE_EVENTS", default=False, cast=bool)
+
+# Threads the async views hand blocking calls to (Firebase token checks,
+# SMTP sends, PDF rendering); see acadegradecore.offload.
+BLOCKING_POOL_SIZE = config("BLOCKING_POOL_SIZE", default=8, cast=int)
+
 # firebase integration
 def firebase_config(request):
     return {
@@ -172,25 +209,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 # -------------------------------------------------------------------
-# 🔥 Firebase Admin SDK Initialization
+# 🔥 Firebase Admin SDK
 # -------------------------------------------------------------------
-import json
-import firebase_admin
-from firebase_admin import credentials
-
-FIREBASE_APP = None  # global handle
-
-if not firebase_admin._apps:
-    raw_service_account = config("FIREBASE_SERVICE_ACCOUNT", default=None)
-    if raw_service_account:
-        try:
-            service_account_info = json.loads(raw_service_account)
-            cred = credentials.Certificate(service_account_info)
-            FIREBASE_APP = firebase_admin.initialize_app(cred)
-            print("✅ Firebase Admin initialized")
-        except Exception as e:
-            print("❌ Firebase initialization failed:", e)
-    else:
-        print("⚠️ FIREBASE_SERVICE_ACCOUNT not found in environment")
-else:
-    FIREBASE_APP = firebase_admin.get_app()
\ No newline at end of file
+# Service account JSON. acadegradecore.firebase initializes the Admin SDK
+# from it on the first token verification, so management commands,
+# migrations and worker boot do not import firebase_admin.
+FIREBASE_SERVICE_ACCOUNT = config("FIREBASE_SERVICE_ACCOUNT", default=None)
@@ -32,16 +32,27 @@ urlpatterns = [
 
     # API endpoints
     path("api/create-sheet/", views.create_sheet, name="create_sheet"),
+    path("api/create-sheets/", views.create_sheets, name="create_sheets"),
     path("api/delete-sheet/<int:sheet_id>/", views.delete_sheet, name="delete_sheet"),
     path("api/update-sheet/<int:sheet_id>/", views.update_sheet, name="update_sheet"),
     # path("api/sheet/<int:sheet_id>/", views.sheet_detail_api, name="sheet_detail_api"),
     path("api/sheet/<int:sheet_id>/", views.sheet_detail, name="sheet_detail"),
     path("api/list-sheets/", views.list_sheets, name="list_sheets"),   # ✅ new
+    path("api/events/", views.user_events, name="user_events"),
+    path("api/grading-scales/", views.list_grading_scales, name="list_grading_scales"),
     path("api/add-course/", views.add_course, name="add_course"),
     path("api/course/<int:course_id>/", views.course_detail, name="course_detail"),
     path("api/update-course/<int:course_id>/", views.update_course, name="update_course"),
     path("api/delete-course/<int:course_id>/", views.delete_course, name="delete_course"),
     path("api/sheet/<int:sheet_id>/pdf/", views.export_pdf, name="export_pdf"),
+    path("api/sheet/<int:sheet_id>/pdf/jobs/", views.start_pdf_job, name="start_pdf_job"),
+    path("api/sheet/<int:sheet_id>/pdf/jobs/<int:version>/", views.pdf_job_status, name="pdf_job_status"),
+    path("api/export-pdfs/", views.export_pdfs, name="export_pdfs"),
+    path("api/export-results/<str:fmt>/", views.export_results, name="export_results"),
+    path("api/sheet/<int:sheet_id>/results/<str:fmt>/", views.export_results, name="export_sheet_results"),
+    path("api/broadsheet/<str:fmt>/", views.broadsheet_report, name="broadsheet_report"),
+    path("api/sheet/<int:sheet_id>/mutate/", views.mutate_sheet, name="mutate_sheet"),
+    path("api/sheet/<int:sheet_id>/changes/", views.sheet_changes, name="sheet_changes"),
     path('api/semester/<int:semester_id>/courses/', views.get_semester_courses, name='get_semester_courses'),
     path('api/batch-add-courses/', views.batch_add_courses, name='batch_add_courses'),
 ]
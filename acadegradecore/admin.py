@@ -1,6 +1,9 @@
 from django.contrib import admin
+from django.utils.html import format_html, format_html_join
 from .models import ContactMessage
 from .models import UserProfile, ResultSheet, Year, Semester, Course
+from .models import GradingScale, GradeBand
+from . import snapshot
 
 # Register your models here.
 @admin.register(ContactMessage)
@@ -12,7 +15,77 @@ class ContactMessageAdmin(admin.ModelAdmin):
 
 
 admin.site.register(UserProfile)
-admin.site.register(ResultSheet)
-admin.site.register(Year)
-admin.site.register(Semester)
+
+
+class GradeBandInline(admin.TabularInline):
+    model = GradeBand
+    extra = 0
+
+
+@admin.register(GradingScale)
+class GradingScaleAdmin(admin.ModelAdmin):
+    list_display = ("name", "description", "updated_at")
+    inlines = [GradeBandInline]
+
+
+@admin.register(ResultSheet)
+class ResultSheetAdmin(admin.ModelAdmin):
+    list_display = ("student_name", "university", "department", "entry_year", "cgpa")
+    list_filter = ("grading_scale",)
+    search_fields = ("student_name", "university", "department")
+    readonly_fields = ("transcript",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_cgpa()
+
+    @admin.display(description="Transcript")
+    def transcript(self, obj):
+        if obj.pk is None:
+            return "-"
+        snap = snapshot.load(obj.pk)
+        lines = format_html_join("", "<li>{} {}: {} courses, {} credits, GPA {}</li>", (
+            (year.year_label, sem.label, len(sem.courses), sem.total_credits, f"{sem.gpa:.2f}")
+            for year in snap.years for sem in year.semesters
+        ))
+        return format_html("<ul>{}</ul><strong>CGPA {}</strong>", lines, f"{snap.cgpa:.2f}")
+
+    @admin.display(description="CGPA")
+    def cgpa(self, obj):
+        return obj.cgpa
+
+
+@admin.register(Year)
+class YearAdmin(admin.ModelAdmin):
+    list_display = ("year_label", "sheet", "year_gpa")
+    list_select_related = ("sheet",)
+
+    def get_readonly_fields(self, request, obj=None):
+        # Year.save() refuses to move a year to another sheet.
+        return ("sheet",) if obj else ()
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_gpa()
+
+    @admin.display(description="Year GPA")
+    def year_gpa(self, obj):
+        return obj.year_gpa
+
+
+@admin.register(Semester)
+class SemesterAdmin(admin.ModelAdmin):
+    list_display = ("label", "year", "gpa")
+    list_select_related = ("year__sheet",)
+
+    def get_readonly_fields(self, request, obj=None):
+        # Semester.save() refuses to move a semester to another year.
+        return ("year",) if obj else ()
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_gpa()
+
+    @admin.display(description="GPA")
+    def gpa(self, obj):
+        return obj.gpa
+
+
 admin.site.register(Course)
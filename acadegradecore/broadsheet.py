@@ -0,0 +1,89 @@
+"""
+Class broadsheets: one row per student with the grade of each course code,
+a GPA per semester and the CGPA, read from the stored rollups in one pass.
+"""
+import tempfile
+from collections import namedtuple
+
+from . import grading
+from .exports import CHUNK_SIZE
+from .models import Course, Semester, _gpa
+
+# Rendered PDFs larger than this are spilled to disk.
+SPOOL_BYTES = 8 * 2 ** 20
+
+_VALUES = (
+    "sheet_id", "sheet__student_name", "sheet__total_points", "sheet__total_credits",
+    "sheet__grading_scale_id", "semester__year__index", "semester__index",
+    "semester__total_points", "semester__total_credits", "code", "incourse", "exam",
+)
+
+
+class Layout(namedtuple("Layout", ("codes", "semesters"))):
+    """Course codes, and (year index, semester index) of each GPA column."""
+    __slots__ = ()
+
+    @property
+    def columns(self):
+        return (
+            "Student", *self.codes,
+            *(f"GPA Y{year}S{sem}" for year, sem in self.semesters), "CGPA",
+        )
+
+
+def layout(**filters):
+    codes = (
+        Course.objects.filter(**filters).exclude(code="")
+        .order_by("code").values_list("code", flat=True).distinct()
+    )
+    semesters = (
+        Semester.objects.filter(**filters)
+        .order_by("year__index", "index").values_list("year__index", "index").distinct()
+    )
+    return Layout(tuple(codes), tuple(semesters))
+
+
+def rows(layout, chunk_size=CHUNK_SIZE, **filters):
+    """The broadsheet rows, layout.columns long, of the sheets matching `filters`, by student name."""
+    first_gpa = 1 + len(layout.codes)
+    column = {code: i for i, code in enumerate(layout.codes, start=1)}
+    column.update({sem: i for i, sem in enumerate(layout.semesters, start=first_gpa)})
+    width = len(layout.columns)
+    tables = grading.all_tables()
+
+    courses = (
+        Course.objects.filter(**filters)
+        .order_by("sheet__student_name", "sheet_id", "semester__year__index", "semester__index", "id")
+        .values_list(*_VALUES)
+    )
+    row = current = None
+    for (sheet_id, name, points, credits, scale_id, year, sem,
+         sem_points, sem_credits, code, incourse, exam) in courses.iterator(chunk_size=chunk_size):
+        if sheet_id != current:
+            if row is not None:
+                yield row
+            current = sheet_id
+            row = [name] + [""] * (width - 1)
+            row[-1] = f"{_gpa(points, credits):.2f}"
+            table = tables.get(scale_id, grading.DEFAULT_TABLE)
+        # Codes and semesters missing from the layout were added after it was read.
+        if code in column:
+            row[column[code]] = table.lookup(incourse + exam)[0]
+        if (year, sem) in column:
+            row[column[year, sem]] = f"{_gpa(sem_points, sem_credits):.2f}"
+    if row is not None:
+        yield row
+
+
+def render_pdf(title, layout, rows):
+    """
+    The broadsheet PDF of `rows`, in a temporary file opened for reading.
+    `rows` is read as the tables are laid out, so when it is rows() this
+    queries the database.
+    """
+    from .pdf import render_broadsheet
+
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    render_broadsheet(title, layout.columns, rows, out)
+    out.seek(0)
+    return out
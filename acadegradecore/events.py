@@ -0,0 +1,55 @@
+"""
+In-process fan-out of committed sheet changes to the Server-Sent Events
+streams of views.user_events; only writes served by this process are heard.
+"""
+import asyncio
+import threading
+
+from django.db import transaction
+
+# A subscriber this many events behind gets one "resync" instead.
+QUEUE_SIZE = 100
+RESYNC = {"type": "resync"}
+
+_lock = threading.Lock()
+_subscribers = {}   # owner_id -> {queue: loop}
+
+
+def subscribe(owner_id):
+    """A queue of this user's events; call from the event loop that reads it."""
+    queue = asyncio.Queue(QUEUE_SIZE)
+    with _lock:
+        _subscribers.setdefault(owner_id, {})[queue] = asyncio.get_running_loop()
+    return queue
+
+
+def unsubscribe(owner_id, queue):
+    with _lock:
+        queues = _subscribers.get(owner_id, {})
+        queues.pop(queue, None)
+        if not queues:
+            _subscribers.pop(owner_id, None)
+
+
+def _deliver(queue, event):
+    # Runs on the subscriber's loop.
+    if queue.full():
+        while not queue.empty():
+            queue.get_nowait()
+        event = RESYNC
+    queue.put_nowait(event)
+
+
+def publish(owner_id, event):
+    """Send `event` (a JSON-able dict) to every open stream of the user."""
+    with _lock:
+        targets = list(_subscribers.get(owner_id, {}).items())
+    for queue, loop in targets:
+        try:
+            loop.call_soon_threadsafe(_deliver, queue, event)
+        except RuntimeError:
+            pass   # loop closed; the stream's finally will unsubscribe
+
+
+def publish_on_commit(owner_id, event):
+    transaction.on_commit(lambda: publish(owner_id, event))
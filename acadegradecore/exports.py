@@ -0,0 +1,293 @@
+"""
+Streamed downloads: course results as CSV, NDJSON or XLSX, read with
+QuerySet.iterator() and encoded as they arrive, and the ZIP container.
+"""
+import csv
+import json
+import re
+import shutil
+import zipfile
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+from . import grading
+from .models import Course
+
+CHUNK_SIZE = 2000
+FLUSH_BYTES = 64 * 1024
+
+COLUMNS = (
+    "sheet_id", "student_name", "university", "faculty", "department", "entry_year",
+    "year", "year_label", "semester", "semester_label",
+    "code", "title", "credit_unit", "incourse", "exam", "score", "grade", "grade_point",
+)
+# COLUMNS up to "exam", then the scale that grades the row.
+_VALUES = (
+    "sheet_id", "sheet__student_name", "sheet__university", "sheet__faculty", "sheet__department",
+    "sheet__entry_year", "semester__year__index", "semester__year__year_label",
+    "semester__index", "semester__label",
+    "code", "title", "credit_unit", "incourse", "exam", "sheet__grading_scale_id",
+)
+
+
+def courses(**filters):
+    """The export rows of the courses matching `filters`, in transcript order."""
+    return (
+        Course.objects.filter(**filters)
+        .order_by("sheet_id", "semester__year__index", "semester__index", "id")
+        .values_list(*_VALUES)
+    )
+
+
+def _graded(row, tables):
+    *values, scale_id = row
+    score = row[13] + row[14]
+    grade, point = tables.get(scale_id, grading.DEFAULT_TABLE).lookup(score)
+    return (*values, score, grade, point)
+
+
+def results(queryset, chunk_size=CHUNK_SIZE):
+    """The graded rows of `queryset` (from courses()), COLUMNS long."""
+    tables = grading.all_tables()
+    for row in queryset.iterator(chunk_size=chunk_size):
+        yield _graded(row, tables)
+
+
+def encode(writer, rows):
+    """Bytes of `rows` written by `writer`, FLUSH_BYTES or so at a time."""
+    for row in rows:
+        writer.write(row)
+        if writer.pending() >= FLUSH_BYTES:
+            yield writer.drain()
+    writer.close()
+    yield writer.drain()
+
+
+async def aencode(writer, rows, chunk_size=CHUNK_SIZE):
+    """
+    encode() for async callers. `rows` may query the database, so it is
+    advanced chunk_size rows at a time in the connection's thread.
+    (QuerySet.aiterator() would not do: for values_list() querysets it
+    runs the query on the event loop's thread.)
+    """
+    next_chunk = sync_to_async(lambda: list(islice(rows, chunk_size)))
+    while chunk := await next_chunk():
+        for row in chunk:
+            writer.write(row)
+        if writer.pending() >= FLUSH_BYTES:
+            yield writer.drain()
+    writer.close()
+    yield writer.drain()
+
+
+def stream(fmt, queryset, chunk_size=CHUNK_SIZE):
+    """Bytes of `queryset` (from courses()) encoded as FORMATS[fmt]."""
+    return encode(FORMATS[fmt](), results(queryset, chunk_size))
+
+
+class _Buffer:
+    """Bytes written so far, handed on by drain()."""
+
+    def __init__(self):
+        self._chunks = []
+        self._size = 0
+
+    def _emit(self, data):
+        self._chunks.append(data)
+        self._size += len(data)
+
+    def pending(self):
+        return self._size
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self._size = 0
+        return data
+
+
+class ZipStream(_Buffer):
+    """
+    Write-only ZIP built for streaming: add() or open() a member, then
+    drain() the bytes written so far. zipfile sees an unseekable file and
+    writes each member's sizes after its data, so nothing has to be
+    rewritten later. Members are stored unless `compression` says otherwise.
+    """
+
+    def __init__(self, compression=zipfile.ZIP_STORED):
+        super().__init__()
+        self._offset = 0
+        self._zip = zipfile.ZipFile(self, "w", compression)
+
+    # The file object zipfile writes to.
+    def write(self, data):
+        self._emit(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def open(self, name):
+        """A member opened for writing; close it before the next one."""
+        return self._zip.open(name, "w")
+
+    def add(self, name, source):
+        with source, self.open(name) as member:
+            shutil.copyfileobj(source, member)
+
+    def writestr(self, name, data):
+        self._zip.writestr(name, data)
+
+    def close(self):
+        self._zip.close()
+
+
+class _TextSink:
+    """The file object csv.writer writes to."""
+
+    def __init__(self, emit):
+        self._emit = emit
+
+    def write(self, text):
+        self._emit(text.encode())
+
+
+class CsvWriter(_Buffer):
+    content_type = "text/csv; charset=utf-8"
+
+    def __init__(self, columns=COLUMNS):
+        super().__init__()
+        self._csv = csv.writer(_TextSink(self._emit))
+        self._csv.writerow(columns)
+
+    def write(self, row):
+        self._csv.writerow(row)
+
+    def close(self):
+        pass
+
+
+class NdjsonWriter(_Buffer):
+    content_type = "application/x-ndjson"
+
+    def __init__(self, columns=COLUMNS):
+        super().__init__()
+        self._columns = columns
+
+    def write(self, row):
+        self._emit(json.dumps(dict(zip(self._columns, row)), cls=DjangoJSONEncoder).encode() + b"\n")
+
+    def close(self):
+        pass
+
+
+_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_RELS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_DOC_RELS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+# Characters XML 1.0 cannot carry at all.
+_ILLEGAL_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+class XlsxWriter:
+    """
+    The smallest SpreadsheetML package Excel and LibreOffice open: inline
+    strings, no styles. Rows go straight into the open worksheet member
+    of a deflated ZipStream; past Excel's row limit a new worksheet is
+    started. The workbook parts are written last, once the sheets are known.
+    """
+    content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    MAX_ROWS = 1048576
+
+    def __init__(self, columns=COLUMNS, title="Results"):
+        self._columns = columns
+        self._title = title
+        self._zip = ZipStream(zipfile.ZIP_DEFLATED)
+        self._sheets = 0
+        self._start_sheet()
+
+    def _start_sheet(self):
+        self._sheets += 1
+        self._rows = 0
+        self._member = self._zip.open(f"xl/worksheets/sheet{self._sheets}.xml")
+        self._member.write(f'{_XML}<worksheet xmlns="{_MAIN}"><sheetData>'.encode())
+        self._write_row(self._columns)
+
+    def _end_sheet(self):
+        self._member.write(b"</sheetData></worksheet>")
+        self._member.close()
+
+    def _write_row(self, row):
+        self._rows += 1
+        cells = []
+        for value in row:
+            if value is None:
+                cells.append("<c/>")
+            elif isinstance(value, str):
+                text = escape(_ILLEGAL_XML.sub("", value))
+                cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+            else:
+                cells.append(f"<c><v>{value}</v></c>")
+        self._member.write(f'<row r="{self._rows}">{"".join(cells)}</row>'.encode())
+
+    def write(self, row):
+        if self._rows == self.MAX_ROWS:
+            self._end_sheet()
+            self._start_sheet()
+        self._write_row(row)
+
+    def close(self):
+        self._end_sheet()
+        sheets = range(1, self._sheets + 1)
+        title = escape(self._title, {'"': "&quot;"})
+        self._zip.writestr("[Content_Types].xml", (
+            f'{_XML}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            + "".join(
+                f'<Override PartName="/xl/worksheets/sheet{n}.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for n in sheets
+            )
+            + "</Types>"
+        ))
+        self._zip.writestr("_rels/.rels", (
+            f'{_XML}<Relationships xmlns="{_RELS}">'
+            f'<Relationship Id="rId1" Type="{_DOC_RELS}/officeDocument" Target="xl/workbook.xml"/>'
+            "</Relationships>"
+        ))
+        self._zip.writestr("xl/workbook.xml", (
+            f'{_XML}<workbook xmlns="{_MAIN}" xmlns:r="{_DOC_RELS}"><sheets>'
+            + "".join(
+                f'<sheet name="{title}{f" {n}" if n > 1 else ""}" sheetId="{n}" r:id="rId{n}"/>'
+                for n in sheets
+            )
+            + "</sheets></workbook>"
+        ))
+        self._zip.writestr("xl/_rels/workbook.xml.rels", (
+            f'{_XML}<Relationships xmlns="{_RELS}">'
+            + "".join(
+                f'<Relationship Id="rId{n}" Type="{_DOC_RELS}/worksheet" Target="worksheets/sheet{n}.xml"/>'
+                for n in sheets
+            )
+            + "</Relationships>"
+        ))
+        self._zip.close()
+
+    def pending(self):
+        return self._zip.pending()
+
+    def drain(self):
+        return self._zip.drain()
+
+
+FORMATS = {"csv": CsvWriter, "ndjson": NdjsonWriter, "xlsx": XlsxWriter}
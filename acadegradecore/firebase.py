@@ -0,0 +1,93 @@
+"""
+The Firebase Admin SDK, loaded on first use (by acadegradecore.tokens) so
+that django.setup() and the URLconf never import it.
+"""
+import json
+import threading
+from datetime import datetime, timezone
+
+import firebase_admin
+import requests
+from cachecontrol import CacheControl
+from cachecontrol.cache import BaseCache
+from django.conf import settings
+from firebase_admin import auth, credentials
+from google.auth.transport.requests import Request
+
+_lock = threading.Lock()
+_initialized = False
+_pinned = False
+
+
+def app():
+    """The default firebase_admin app, or None when it is not configured."""
+    global _initialized
+    with _lock:
+        if not _initialized:
+            _initialized = True
+            if firebase_admin._apps:
+                pass
+            elif not settings.FIREBASE_SERVICE_ACCOUNT:
+                print("⚠️ FIREBASE_SERVICE_ACCOUNT not found in environment")
+            else:
+                try:
+                    cred = credentials.Certificate(json.loads(settings.FIREBASE_SERVICE_ACCOUNT))
+                    firebase_admin.initialize_app(cred)
+                    print("✅ Firebase Admin initialized")
+                except Exception as e:
+                    print("❌ Firebase initialization failed:", e)
+    return firebase_admin.get_app() if firebase_admin._apps else None
+
+
+def verify_id_token(id_token, certificate_cache=None):
+    """
+    auth.verify_id_token() on the default app; raises whatever it raises.
+    `certificate_cache`, a Django cache, keeps Google's signing
+    certificates between processes (see _pin_certificates).
+    """
+    app()
+    if certificate_cache is not None:
+        _pin_certificates(certificate_cache)
+    return auth.verify_id_token(id_token)
+
+
+class CertificateCache(BaseCache):
+    """cachecontrol storage in a Django cache, so fetched certificates outlive the process."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def get(self, key):
+        return self.cache.get(f"firebase-certs:{key}")
+
+    def set(self, key, value, expires=None):
+        if isinstance(expires, datetime):
+            expires = (expires - datetime.now(timezone.utc)).total_seconds()
+        self.cache.set(f"firebase-certs:{key}", value, None if expires is None else max(int(expires), 1))
+
+    def delete(self, key):
+        self.cache.delete(f"firebase-certs:{key}")
+
+
+def _pin_certificates(cache):
+    # firebase_admin fetches the certificates through an in-memory
+    # CacheControl session; swap in one backed by the shared cache. It has
+    # no public hook for this, so leave it alone if its internals moved.
+    global _pinned
+    if _pinned:
+        return
+    with _lock:
+        if _pinned:
+            return
+        try:
+            fetch = auth._get_client(None)._token_verifier.request
+        except ValueError:   # no default app yet; try again next time
+            return
+        except Exception as e:
+            print("⚠️ Firebase certificates not pinned to the shared cache:", e)
+            fetch = None
+        if fetch is not None and hasattr(fetch, "_delegate") and hasattr(fetch, "_session"):
+            session = CacheControl(requests.Session(), cache=CertificateCache(cache))
+            fetch._session = session
+            fetch._delegate = Request(session)
+        _pinned = True
@@ -0,0 +1,87 @@
+"""
+Vectorized GPA computation for many sheets at once (department and
+institution reports): one query into a NumPy array, reduced with bincount.
+"""
+from collections import namedtuple
+
+import numpy as np
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+
+from . import grading
+from .models import Course
+
+ROW_DTYPE = np.dtype([
+    ("sheet_id", np.int64),
+    ("year_idx", np.int32),
+    ("sem_idx", np.int32),
+    ("credit_unit", np.int32),
+    ("incourse", np.int32),
+    ("exam", np.int32),
+    ("scale_id", np.int64),
+])
+
+BatchGpas = namedtuple("BatchGpas", ["semesters", "years", "sheets"])
+BatchGpas.__doc__ = """
+GPAs keyed by (sheet_id, year_idx, sem_idx), (sheet_id, year_idx) and
+sheet_id. Sheets without courses are absent; their GPA is 0.
+"""
+
+
+def load_rows(sheets=None, chunk_size=5000):
+    """Stream the course rows of `sheets` (a ResultSheet queryset, or all) into ROW_DTYPE."""
+    courses = Course.objects.all()
+    if sheets is not None:
+        courses = courses.filter(sheet__in=sheets)
+    rows = courses.values_list(
+        "sheet_id",
+        "semester__year__index",
+        "semester__index",
+        "credit_unit",
+        "incourse",
+        "exam",
+        Coalesce("sheet__grading_scale_id", Value(0)),
+    ).order_by()
+    return np.fromiter(rows.iterator(chunk_size=chunk_size), dtype=ROW_DTYPE)
+
+
+def grade_points(rows):
+    """Grade point of every row, graded on its sheet's scale."""
+    tables = grading.all_tables()
+    scale_ids = np.array([0, *tables], dtype=np.int64)
+    points = np.array(
+        [grading.DEFAULT_TABLE.exact_points, *(t.exact_points for t in tables.values())],
+        dtype=np.float64,
+    )
+    # Scales deleted since the tables were compiled grade on the default.
+    order = np.argsort(scale_ids)
+    pos = np.searchsorted(scale_ids, rows["scale_id"], sorter=order)
+    pos = np.clip(pos, 0, len(scale_ids) - 1)
+    table_idx = order[pos]
+    table_idx[scale_ids[table_idx] != rows["scale_id"]] = 0
+
+    scores = np.clip(rows["incourse"] + rows["exam"], 0, grading.MAX_SCORE)
+    return points[table_idx, scores]
+
+
+def _reduce(keys, points, credits):
+    groups, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.ravel()
+    group_points = np.bincount(inverse, weights=points, minlength=len(groups))
+    group_credits = np.bincount(inverse, weights=credits, minlength=len(groups))
+    result = {}
+    for key, p, c in zip(groups.tolist(), group_points.tolist(), group_credits.tolist()):
+        result[key] = round(p / c, 2) if c else 0
+    return result
+
+
+def compute_gpas(sheets=None, chunk_size=5000):
+    """Semester, year and cumulative GPAs for `sheets` (a ResultSheet queryset, or all)."""
+    rows = load_rows(sheets, chunk_size)
+    credits = rows["credit_unit"].astype(np.float64)
+    points = credits * grade_points(rows)
+
+    semesters = _reduce(rows[["sheet_id", "year_idx", "sem_idx"]], points, credits)
+    years = _reduce(rows[["sheet_id", "year_idx"]], points, credits)
+    cumulative = _reduce(rows["sheet_id"], points, credits)
+    return BatchGpas(semesters=semesters, years=years, sheets=cumulative)
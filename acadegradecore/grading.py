@@ -0,0 +1,106 @@
+"""
+Grading scales compiled into score-indexed lookup tables, cached per
+process (see all_tables()).
+"""
+import threading
+import time
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+
+MAX_SCORE = 100
+TABLE_TTL = 60   # seconds other workers may serve an edited scale
+
+# (min_score, grade, grade_point), highest band first: the Nigerian 5-point
+# scale used by sheets without a grading scale.
+DEFAULT_BANDS = (
+    (70, "A", 5),
+    (60, "B", 4),
+    (50, "C", 3),
+    (45, "D", 2),
+    (40, "E", 1),
+    (0, "F", 0),
+)
+
+
+def _number(point):
+    # Whole points stay ints so JSON reads 5, not 5.0 or "5.00".
+    return int(point) if point == int(point) else float(point)
+
+
+class GradeTable:
+    __slots__ = ("bands", "entries", "exact_points")
+
+    def __init__(self, bands):
+        self.bands = tuple(sorted(
+            ((int(m), g, Decimal(str(p))) for m, g, p in bands), reverse=True
+        ))
+        entries = []
+        exact_points = []
+        for score in range(MAX_SCORE + 1):
+            grade, point = "F", Decimal(0)
+            for min_score, band_grade, band_point in self.bands:
+                if score >= min_score:
+                    grade, point = band_grade, band_point
+                    break
+            entries.append((grade, _number(point)))
+            exact_points.append(point)
+        self.entries = tuple(entries)
+        self.exact_points = tuple(exact_points)
+
+    @staticmethod
+    def index(score):
+        return 0 if score < 0 else MAX_SCORE if score > MAX_SCORE else score
+
+    def lookup(self, score):
+        """(grade, grade_point) for a score."""
+        return self.entries[self.index(score)]
+
+    def exact_point(self, score):
+        """Grade point as a Decimal, for the stored rollups."""
+        return self.exact_points[self.index(score)]
+
+
+DEFAULT_TABLE = GradeTable(DEFAULT_BANDS)
+
+_lock = threading.Lock()
+_tables = {}
+_loaded_at = None
+
+
+def all_tables():
+    """{scale_id: GradeTable} for every GradingScale that has bands."""
+    global _tables, _loaded_at
+    with _lock:
+        if _loaded_at is None or time.monotonic() - _loaded_at > TABLE_TTL:
+            from .models import GradeBand
+
+            bands = {}
+            for scale_id, min_score, grade, point in GradeBand.objects.values_list(
+                "scale_id", "min_score", "grade", "point"
+            ):
+                bands.setdefault(scale_id, []).append((min_score, grade, point))
+            _tables = {scale_id: GradeTable(b) for scale_id, b in bands.items()}
+            _loaded_at = time.monotonic()
+        return _tables
+
+
+def get_table(scale_id):
+    if scale_id is None:
+        return DEFAULT_TABLE
+    return all_tables().get(scale_id, DEFAULT_TABLE)
+
+
+async def aall_tables():
+    return await sync_to_async(all_tables)()
+
+
+async def aget_table(scale_id):
+    """get_table() for async views; the table may need loading."""
+    return await sync_to_async(get_table)(scale_id)
+
+
+def invalidate():
+    global _loaded_at
+    with _lock:
+        _loaded_at = None
@@ -0,0 +1,72 @@
+"""
+Sign-in bookkeeping: the User and UserProfile rows for a Firebase uid,
+written with one upsert per table and only when something changed.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+from . import middleware
+from .models import UserProfile
+
+
+def _user_writes(uid, email, name):
+    """(user, write) for `uid`; write is None when nothing changed."""
+    User = get_user_model()
+    user = User.objects.filter(username=uid).first()
+    if user is None:
+        user = User(username=uid, email=email, first_name=name)
+
+        return user, lambda: User.objects.bulk_create(
+            [user], update_conflicts=True, unique_fields=["username"], update_fields=["email", "first_name"],
+        )
+    if (user.email, user.first_name) == (email, name):
+        return user, None
+    user.email, user.first_name = email, name
+    return user, lambda: User.objects.filter(id=user.id).update(email=email, first_name=name)
+
+
+def _profile_writes(uid, email, name):
+    """(profile, created, write) for `uid`; write is None when nothing changed."""
+    rows = list(UserProfile.objects.filter(Q(uid=uid) | Q(email=email)))
+    current = next((p for p in rows if p.uid == uid), None)
+    if current is not None and (current.email, current.name) == (email, name):
+        return current, False, None
+    # Upsert on uid when this uid has a profile (its email or name changed),
+    # else on email, which moves the uid onto that email's profile.
+    if current is not None:
+        unique, update = ["uid"], ["email", "name"]
+    else:
+        unique, update = ["email"], ["uid", "name"]
+    profile = UserProfile(uid=uid, email=email, name=name)
+
+    def write():
+        UserProfile.objects.bulk_create(
+            [profile], update_conflicts=True, unique_fields=unique, update_fields=update,
+        )
+        # bulk_create sends no post_save; drop the uids cached for the row.
+        transaction.on_commit(lambda: middleware.forget(profile.id))
+    return profile, not rows, write
+
+
+def _run(*writes):
+    writes = [w for w in writes if w is not None]
+    if writes:
+        with transaction.atomic():
+            for write in writes:
+                write()
+
+
+def sync_profile(uid, email, name):
+    """(profile, created) for `uid`, with `email` and `name` stored on it."""
+    profile, created, write = _profile_writes(uid, email, name)
+    _run(write)
+    return profile, created
+
+
+def sync(uid, email, name):
+    """(user, profile): sync_profile() plus the Django User a session logs in as."""
+    user, user_write = _user_writes(uid, email, name)
+    profile, _, profile_write = _profile_writes(uid, email, name)
+    _run(user_write, profile_write)
+    return user, profile
@@ -0,0 +1,65 @@
+"""
+Transcript rendering on a local pool of worker processes. A job is named
+"<sheet id>-<version>" and is done once that transcript is cached.
+"""
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+from . import transcripts
+
+MAX_JOBS = 1024
+
+_lock = threading.Lock()
+_executor = None
+_jobs = OrderedDict()   # (sheet id, version) -> Future of the rendered path
+
+
+def _init_worker():
+    # Snapshots are unpickled here, and their classes import the models.
+    import django
+    django.setup()
+
+
+def executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _executor
+
+
+def job_id(sheet_id, version):
+    return f"{sheet_id}-{version}"
+
+
+def submit(snap):
+    """Future of the path of `snap`'s transcript; one render per sheet version in this process."""
+    key = (snap.id, snap.version)
+    with _lock:
+        future = _jobs.get(key)
+        if future is not None and not (future.done() and future.exception() is not None):
+            return future
+    future = executor().submit(transcripts.render_into, settings.TRANSCRIPT_CACHE_DIR, snap)
+    with _lock:
+        _jobs[key] = future
+        _jobs.move_to_end(key)
+        while len(_jobs) > MAX_JOBS:
+            _jobs.popitem(last=False)
+    return future
+
+
+def failure(sheet_id, version):
+    """The exception a job of this process failed with, or None."""
+    with _lock:
+        future = _jobs.get((sheet_id, version))
+    if future is None or not future.done():
+        return None
+    return future.exception()
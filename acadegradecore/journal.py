@@ -0,0 +1,87 @@
+"""
+Per-sheet change journal: a SheetChange for every ResultSheet.version, so
+clients can catch up from a version instead of reloading the sheet.
+"""
+from . import events
+from .models import ResultSheet, SheetChange
+
+# Entries older than this many versions are dropped, every COMPACT_EVERY
+# versions of a sheet.
+KEEP_VERSIONS = 500
+COMPACT_EVERY = 50
+
+# Header fields carried by "sheet" "update" entries.
+SHEET_FIELDS = (
+    "student_name", "university", "faculty", "department", "entry_year", "mode", "grading_scale_id",
+)
+
+
+def course_data(course, table):
+    grade, grade_point = table.lookup(course.score)
+    return {
+        "semester_id": course.semester_id,
+        "code": course.code,
+        "title": course.title,
+        "credit_unit": course.credit_unit,
+        "incourse": course.incourse,
+        "exam": course.exam,
+        "score": course.score,
+        "grade": grade,
+        "grade_point": grade_point,
+    }
+
+
+def change(kind, action, object_id=None, data=None):
+    """An unsaved entry for record()."""
+    return SheetChange(kind=kind, action=action, object_id=object_id, data=data)
+
+
+def as_dict(entry):
+    return {"version": entry.version, "kind": entry.kind, "action": entry.action, "id": entry.object_id, "data": entry.data}
+
+
+def record(sheet_id, owner_id, version, entries):
+    """
+    Journal `entries` (from change()) as the changes that produced
+    `version`, and push them to the owner's open event streams once the
+    transaction commits.
+    """
+    for entry in entries:
+        entry.sheet_id = sheet_id
+        entry.version = version
+    SheetChange.objects.bulk_create(entries)
+    events.publish_on_commit(owner_id, {
+        "type": "change", "sheet_id": sheet_id, "version": version,
+        "changes": [as_dict(entry) for entry in entries],
+    })
+    if version % COMPACT_EVERY == 0:
+        SheetChange.objects.filter(sheet_id=sheet_id, version__lte=version - KEEP_VERSIONS).delete()
+
+
+def record_bumped(entries, **filters):
+    """
+    record() for a sheet whose version was just bumped with an UPDATE
+    (so its row is locked by this transaction): reads the version back.
+    `filters` select the sheet, e.g. years__semesters__id=3.
+    """
+    row = ResultSheet.objects.filter(**filters).values_list("id", "owner_id", "version").first()
+    if row is not None:
+        record(*row, entries)
+
+
+def since(sheet_id, version, **filters):
+    """
+    (sheet, entries after `version`), or (sheet, None) when they are no
+    longer all in the journal and the client must resync. The sheet has
+    only its version and rollups loaded. Extra `filters` (e.g. owner_id)
+    restrict which sheet may be read; raises ResultSheet.DoesNotExist.
+    """
+    sheet = ResultSheet.objects.only("version", "total_points", "total_credits").get(id=sheet_id, **filters)
+    if version == sheet.version:
+        return sheet, []
+    if version > sheet.version:
+        return sheet, None
+    entries = list(SheetChange.objects.filter(sheet_id=sheet_id, version__gt=version))
+    if not entries or entries[0].version != version + 1 or any(e.action == "resync" for e in entries):
+        return sheet, None
+    return sheet, entries
@@ -0,0 +1,59 @@
+"""
+Concurrent-request throughput of a running server, to compare the WSGI
+and ASGI deployments:
+
+    python manage.py bench_api http://127.0.0.1:8000/api/sheet/1/ -n 2000 -c 100
+"""
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+from django.core.management.base import BaseCommand
+
+
+async def _bench(url, requests, concurrency, headers):
+    latencies, statuses = [], Counter()
+    remaining = iter(range(requests))
+
+    async def worker(client):
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                response = await client.get(url, headers=headers)
+                statuses[response.status_code] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return elapsed, sorted(latencies), statuses
+
+
+class Command(BaseCommand):
+    help = "Measure requests/second and latency of concurrent GETs against a running server."
+
+    def add_arguments(self, parser):
+        parser.add_argument("url")
+        parser.add_argument("-n", "--requests", type=int, default=1000)
+        parser.add_argument("-c", "--concurrency", type=int, default=50)
+        parser.add_argument("-H", "--header", action="append", default=[],
+                            help='extra request header, e.g. -H "If-None-Match: \\"1.3\\""')
+
+    def handle(self, url, requests, concurrency, header, **options):
+        headers = dict(h.split(":", 1) for h in header)
+        headers = {name.strip(): value.strip() for name, value in headers.items()}
+        elapsed, latencies, statuses = asyncio.run(_bench(url, requests, concurrency, headers))
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000
+
+        self.stdout.write(
+            f"{requests} requests, concurrency {concurrency}: {requests / elapsed:.1f} req/s, "
+            f"p50 {percentile(50):.0f} ms, p95 {percentile(95):.0f} ms, p99 {percentile(99):.0f} ms"
+        )
+        self.stdout.write("statuses: " + ", ".join(f"{s}: {n}" for s, n in sorted(statuses.items(), key=str)))
@@ -0,0 +1,68 @@
+"""
+Render time and peak memory of the PDF transcript for synthetic sheets:
+
+    python manage.py bench_pdf                       # 1, 10 and 100 semesters
+    python manage.py bench_pdf -s 40 -c 12 -r 5
+"""
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from acadegradecore.snapshot import CourseSnapshot, SemesterSnapshot, SheetSnapshot, YearSnapshot
+
+SEMESTERS_PER_YEAR = 2
+
+
+def synthetic_sheet(semesters, courses):
+    years = []
+    for y in range(0, semesters, SEMESTERS_PER_YEAR):
+        sems = []
+        for s in range(1, min(SEMESTERS_PER_YEAR, semesters - y) + 1):
+            rows = tuple(
+                CourseSnapshot(c, f"CSC{100 * (y // 2 + 1) + c}", f"Course {c} of semester {s}", 3, 25, 45, 70, "A", 5)
+                for c in range(courses)
+            )
+            sems.append(SemesterSnapshot(len(years) * 10 + s, s, f"Semester {s}", 15 * courses, 3 * courses, rows))
+        credits = sum(s.total_credits for s in sems)
+        years.append(YearSnapshot(len(years) + 1, len(years) + 1, f"Year {len(years) + 1}", 5 * credits, credits, tuple(sems)))
+    credits = sum(y.total_credits for y in years)
+    return SheetSnapshot(
+        id=0, owner_id=0, student_name="Benchmark", university="", faculty="", department="",
+        years_of_study=len(years), semesters_per_year=SEMESTERS_PER_YEAR, entry_year="2021/2022",
+        mode="available", grading_scale_id=None, version=1,
+        total_points=5 * credits, total_credits=credits, years=tuple(years),
+    )
+
+
+class Command(BaseCommand):
+    help = "Measure PDF transcript render time and peak memory by sheet size."
+
+    def add_arguments(self, parser):
+        parser.add_argument("-s", "--semesters", type=int, nargs="+", default=[1, 10, 100])
+        parser.add_argument("-c", "--courses", type=int, default=8, help="courses per semester")
+        parser.add_argument("-r", "--repeat", type=int, default=3)
+
+    def handle(self, semesters, courses, repeat, **options):
+        from acadegradecore.pdf import render_transcript   # styles built here, outside the timings
+
+        for n in semesters:
+            snap = synthetic_sheet(n, courses)
+            times = []
+            for _ in range(repeat):
+                with tempfile.TemporaryFile() as out:
+                    started = time.perf_counter()
+                    render_transcript(snap, out)
+                    times.append(time.perf_counter() - started)
+            # A separate run: tracing slows every allocation down.
+            with tempfile.TemporaryFile() as out:
+                tracemalloc.start()
+                render_transcript(snap, out)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                size = out.tell()
+            self.stdout.write(
+                f"{n:>4} semesters x {courses} courses: best {min(times) * 1000:.0f} ms, "
+                f"peak {peak / 2 ** 20:.1f} MiB, {size / 1024:.0f} KiB"
+            )
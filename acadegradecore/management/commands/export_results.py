@@ -0,0 +1,52 @@
+"""
+Course results of every matching sheet, streamed as CSV, NDJSON or XLSX:
+
+    python manage.py export_results --department "Computer Science" -o cs.xlsx
+    python manage.py export_results -f ndjson --entry-year 2021/2022 > results.ndjson
+"""
+import codecs
+
+from django.core.management.base import BaseCommand, CommandError
+
+from acadegradecore import exports
+
+
+class Command(BaseCommand):
+    help = "Export course results of every matching sheet as CSV, NDJSON or XLSX."
+
+    def add_arguments(self, parser):
+        parser.add_argument("-f", "--format", dest="fmt", choices=sorted(exports.FORMATS), help="default: from --output, else csv")
+        parser.add_argument("-o", "--output", default="-", help="file to write; - for stdout")
+        parser.add_argument("--university")
+        parser.add_argument("--department")
+        parser.add_argument("--entry-year")
+        parser.add_argument("--sheet", type=int, nargs="+", dest="sheet_ids", help="only these sheet ids")
+        parser.add_argument("--chunk-size", type=int, default=exports.CHUNK_SIZE, help="rows per database fetch")
+
+    def handle(self, fmt, output, sheet_ids, chunk_size, **options):
+        if fmt is None:
+            extension = output.rpartition(".")[2]
+            fmt = extension if extension in exports.FORMATS else "csv"
+        filters = {
+            f"sheet__{field}": options[field]
+            for field in ("university", "department", "entry_year") if options[field]
+        }
+        if sheet_ids:
+            filters["sheet_id__in"] = sheet_ids
+        # self.stdout rather than sys.stdout, so call_command(stdout=...) captures it.
+        buffer = getattr(self.stdout, "buffer", None)
+        if output == "-" and fmt == "xlsx" and (buffer is None or self.stdout.isatty()):
+            raise CommandError("Refusing to write XLSX to a terminal or text stream; pass --output.")
+
+        chunks = exports.stream(fmt, exports.courses(**filters), chunk_size=chunk_size)
+        if output != "-":
+            with open(output, "wb") as out:
+                out.writelines(chunks)
+        elif buffer is not None:
+            self.stdout.flush()
+            buffer.writelines(chunks)
+            buffer.flush()
+        else:
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            for chunk in chunks:
+                self.stdout.write(decoder.decode(chunk), ending="")
@@ -0,0 +1,105 @@
+"""
+ProfileMiddleware: sets request.profile to the caller's UserProfile, or None,
+from a Firebase bearer token or the session.
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+
+from . import offload, tokens
+from .models import UserProfile
+
+SESSION_UID = "firebase_uid"
+MAX_PROFILES = 10000
+# Seconds another worker may keep serving a uid moved to another profile.
+PROFILE_TTL = 300
+
+_lock = threading.Lock()
+_profile_ids = OrderedDict()   # uid -> (profile id, loaded at)
+
+
+async def _caller_uid(request):
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        id_token = header[len("Bearer "):]
+        claims = tokens.cached(id_token)
+        if claims is None:
+            try:
+                claims = await offload.run(tokens.verify, id_token)
+            except Exception as e:
+                print("❌ Token verification failed:", e)
+                return None
+        return claims.get("uid")
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return None
+    uid = await request.session.aget(SESSION_UID)
+    if uid is None:
+        # Sessions opened before firebase_login_sync stored the uid: the
+        # Django username is the uid.
+        user = await request.auser()
+        uid = user.username if user.is_authenticated else None
+    return uid
+
+
+async def _profile_id(uid):
+    now = time.monotonic()
+    with _lock:
+        hit = _profile_ids.get(uid)
+        if hit is not None and now - hit[1] <= PROFILE_TTL:
+            _profile_ids.move_to_end(uid)
+            return hit[0]
+    profile_id = await UserProfile.objects.filter(uid=uid).values_list("id", flat=True).afirst()
+    if profile_id is not None:
+        with _lock:
+            _profile_ids[uid] = (profile_id, now)
+            _profile_ids.move_to_end(uid)
+            while len(_profile_ids) > MAX_PROFILES:
+                _profile_ids.popitem(last=False)
+    return profile_id
+
+
+def forget(profile_id):
+    """Drop every cached uid of a profile (it was saved or deleted)."""
+    with _lock:
+        for uid in [uid for uid, (pid, _) in _profile_ids.items() if pid == profile_id]:
+            del _profile_ids[uid]
+
+
+async def resolve(request):
+    uid = await _caller_uid(request)
+    profile_id = await _profile_id(uid) if uid else None
+    if profile_id is None:
+        return None
+    return UserProfile.from_db(None, ["id", "uid"], (profile_id, uid))
+
+
+class ProfileMiddleware:
+    async_capable = True
+    sync_capable = False
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    async def __call__(self, request):
+        request.profile = await resolve(request)
+        response = await self.get_response(request)
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+
+def profile_required(view):
+    """401 unless the caller resolved to a profile; for async views."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.profile is None:
+            return JsonResponse({"error": "Authentication required"}, status=401)
+        return await view(request, *args, **kwargs)
+    return wrapper
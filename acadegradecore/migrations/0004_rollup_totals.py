@@ -0,0 +1,85 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:07
+
+from django.db import migrations, models
+
+
+def _grade_point(score):
+    if score >= 70: return 5
+    if score >= 60: return 4
+    if score >= 50: return 3
+    if score >= 45: return 2
+    if score >= 40: return 1
+    return 0
+
+
+def backfill_totals(apps, schema_editor):
+    Semester = apps.get_model('acadegradecore', 'Semester')
+    Year = apps.get_model('acadegradecore', 'Year')
+    ResultSheet = apps.get_model('acadegradecore', 'ResultSheet')
+    Course = apps.get_model('acadegradecore', 'Course')
+
+    sem_totals = {}
+    for sem_id, credit_unit, incourse, exam in Course.objects.values_list('semester_id', 'credit_unit', 'incourse', 'exam'):
+        totals = sem_totals.setdefault(sem_id, [0, 0])
+        totals[0] += credit_unit * _grade_point(incourse + exam)
+        totals[1] += credit_unit
+
+    year_totals = {}
+    for sem_id, year_id in Semester.objects.values_list('id', 'year_id'):
+        points, credits = sem_totals.get(sem_id, (0, 0))
+        Semester.objects.filter(id=sem_id).update(total_points=points, total_credits=credits)
+        totals = year_totals.setdefault(year_id, [0, 0])
+        totals[0] += points
+        totals[1] += credits
+
+    sheet_totals = {}
+    for year_id, sheet_id in Year.objects.values_list('id', 'sheet_id'):
+        points, credits = year_totals.get(year_id, (0, 0))
+        Year.objects.filter(id=year_id).update(total_points=points, total_credits=credits)
+        totals = sheet_totals.setdefault(sheet_id, [0, 0])
+        totals[0] += points
+        totals[1] += credits
+
+    for sheet_id, (points, credits) in sheet_totals.items():
+        ResultSheet.objects.filter(id=sheet_id).update(total_points=points, total_credits=credits)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acadegradecore', '0003_semester_resultsheet_course_year_semester_year_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resultsheet',
+            name='total_credits',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='resultsheet',
+            name='total_points',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='semester',
+            name='total_credits',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='semester',
+            name='total_points',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='year',
+            name='total_credits',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='year',
+            name='total_points',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
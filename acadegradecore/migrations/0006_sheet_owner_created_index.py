@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acadegradecore', '0005_grading_scales'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='resultsheet',
+            index=models.Index(fields=['owner', 'created_at', 'id'], name='sheet_owner_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acadegradecore', '0006_sheet_owner_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resultsheet',
+            name='version',
+            field=models.PositiveBigIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acadegradecore', '0007_sheet_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SheetChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField()),
+                ('kind', models.CharField(max_length=16)),
+                ('action', models.CharField(max_length=16)),
+                ('object_id', models.PositiveBigIntegerField(null=True)),
+                ('data', models.JSONField(null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sheet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='acadegradecore.resultsheet')),
+            ],
+            options={
+                'ordering': ['version', 'id'],
+                'indexes': [models.Index(fields=['sheet', 'version'], name='sheetchange_sheet_version_idx')],
+            },
+        ),
+    ]
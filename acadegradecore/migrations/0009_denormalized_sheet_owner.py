@@ -0,0 +1,74 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_keys(apps, schema_editor):
+    Semester = apps.get_model('acadegradecore', 'Semester')
+    Course = apps.get_model('acadegradecore', 'Course')
+
+    Year = apps.get_model('acadegradecore', 'Year')
+
+    years = Year.objects.filter(id=OuterRef('year_id'))
+    Semester.objects.update(
+        sheet_id=Subquery(years.values('sheet_id')),
+        owner_id=Subquery(years.values('sheet__owner_id')),
+    )
+    semesters = Semester.objects.filter(id=OuterRef('semester_id'))
+    Course.objects.update(
+        sheet_id=Subquery(semesters.values('sheet_id')),
+        owner_id=Subquery(semesters.values('owner_id')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acadegradecore', '0008_sheet_change_journal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='semester',
+            name='sheet',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='acadegradecore.resultsheet'),
+        ),
+        migrations.AddField(
+            model_name='semester',
+            name='owner',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='acadegradecore.userprofile'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='sheet',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='acadegradecore.resultsheet'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='owner',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='acadegradecore.userprofile'),
+        ),
+        migrations.RunPython(backfill_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='semester',
+            name='sheet',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='acadegradecore.resultsheet'),
+        ),
+        migrations.AlterField(
+            model_name='semester',
+            name='owner',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='acadegradecore.userprofile'),
+        ),
+        migrations.AlterField(
+            model_name='course',
+            name='sheet',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='acadegradecore.resultsheet'),
+        ),
+        migrations.AlterField(
+            model_name='course',
+            name='owner',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='acadegradecore.userprofile'),
+        ),
+    ]
@@ -1,4 +1,90 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.db.models.lookups import GreaterThanOrEqual
+
+from . import grading
+
+
+def _gpa(total_points, total_credits):
+    return round(float(total_points) / total_credits, 2) if total_credits else 0
+
+
+def _rollup_gpa(obj):
+    # Totals annotated by with_gpa()/with_cgpa() win over the stored rollups.
+    if hasattr(obj, "gpa_credits"):
+        return _gpa(obj.gpa_points, obj.gpa_credits)
+    return _gpa(obj.total_points, obj.total_credits)
+
+
+def _bands_expression(score, table):
+    return Case(
+        *(When(GreaterThanOrEqual(score, min_score), then=Value(point)) for min_score, _, point in table.bands),
+        default=Value(0),
+        output_field=models.DecimalField(max_digits=4, decimal_places=2),
+    )
+
+
+def grade_point_expression(prefix="", scale_path="grading_scale"):
+    """
+    SQL equivalent of Course.grade_point for the course reached via `prefix`,
+    graded on the scale of the sheet reached via `scale_path`.
+    """
+    score = F(f"{prefix}incourse") + F(f"{prefix}exam")
+    return Case(
+        *(
+            When(**{scale_path: scale_id}, then=_bands_expression(score, table))
+            for scale_id, table in grading.all_tables().items()
+        ),
+        default=_bands_expression(score, grading.DEFAULT_TABLE),
+    )
+
+
+def gpa_annotations(prefix="", scale_path="grading_scale"):
+    """gpa_points/gpa_credits aggregates over the courses reached via `prefix`."""
+    credit_unit = F(f"{prefix}credit_unit")
+    return {
+        "gpa_points": Coalesce(Sum(credit_unit * grade_point_expression(prefix, scale_path)), Value(0), output_field=models.DecimalField()),
+        "gpa_credits": Coalesce(Sum(credit_unit), 0),
+    }
+
+
+class ResultSheetQuerySet(models.QuerySet):
+    def with_cgpa(self):
+        """Annotate credit-weighted grade points of every course in one aggregate query."""
+        return self.annotate(**gpa_annotations("years__semesters__courses__"))
+
+    def with_cgpa_key(self):
+        """
+        Annotate cgpa_key, the unrounded CGPA from the stored rollups, to
+        order and paginate by CGPA without joining the course tables.
+        """
+        return self.annotate(cgpa_key=Case(
+            When(total_credits=0, then=Value(0.0)),
+            default=Cast("total_points", models.FloatField()) / F("total_credits"),
+            output_field=models.FloatField(),
+        ))
+
+
+class YearQuerySet(models.QuerySet):
+    def with_gpa(self):
+        return self.annotate(**gpa_annotations("semesters__courses__", "sheet__grading_scale"))
+
+
+class SemesterQuerySet(models.QuerySet):
+    def with_gpa(self):
+        return self.annotate(**gpa_annotations("courses__", "year__sheet__grading_scale"))
+
+
+class CourseQuerySet(models.QuerySet):
+    def delete_rows(self):
+        """
+        Delete with a single DELETE statement: no instances are loaded and
+        no signals are sent, so the caller must maintain the rollups
+        (see acadegradecore.mutations).
+        """
+        return self._raw_delete(self.db)
+
 
 class ContactMessage(models.Model):
     name = models.CharField(max_length=100)
@@ -21,6 +107,33 @@ class UserProfile(models.Model):
         return self.name or self.email
 
 
+class GradingScale(models.Model):
+    name = models.CharField(max_length=100, unique=True)   # e.g. "4.0 (US)"
+    description = models.CharField(max_length=200, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def grade_table(self):
+        return grading.get_table(self.id)
+
+
+class GradeBand(models.Model):
+    scale = models.ForeignKey(GradingScale, on_delete=models.CASCADE, related_name="bands")
+    min_score = models.PositiveSmallIntegerField()   # lowest score that earns this grade
+    grade = models.CharField(max_length=4)
+    point = models.DecimalField(max_digits=4, decimal_places=2)
+
+    class Meta:
+        unique_together = ('scale', 'min_score')
+        ordering = ['-min_score']
+
+    def __str__(self):
+        return f"{self.scale} - {self.grade} (>= {self.min_score})"
+
+
 class ResultSheet(models.Model):
     owner = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name="sheets")
     student_name = models.CharField(max_length=200)
@@ -35,32 +148,75 @@ class ResultSheet(models.Model):
         choices=(('zeros','All zeros (Build up)'), ('available','Based on availability')),
         default='zeros'
     )
+    # None grades on grading.DEFAULT_BANDS (Nigerian 5-point scale)
+    grading_scale = models.ForeignKey(
+        GradingScale, on_delete=models.PROTECT, related_name="sheets", null=True, blank=True
+    )
+    # Rollups of credit_unit * grade_point / credit_unit over every course in
+    # the sheet, maintained by acadegradecore.signals.
+    total_points = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    total_credits = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped by every change to the sheet or anything under it (see
+    # acadegradecore.rollups); the ETag of the sheet's representations.
+    version = models.PositiveBigIntegerField(default=1, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ResultSheetQuerySet.as_manager()
+
+    # Only ever moved with UPDATE ... F(); save() of an instance loaded
+    # earlier must not write stale values back.
+    COUNTER_FIELDS = ("total_points", "total_credits", "version")
+
+    class Meta:
+        indexes = [
+            # list_sheets keyset pagination
+            models.Index(fields=["owner", "created_at", "id"], name="sheet_owner_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.student_name} ({self.university})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Changing the scale regrades every course; see signals.sheet_saved.
+        if "grading_scale_id" in field_names:
+            instance._loaded_grading_scale_id = instance.grading_scale_id
+        # Semesters and courses copy the owner; see signals.sheet_saved.
+        if "owner_id" in field_names:
+            instance._loaded_owner_id = instance.owner_id
+        return instance
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def total_semesters(self):
         return self.years_of_study * self.semesters_per_year
 
+    @property
+    def grade_table(self):
+        return grading.get_table(self.grading_scale_id)
+
     @property
     def cgpa(self):
-        total_points = 0
-        total_credits = 0
-        for year in self.years.all():
-            for sem in year.semesters.all():
-                for c in sem.courses.all():
-                    total_points += c.credit_unit * c.grade_point
-                    total_credits += c.credit_unit
-        return round(total_points / total_credits, 2) if total_credits else 0
+        return _rollup_gpa(self)
 
 
 class Year(models.Model):
     sheet = models.ForeignKey(ResultSheet, on_delete=models.CASCADE, related_name="years")
     index = models.PositiveSmallIntegerField()
     year_label = models.CharField(max_length=40)  # e.g. "2021/2022 Year 1"
+    total_points = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    total_credits = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = YearQuerySet.as_manager()
+
     class Meta:
         unique_together = ('sheet', 'index')
         ordering = ['index']
@@ -68,23 +224,43 @@ class Year(models.Model):
     def __str__(self):
         return f"{self.sheet.student_name} - {self.year_label}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "sheet_id" in field_names:
+            instance._loaded_sheet_id = instance.sheet_id
+        return instance
+
+    def save(self, *args, **kwargs):
+        # The rollups and the sheet/owner copies below a year are not moved
+        # with it, so a year stays on the sheet it was created on.
+        if self.sheet_id != self.__dict__.get("_loaded_sheet_id", self.sheet_id):
+            raise ValueError("A year cannot be moved to another sheet.")
+        super().save(*args, **kwargs)
+        self._loaded_sheet_id = self.sheet_id
+
     @property
     def year_gpa(self):
-        total_points = 0
-        total_credits = 0
-        for sem in self.semesters.all():
-            for c in sem.courses.all():
-                total_points += c.credit_unit * c.grade_point
-                total_credits += c.credit_unit
-        return round(total_points / total_credits, 2) if total_credits else 0
+        return _rollup_gpa(self)
 
 
 class Semester(models.Model):
     year = models.ForeignKey(Year, on_delete=models.CASCADE, related_name="semesters")
+    # Copies of year.sheet and year.sheet.owner, so a semester is found and
+    # authorized without joining up the tree; set by save() and scaffold,
+    # kept in step by signals.sheet_saved (year is fixed after creation).
+    # DO_NOTHING: the rows already go with their year, and collecting them
+    # twice costs a query per level.
+    sheet = models.ForeignKey(ResultSheet, on_delete=models.DO_NOTHING, related_name="+", editable=False)
+    owner = models.ForeignKey(UserProfile, on_delete=models.DO_NOTHING, related_name="+", editable=False)
     index = models.PositiveSmallIntegerField()
     label = models.CharField(max_length=80)    # e.g. "1st Semester"
+    total_points = models.DecimalField(max_digits=10, decimal_places=2, default=0, editable=False)
+    total_credits = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = SemesterQuerySet.as_manager()
+
     class Meta:
         unique_together = ('year', 'index')
         ordering = ['index']
@@ -92,16 +268,39 @@ class Semester(models.Model):
     def __str__(self):
         return f"{self.year} - {self.label}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "year_id" in field_names:
+            instance._loaded_year_id = instance.year_id
+        return instance
+
+    def save(self, *args, **kwargs):
+        # As for Year.sheet: the rollups and course keys do not follow a move.
+        if self.year_id != self.__dict__.get("_loaded_year_id", self.year_id):
+            raise ValueError("A semester cannot be moved to another year.")
+        if self.sheet_id is None:
+            year = self.year if Semester.year.is_cached(self) else None
+            if year is not None and Year.sheet.is_cached(year):
+                self.sheet_id, self.owner_id = year.sheet_id, year.sheet.owner_id
+            else:
+                self.sheet_id, self.owner_id = (
+                    ResultSheet.objects.filter(years=self.year_id).values_list("id", "owner_id").get()
+                )
+        super().save(*args, **kwargs)
+        self._loaded_year_id = self.year_id
+
     @property
     def gpa(self):
-        courses = self.courses.all()
-        total_points = sum(c.credit_unit * c.grade_point for c in courses)
-        total_credits = sum(c.credit_unit for c in courses)
-        return round(total_points / total_credits, 2) if total_credits else 0
+        return _rollup_gpa(self)
 
 
 class Course(models.Model):
     semester = models.ForeignKey(Semester, on_delete=models.CASCADE, related_name="courses")
+    # Copies of the semester's sheet and owner (see Semester.sheet), so
+    # course endpoints authorize and fetch with WHERE id = ? AND owner_id = ?.
+    sheet = models.ForeignKey(ResultSheet, on_delete=models.DO_NOTHING, related_name="+", editable=False)
+    owner = models.ForeignKey(UserProfile, on_delete=models.DO_NOTHING, related_name="+", editable=False)
     code = models.CharField(max_length=50, blank=True)
     title = models.CharField(max_length=200, blank=True)
     credit_unit = models.PositiveSmallIntegerField(default=0)
@@ -109,29 +308,107 @@ class Course(models.Model):
     exam = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CourseQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.code} - {self.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the row as loaded, so saving it only has to apply the
+        # difference to the rollups.
+        if {"semester_id", "sheet_id", "credit_unit", "incourse", "exam"}.issubset(field_names):
+            instance.remember_loaded()
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded = self.__dict__.get("_loaded")
+        if self.sheet_id is None or (loaded is not None and loaded[0] != self.semester_id):
+            semester = self.semester if Course.semester.is_cached(self) else None
+            if semester is not None and semester.sheet_id is not None:
+                self.sheet_id, self.owner_id = semester.sheet_id, semester.owner_id
+            else:
+                self.sheet_id, self.owner_id = (
+                    Semester.objects.filter(id=self.semester_id).values_list("sheet_id", "owner_id").get()
+                )
+            if loaded is not None and loaded[1] != self.sheet_id:
+                # Graded by the new sheet's scale from here on.
+                self.__dict__.pop("_grade_table", None)
+        # post_save adjusts the semester/year/sheet rollups; keep that in the
+        # same transaction as the row itself.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def remember_loaded(self):
+        self._loaded = (self.semester_id, self.sheet_id, self.credit_unit, self.score)
+
+    def loaded_contribution(self):
+        """(semester_id, points, credits) as of the last load/save, or None."""
+        loaded = self.__dict__.get("_loaded")
+        if loaded is None:
+            return None
+        semester_id, sheet_id, credit_unit, score = loaded
+        if sheet_id == self.sheet_id:
+            table = self.grade_table
+        else:
+            # Moved from another sheet, whose scale graded the old points.
+            scale_id = ResultSheet.objects.filter(id=sheet_id).values_list("grading_scale_id", flat=True).first()
+            table = grading.get_table(scale_id)
+        return semester_id, credit_unit * table.exact_point(score), credit_unit
+
+    def rollup_contribution(self):
+        """(points, credits) this course adds to its semester, year and sheet."""
+        return self.credit_unit * self.grade_table.exact_point(self.score), self.credit_unit
+
+    @property
+    def grade_table(self):
+        # Views that already hold the sheet assign its table to skip the lookup.
+        table = self.__dict__.get("_grade_table")
+        if table is None:
+            if Course.sheet.is_cached(self):
+                scale_id = self.sheet.grading_scale_id
+            else:
+                sheets = (ResultSheet.objects.filter(id=self.sheet_id) if self.sheet_id is not None
+                          else ResultSheet.objects.filter(years__semesters=self.semester_id))
+                scale_id = sheets.values_list("grading_scale_id", flat=True).get()
+            table = self._grade_table = grading.get_table(scale_id)
+        return table
+
+    @grade_table.setter
+    def grade_table(self, table):
+        self._grade_table = table
+
     @property
     def score(self):
         return self.incourse + self.exam
 
     @property
     def grade(self):
-        s = self.score
-        if s >= 70: return "A"
-        if s >= 60: return "B"
-        if s >= 50: return "C"
-        if s >= 45: return "D"
-        if s >= 40: return "E"
-        return "F"
+        return self.grade_table.lookup(self.score)[0]
 
     @property
     def grade_point(self):
-        s = self.score
-        if s >= 70: return 5
-        if s >= 60: return 4
-        if s >= 50: return 3
-        if s >= 45: return 2
-        if s >= 40: return 1
-        return 0
+        return self.grade_table.lookup(self.score)[1]
+
+
+class SheetChange(models.Model):
+    """
+    One entry of a sheet's change journal (see acadegradecore.journal):
+    what a write did to a row of the tree, and the sheet version it
+    produced.
+    """
+    sheet = models.ForeignKey(ResultSheet, on_delete=models.CASCADE, related_name="changes")
+    version = models.PositiveBigIntegerField()
+    kind = models.CharField(max_length=16)      # "sheet", "year", "semester" or "course"
+    action = models.CharField(max_length=16)    # "insert", "update", "delete" or "resync"
+    object_id = models.PositiveBigIntegerField(null=True)
+    data = models.JSONField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["sheet", "version"], name="sheetchange_sheet_version_idx")]
+        ordering = ["version", "id"]
+
+    def __str__(self):
+        return f"{self.sheet_id}@{self.version} {self.action} {self.kind} {self.object_id}"
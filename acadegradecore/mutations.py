@@ -0,0 +1,283 @@
+"""
+Diff-based course writes: at most one bulk INSERT, UPDATE and DELETE per
+call, with the rollups moved by the computed deltas.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Count
+
+from . import journal, rollups
+from .models import ResultSheet, Course, Semester
+
+COURSE_FIELDS = ("code", "title", "credit_unit", "incourse", "exam")
+INT_FIELDS = ("credit_unit", "incourse", "exam")
+MAX_SMALL_INT = 32767
+
+MutationResult = namedtuple(
+    "MutationResult", ["created", "updated", "unchanged", "deleted", "semesters", "years", "sheet"],
+)
+MutationResult.__doc__ = """
+created/updated/unchanged: Course instances in request order; deleted: ids.
+semesters/years: the touched Semester/Year rows and sheet their
+ResultSheet, all carrying their new totals.
+"""
+
+
+class MutationError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _int(value, field):
+    # The batch modal sends "" for scores it has not got yet.
+    if value is None or value == "":
+        return 0
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise MutationError(f"{field} must be an integer")
+    if not 0 <= number <= MAX_SMALL_INT:
+        raise MutationError(f"{field} must be between 0 and {MAX_SMALL_INT}")
+    return number
+
+
+def course_values(data, current=None):
+    """Course field values from a JSON payload; missing fields come from `current`."""
+    values = {}
+    for field in COURSE_FIELDS:
+        if field in data:
+            value = data[field]
+        elif current is not None:
+            value = getattr(current, field)
+        else:
+            value = 0 if field in INT_FIELDS else ""
+        values[field] = _int(value, field) if field in INT_FIELDS else str(value)
+    return values
+
+
+def _course_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise MutationError("course id must be an integer")
+
+
+def _lock_sheet(not_found="Sheet not found or not yours", **filters):
+    # Every diff-based write of a sheet holds its row lock, so the diffs
+    # and the returned totals never race another mutation of the sheet.
+    try:
+        return ResultSheet.objects.select_for_update(of=("self",)).get(**filters)
+    except ResultSheet.DoesNotExist:
+        raise MutationError(not_found, status=404)
+
+
+def check_version(sheet, if_match):
+    """
+    Optimistic concurrency: `if_match` is None (unconditional) or the
+    (sheet_id, version) pairs the client last saw.
+    """
+    if if_match is not None and (sheet.id, sheet.version) not in if_match:
+        raise MutationError("The sheet has changed since you loaded it; reload and try again", status=412)
+
+
+def apply(sheet_id=None, adds=(), updates=None, deletes=(), if_match=None,
+          not_found="Sheet not found or not yours", **filters):
+    """
+    adds: [(semester_id, payload)], updates: {course_id: partial payload},
+    deletes: course ids. Every semester and course must belong to the sheet.
+
+    The sheet is `sheet_id` and/or whatever `filters` select (e.g.
+    owner_id, or a sheet id subquery on the course being changed);
+    MutationError(not_found, 404) when there is none. See check_version()
+    for `if_match`.
+    """
+    if sheet_id is not None:
+        filters["id"] = sheet_id
+    with transaction.atomic():
+        sheet = _lock_sheet(not_found, **filters)
+        check_version(sheet, if_match)
+        return _apply(sheet, adds, updates or {}, set(deletes))
+
+
+def fold_ops(ops):
+    """
+    Fold an ordered list of operations into (adds, refs, updates, deletes)
+    for apply(); refs[i] is the client "ref" of adds[i] or None.
+
+        {"op": "add", "ref": "r1", "semester_id": 3, "code": ..., ...}
+        {"op": "update", "id": 7, "exam": 52}     # or "ref": "r1"
+        {"op": "delete", "id": 8}                 # or "ref": "r1"
+
+    Later operations see the effect of earlier ones: updating an added
+    course edits its payload, deleting it drops the add.
+    """
+    if not isinstance(ops, list):
+        raise MutationError("ops must be a list")
+    adds, refs, updates, deletes = [], [], {}, set()
+    by_ref = {}
+    for n, op in enumerate(ops):
+        if not isinstance(op, dict):
+            raise MutationError(f"ops[{n}] must be an object")
+        kind = op.get("op")
+        if kind == "add":
+            ref = op.get("ref")
+            if ref is not None and ref in by_ref:
+                raise MutationError(f"ops[{n}]: duplicate ref {ref!r}")
+            try:
+                semester_id = int(op["semester_id"])
+            except (KeyError, TypeError, ValueError):
+                raise MutationError(f"ops[{n}]: semester_id must be an integer")
+            by_ref[ref] = len(adds)
+            adds.append((semester_id, dict(op)))
+            refs.append(ref)
+        elif kind not in ("update", "delete"):
+            raise MutationError(f"ops[{n}]: op must be add, update or delete")
+        elif op.get("ref") is not None:
+            index = by_ref.get(op["ref"])
+            if index is None or adds[index] is None:
+                raise MutationError(f"ops[{n}]: unknown ref {op['ref']!r}")
+            if kind == "update":
+                adds[index][1].update(op)
+            else:
+                adds[index] = None
+        else:
+            course_id = _course_id(op.get("id"))
+            if course_id in deletes:
+                raise MutationError(f"ops[{n}]: course {course_id} is already deleted")
+            if kind == "update":
+                updates.setdefault(course_id, {}).update(op)
+            else:
+                updates.pop(course_id, None)
+                deletes.add(course_id)
+    kept = [i for i, add in enumerate(adds) if add is not None]
+    return [adds[i] for i in kept], [refs[i] for i in kept], updates, deletes
+
+
+def _apply(sheet, adds, updates, deletes, keep_one=True):
+    if deletes & updates.keys():
+        raise MutationError("A course cannot be both updated and deleted")
+
+    courses = {
+        c.id: c for c in Course.objects.select_related("semester__year")
+        .filter(id__in=deletes | updates.keys(), sheet=sheet)
+    }
+    missing = (deletes | updates.keys()) - courses.keys()
+    if missing:
+        raise MutationError(f"Course(s) not found in this sheet: {sorted(missing)}", status=404)
+
+    semesters = {c.semester_id: c.semester for c in courses.values()}
+    sem_ids = {sem_id for sem_id, _ in adds} - semesters.keys()
+    if sem_ids:
+        semesters.update(
+            (s.id, s) for s in Semester.objects.select_related("year").filter(id__in=sem_ids, sheet=sheet)
+        )
+    if sem_ids - semesters.keys():
+        raise MutationError(f"Semester(s) not found in this sheet: {sorted(sem_ids - semesters.keys())}", status=404)
+    table = sheet.grade_table
+
+    deltas = {sem_id: [0, 0] for sem_id in semesters}
+
+    def shift(course, sign):
+        course.grade_table = table
+        points, credits = course.rollup_contribution()
+        deltas[course.semester_id][0] += sign * points
+        deltas[course.semester_id][1] += sign * credits
+
+    for course_id in deletes:
+        shift(courses[course_id], -1)
+
+    updated, unchanged = [], []
+    for course_id, data in updates.items():
+        course = courses[course_id]
+        values = course_values(data, course)
+        if all(getattr(course, f) == v for f, v in values.items()):
+            unchanged.append(course)
+            continue
+        shift(course, -1)
+        for field, value in values.items():
+            setattr(course, field, value)
+        shift(course, +1)
+        updated.append(course)
+
+    created = []
+    for sem_id, data in adds:
+        course = Course(
+            semester=semesters[sem_id], sheet_id=sheet.id, owner_id=sheet.owner_id, **course_values(data),
+        )
+        shift(course, +1)
+        created.append(course)
+
+    if deletes:
+        Course.objects.filter(id__in=deletes).delete_rows()
+    if updated:
+        Course.objects.bulk_update(updated, COURSE_FIELDS)
+    if created:
+        Course.objects.bulk_create(created)
+
+    if keep_one and deletes and sheet.mode == "zeros":
+        counts = dict(
+            Course.objects.filter(semester_id__in=semesters).values("semester_id")
+            .annotate(n=Count("id")).values_list("semester_id", "n")
+        )
+        if any(not counts.get(sem_id) for sem_id in semesters):
+            raise MutationError("Cannot delete the last course in this semester (All 0s mode).", status=403)
+
+    if created or updated or deletes:
+        rollups.apply_deltas(sheet.id, deltas, {s.id: s.year_id for s in semesters.values()})
+        sheet.version += 1
+        journal.record(sheet.id, sheet.owner_id, sheet.version, [
+            *(journal.change("course", "delete", i, {"semester_id": courses[i].semester_id}) for i in sorted(deletes)),
+            *(journal.change("course", "update", c.id, journal.course_data(c, table)) for c in updated),
+            *(journal.change("course", "insert", c.id, journal.course_data(c, table)) for c in created),
+        ])
+
+    # The rows read under the sheet lock plus the deltas are the new
+    # totals; no re-read needed.
+    years = {}
+    for sem in semesters.values():
+        sem.year = years.setdefault(sem.year_id, sem.year)
+    for sem_id, (points, credits) in deltas.items():
+        for row in (semesters[sem_id], semesters[sem_id].year, sheet):
+            row.total_points += points
+            row.total_credits += credits
+    for course in created + updated:
+        course.remember_loaded()
+    return MutationResult(created, updated, unchanged, sorted(deletes), list(semesters.values()), list(years.values()), sheet)
+
+
+def replace_semester(semester_id, payloads, if_match=None, **filters):
+    """
+    Make the courses of a semester match `payloads`: entries with an "id"
+    update that course, entries without one are added, and courses not
+    listed are deleted. Extra `filters` (e.g. owner_id) restrict the sheet.
+    """
+    if not isinstance(payloads, list):
+        raise MutationError("courses must be a list")
+    for n, data in enumerate(payloads):
+        if not isinstance(data, dict):
+            raise MutationError(f"courses[{n}] must be an object")
+    sem = Semester.objects.select_related("year").filter(id=semester_id).first()
+    if sem is None:
+        raise MutationError("Semester not found", status=404)
+    with transaction.atomic():
+        sheet = _lock_sheet("Semester not found", id=sem.sheet_id, **filters)
+        check_version(sheet, if_match)
+        existing = set(Course.objects.filter(semester_id=semester_id).values_list("id", flat=True))
+        adds, updates = [], {}
+        for data in payloads:
+            if data.get("id") in (None, ""):
+                adds.append((semester_id, data))
+                continue
+            course_id = _course_id(data["id"])
+            if course_id not in existing:
+                raise MutationError(f"Course {course_id} is not in this semester", status=404)
+            updates[course_id] = data
+        # Like the old delete-and-reinsert, a batch may empty a semester.
+        result = _apply(sheet, adds, updates, existing - updates.keys(), keep_one=False)
+    if not result.semesters:
+        # Nothing was added, kept or removed; still report the semester.
+        sem.year.sheet = result.sheet
+        return result._replace(semesters=[sem], years=[sem.year])
+    return result
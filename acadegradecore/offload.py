@@ -0,0 +1,29 @@
+"""
+Bounded thread pool for the blocking, non-database calls of the async views
+(token checks, SMTP, ReportLab).
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+_lock = threading.Lock()
+_executor = None
+
+
+def executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BLOCKING_POOL_SIZE, thread_name_prefix="blocking",
+            )
+        return _executor
+
+
+async def run(func, *args, **kwargs):
+    """Await func(*args, **kwargs) run on the blocking pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor(), functools.partial(func, *args, **kwargs))
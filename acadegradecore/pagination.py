@@ -0,0 +1,70 @@
+"""
+Keyset (cursor) pagination over an ordering that ends with the primary key.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    plain = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(plain).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, types):
+    """Values of `cursor`, converted with `types` (one callable per ordering field)."""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(raw, list) or len(raw) != len(types):
+            raise InvalidCursor(cursor)
+        return [convert(value) for convert, value in zip(types, raw)]
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+def after(ordering, values):
+    """Q selecting the rows that come after `values` in `ordering` (e.g. ("-created_at", "-id"))."""
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        step = Q(**{f"{name}__{lookup}": values[i]})
+        for prev_field, prev_value in zip(ordering[:i], values[:i]):
+            step &= Q(**{prev_field.lstrip("-"): prev_value})
+        condition |= step
+    return condition
+
+
+def _window(queryset, ordering, cursor, types, limit):
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(after(ordering, decode_cursor(cursor, types)))
+    return queryset[:limit + 1]
+
+
+def _page(rows, ordering, limit):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1][-len(ordering):])
+
+
+def paginate(queryset, ordering, cursor=None, types=None, limit=50):
+    """
+    (rows, next_cursor) for one page of `queryset`, which must be a
+    values_list() ending with the `ordering` fields.
+    """
+    return _page(list(_window(queryset, ordering, cursor, types, limit)), ordering, limit)
+
+
+async def apaginate(queryset, ordering, cursor=None, types=None, limit=50):
+    """paginate() for async views."""
+    window = _window(queryset, ordering, cursor, types, limit)
+    return _page([row async for row in window], ordering, limit)
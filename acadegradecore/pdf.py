@@ -0,0 +1,153 @@
+"""
+ReportLab rendering of PDF transcripts and class broadsheets. Imported on
+first render; the styles below are shared and never modified.
+"""
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A3, A4, landscape
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+STYLES = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    "title",
+    parent=STYLES["Heading1"],
+    alignment=1,
+    fontSize=18,
+    spaceAfter=12,
+)
+
+SEMESTER_TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#0d6efd")),
+    ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("BOTTOMPADDING", (0, 0), (-1, 0), 8),
+    ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+])
+
+BROADSHEET_TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#0d6efd")),
+    ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("ALIGN", (1, 0), (-1, -1), "CENTER"),
+    ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+    ("LEFTPADDING", (0, 0), (-1, -1), 1),
+    ("RIGHTPADDING", (0, 0), (-1, -1), 1),
+    ("TOPPADDING", (0, 0), (-1, -1), 1),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 1),
+])
+# Students per table: small tables keep page layout linear in the class size.
+BROADSHEET_ROWS_PER_TABLE = 40
+BROADSHEET_NAME_WIDTH = 110
+
+
+def render_transcript(snap, out):
+    """Write the transcript PDF of `snap` to the file-like `out`."""
+    doc = SimpleDocTemplate(out, pagesize=A4)
+    styles = STYLES
+    story = []
+
+    # --- Branding header ---
+    story.append(Paragraph("🎓 AcadeGrade", TITLE_STYLE))
+    story.append(Spacer(1, 12))
+
+    # --- Student info ---
+    info = f"""
+    <b>Student:</b> {snap.student_name}<br/>
+    <b>University:</b> {snap.university or '-'}<br/>
+    <b>Faculty:</b> {snap.faculty or '-'}<br/>
+    <b>Department:</b> {snap.department or '-'}<br/>
+    <b>Entry Year:</b> {snap.entry_year}<br/>
+    <b>Years of Study:</b> {snap.years_of_study} <br/>
+    <b>Semesters/Year:</b> {snap.semesters_per_year} <br/>
+    <b>Mode:</b> {"Build-up (Zeros)" if snap.mode == "zeros" else "Availability"}<br/>
+    """
+    story.append(Paragraph(info, styles["Normal"]))
+    story.append(Spacer(1, 12))
+
+    # --- Year by year breakdown ---
+    for year in snap.years:
+        # Year heading
+        story.append(Paragraph(f"<b>Year {year.index}</b>", styles["Heading2"]))
+        story.append(Spacer(1, 6))
+
+        for sem in year.semesters:
+            story.append(Paragraph(f"<u>{sem.label}</u>", styles["Heading3"]))
+            table_data = [["Code", "Title", "Unit", "Score", "Grade"]]
+            for course in sem.courses:
+                table_data.append([
+                    course.code,
+                    course.title,
+                    str(course.credit_unit),
+                    str(course.score),
+                    course.grade,
+                ])
+
+            # Add semester table
+            table = Table(table_data, hAlign="LEFT", style=SEMESTER_TABLE_STYLE)
+            story.append(table)
+
+            # Semester GPA
+            story.append(Paragraph(f"<b>Semester GPA:</b> {sem.gpa:.2f}", styles["Normal"]))
+            story.append(Spacer(1, 6))
+
+        # Year GPA summary
+        story.append(Paragraph(f"<b>Year {year.index} GPA:</b> {year.year_gpa:.2f}", styles["Heading3"]))
+        story.append(Spacer(1, 12))
+
+    # --- Overall CGPA ---
+    story.append(Paragraph(f"<b>Total CGPA:</b> {snap.cgpa:.2f}", styles["Heading2"]))
+
+    # Build document
+    doc.build(story)
+
+
+class _LazyStory(list):
+    """A story that takes its next flowable from `source` once the build has used up the last."""
+
+    def __init__(self, source):
+        super().__init__()
+        self._source = source
+
+    def __len__(self):
+        # doc.build() loops while len(story) is non-zero.
+        if not super().__len__():
+            self.extend(islice(self._source, 1))
+        return super().__len__()
+
+
+def render_broadsheet(title, columns, rows, out):
+    """
+    Write a broadsheet PDF to the file-like `out`: A3 landscape, one
+    column per entry of `columns` (the first being the student), with the
+    font shrunk until every column fits across the page. `rows` is read
+    a table at a time, as the pages are laid out.
+    """
+    doc = SimpleDocTemplate(out, pagesize=landscape(A3), leftMargin=28, rightMargin=28,
+                            topMargin=28, bottomMargin=28, title=title)
+    cell = (doc.width - BROADSHEET_NAME_WIDTH) / max(len(columns) - 1, 1)
+    # Headers wrap at spaces; Helvetica averages about 0.6 em per character.
+    header = [columns[0], *(c.replace(" ", "\n") for c in columns[1:])]
+    longest = max((len(word) for c in columns[1:] for word in c.split()), default=1)
+    font_size = max(3.5, min(7, cell / (0.6 * longest)))
+    size = [("FONTSIZE", (0, 0), (-1, -1), font_size), ("LEADING", (0, 0), (-1, -1), font_size * 1.2)]
+    widths = [BROADSHEET_NAME_WIDTH] + [cell] * (len(columns) - 1)
+    rows = iter(rows)
+
+    def flowables():
+        yield Paragraph(escape(title), TITLE_STYLE)
+        empty = True
+        for chunk in iter(lambda: list(islice(rows, BROADSHEET_ROWS_PER_TABLE)), []):
+            empty = False
+            table = Table([header, *chunk], colWidths=widths, repeatRows=1, hAlign="LEFT",
+                          style=BROADSHEET_TABLE_STYLE)
+            table.setStyle(size)
+            yield table
+        if empty:
+            yield Paragraph("No results match.", STYLES["Normal"])
+
+    doc.build(_LazyStory(flowables()))
@@ -0,0 +1,103 @@
+"""
+Maintenance of the stored rollups and ResultSheet.version; writes that
+bypass the Course signals (bulk_create, bulk_update) call these themselves.
+"""
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+
+from . import journal
+from .models import ResultSheet, Year, Semester, Course
+
+BUMP = {"version": F("version") + 1}
+
+
+def bump(**filters):
+    """Bump the version of the sheet(s) matching `filters`, e.g. id=3."""
+    ResultSheet.objects.filter(**filters).update(**BUMP)
+
+
+def apply_delta(semester_id, points, credits):
+    """Shift the totals of a semester and of its year and sheet."""
+    if not points and not credits:
+        bump(years__semesters__id=semester_id)
+        return
+    delta = {
+        "total_points": F("total_points") + points,
+        "total_credits": F("total_credits") + credits,
+    }
+    with transaction.atomic(savepoint=False):
+        Semester.objects.filter(id=semester_id).update(**delta)
+        Year.objects.filter(semesters__id=semester_id).update(**delta)
+        ResultSheet.objects.filter(years__semesters__id=semester_id).update(**delta, **BUMP)
+
+
+def _shift(model, deltas):
+    # One UPDATE for every row of the level, each with its own delta.
+    def per_row(i, output_field):
+        return Case(
+            *(When(id=row_id, then=Value(delta[i])) for row_id, delta in deltas.items()),
+            default=Value(0),
+            output_field=output_field,
+        )
+    model.objects.filter(id__in=deltas).update(
+        total_points=F("total_points") + per_row(0, models.DecimalField(max_digits=10, decimal_places=2)),
+        total_credits=F("total_credits") + per_row(1, models.IntegerField()),
+    )
+
+
+def apply_deltas(sheet_id, semester_deltas, year_of):
+    """
+    Apply {semester_id: (points, credits)} deltas within one sheet with a
+    single UPDATE per level. `year_of` maps each semester to its year.
+    """
+    semester_deltas = {k: v for k, v in semester_deltas.items() if v[0] or v[1]}
+    if not semester_deltas:
+        bump(id=sheet_id)
+        return
+    year_deltas = {}
+    for sem_id, (points, credits) in semester_deltas.items():
+        totals = year_deltas.setdefault(year_of[sem_id], [0, 0])
+        totals[0] += points
+        totals[1] += credits
+    with transaction.atomic(savepoint=False):
+        _shift(Semester, semester_deltas)
+        _shift(Year, year_deltas)
+        ResultSheet.objects.filter(id=sheet_id).update(
+            total_points=F("total_points") + sum(p for p, _ in year_deltas.values()),
+            total_credits=F("total_credits") + sum(c for _, c in year_deltas.values()),
+            **BUMP,
+        )
+
+
+def recompute_sheet(sheet_id):
+    """Rebuild every rollup of a sheet from its courses."""
+    table = ResultSheet.objects.get(id=sheet_id).grade_table
+    sem_totals = {}
+    year_of = dict(Semester.objects.filter(sheet_id=sheet_id).values_list("id", "year_id"))
+    for sem_id in year_of:
+        sem_totals[sem_id] = [0, 0]
+    for course in Course.objects.filter(semester_id__in=year_of.keys()):
+        course.grade_table = table
+        points, credits = course.rollup_contribution()
+        sem_totals[course.semester_id][0] += points
+        sem_totals[course.semester_id][1] += credits
+
+    year_totals = {}
+    for sem_id, (points, credits) in sem_totals.items():
+        totals = year_totals.setdefault(year_of[sem_id], [0, 0])
+        totals[0] += points
+        totals[1] += credits
+
+    with transaction.atomic(savepoint=False):
+        for sem_id, (points, credits) in sem_totals.items():
+            Semester.objects.filter(id=sem_id).update(total_points=points, total_credits=credits)
+        for year_id in Year.objects.filter(sheet_id=sheet_id).values_list("id", flat=True):
+            points, credits = year_totals.get(year_id, (0, 0))
+            Year.objects.filter(id=year_id).update(total_points=points, total_credits=credits)
+        ResultSheet.objects.filter(id=sheet_id).update(
+            total_points=sum(p for p, _ in year_totals.values()),
+            total_credits=sum(c for _, c in year_totals.values()),
+            **BUMP,
+        )
+        # Every grade may have moved: clients reload the sheet.
+        journal.record_bumped([journal.change("sheet", "resync", sheet_id)], id=sheet_id)
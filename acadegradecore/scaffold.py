@@ -0,0 +1,123 @@
+"""
+Creation of result sheets with their years, semesters and (in "zeros"
+mode) placeholder courses: one bulk INSERT per level, in one transaction.
+"""
+from django.db import transaction
+
+from . import events, grading
+from .models import GradingScale, ResultSheet, Year, Semester, Course
+
+PLACEHOLDER_COURSE = {"code": "C code 1", "title": "C title 1", "credit_unit": 1, "incourse": 0, "exam": 0}
+# The dashboard form's limits; a sheet is scaffolded with every semester.
+MAX_YEARS_OF_STUDY = 10
+MAX_SEMESTERS_PER_YEAR = 4
+
+
+class InvalidSheet(ValueError):
+    pass
+
+
+def _count(payload, field, default, maximum):
+    try:
+        value = int(payload.get(field, default))
+    except (TypeError, ValueError):
+        raise InvalidSheet(f"{field} must be an integer")
+    if not 1 <= value <= maximum:
+        raise InvalidSheet(f"{field} must be between 1 and {maximum}")
+    return value
+
+
+def year_label(entry_year, index):
+    """ "2021/2022" and 2 -> "2022/2023 Year 2"; "Year 2" without a parseable entry year."""
+    entry = (entry_year or "").strip()
+    if entry and '/' in entry:
+        try:
+            left = int(entry.split('/')[0]) + (index - 1)
+            return f"{left}/{left + 1} Year {index}"
+        except ValueError:
+            pass
+    return f"Year {index}"
+
+
+def semester_label(index):
+    return f"{index}{'st' if index == 1 else 'nd' if index == 2 else 'th'} Semester"
+
+
+def _sheet(owner, payload, scales):
+    scale_id = payload.get("grading_scale")
+    if scale_id and int(scale_id) not in scales:
+        raise GradingScale.DoesNotExist(f"Grading scale {scale_id} not found")
+    return ResultSheet(
+        owner=owner,
+        student_name=payload.get("student_name", "Unnamed"),
+        university=payload.get("university", ""),
+        faculty=payload.get("faculty", ""),
+        department=payload.get("department", ""),
+        years_of_study=_count(payload, "years_of_study", 4, MAX_YEARS_OF_STUDY),
+        semesters_per_year=_count(payload, "semesters_per_year", 2, MAX_SEMESTERS_PER_YEAR),
+        entry_year=payload.get("entry_year", ""),
+        mode=payload.get("mode", "zeros"),
+        grading_scale_id=int(scale_id) if scale_id else None,
+    )
+
+
+def _semester_totals(sheet):
+    """Rollups of a new semester: its placeholder course, if any."""
+    if sheet.mode != "zeros":
+        return 0, 0
+    table = grading.get_table(sheet.grading_scale_id)
+    score = PLACEHOLDER_COURSE["incourse"] + PLACEHOLDER_COURSE["exam"]
+    return PLACEHOLDER_COURSE["credit_unit"] * table.exact_point(score), PLACEHOLDER_COURSE["credit_unit"]
+
+
+def create_sheets(owner, payloads):
+    """
+    Create one sheet per payload (the create_sheet JSON body) for `owner`
+    and return them in order. Raises InvalidSheet for out-of-range sizes.
+    """
+    scale_ids = {int(p["grading_scale"]) for p in payloads if p.get("grading_scale")}
+    scales = set(GradingScale.objects.filter(id__in=scale_ids).values_list("id", flat=True)) if scale_ids else set()
+    sheets = [_sheet(owner, payload, scales) for payload in payloads]
+
+    for sheet in sheets:
+        points, credits = _semester_totals(sheet)
+        semesters = sheet.years_of_study * sheet.semesters_per_year
+        sheet.total_points = points * semesters
+        sheet.total_credits = credits * semesters
+
+    with transaction.atomic():
+        ResultSheet.objects.bulk_create(sheets)
+
+        years = []
+        for sheet in sheets:
+            points, credits = _semester_totals(sheet)
+            for y in range(1, sheet.years_of_study + 1):
+                years.append(Year(
+                    sheet=sheet, index=y, year_label=year_label(sheet.entry_year, y),
+                    total_points=points * sheet.semesters_per_year,
+                    total_credits=credits * sheet.semesters_per_year,
+                ))
+        Year.objects.bulk_create(years)
+
+        semesters = []
+        for year in years:
+            points, credits = _semester_totals(year.sheet)
+            for s in range(1, year.sheet.semesters_per_year + 1):
+                semesters.append(Semester(
+                    year=year, sheet=year.sheet, owner_id=year.sheet.owner_id, index=s, label=semester_label(s),
+                    total_points=points, total_credits=credits,
+                ))
+        Semester.objects.bulk_create(semesters)
+
+        courses = [
+            Course(semester=sem, sheet_id=sem.sheet_id, owner_id=sem.owner_id, **PLACEHOLDER_COURSE)
+            for sem in semesters if sem.year.sheet.mode == "zeros"
+        ]
+        Course.objects.bulk_create(courses)
+
+        for sheet in sheets:
+            events.publish_on_commit(owner.id, {
+                "type": "sheet", "action": "insert", "sheet_id": sheet.id, "version": sheet.version,
+            })
+
+    return sheets
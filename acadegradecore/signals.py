@@ -0,0 +1,178 @@
+import threading
+
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import events, grading, journal, middleware, rollups, transcripts
+from .models import GradingScale, GradeBand, ResultSheet, Year, Semester, Course, UserProfile
+
+
+def _deleted_model(origin):
+    """Model whose delete() started a (possibly cascading) deletion."""
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    points, credits = instance.rollup_contribution()
+    loaded = (instance.semester_id, 0, 0) if created else instance.loaded_contribution()
+
+    if loaded is None:
+        # Saved from an instance that was not loaded from the database, so
+        # its previous contribution is unknown; rebuild from the rows.
+        rollups.recompute_sheet(instance.sheet_id)
+    else:
+        def entry():
+            return journal.change(
+                "course", "insert" if created else "update", instance.id,
+                journal.course_data(instance, instance.grade_table),
+            )
+
+        old_semester_id, old_points, old_credits = loaded
+        if old_semester_id != instance.semester_id:
+            rollups.apply_delta(old_semester_id, -old_points, -old_credits)
+            journal.record_bumped([entry()], years__semesters__id=old_semester_id)
+            old_points = old_credits = 0
+        rollups.apply_delta(instance.semester_id, points - old_points, credits - old_credits)
+        journal.record_bumped([entry()], years__semesters__id=instance.semester_id)
+
+    instance.remember_loaded()
+
+
+@receiver(post_delete, sender=Course)
+def course_deleted(sender, instance, origin=None, **kwargs):
+    # When a semester, year or sheet is being deleted its own receiver
+    # subtracts the whole subtree at once.
+    if origin is not None and _deleted_model(origin) is not Course:
+        return
+    semester_id, points, credits = (
+        instance.loaded_contribution() or (instance.semester_id, *instance.rollup_contribution())
+    )
+    rollups.apply_delta(semester_id, -points, -credits)
+    journal.record_bumped(
+        [journal.change("course", "delete", instance.id, {"semester_id": semester_id})],
+        years__semesters__id=semester_id,
+    )
+
+
+@receiver(post_delete, sender=Semester)
+def semester_deleted(sender, instance, origin=None, **kwargs):
+    if origin is not None and _deleted_model(origin) is not Semester:
+        return
+    delta = {
+        "total_points": F("total_points") - instance.total_points,
+        "total_credits": F("total_credits") - instance.total_credits,
+    }
+    Year.objects.filter(id=instance.year_id).update(**delta)
+    ResultSheet.objects.filter(years__id=instance.year_id).update(**delta, **rollups.BUMP)
+    journal.record_bumped(
+        [journal.change("semester", "delete", instance.id, {"year_id": instance.year_id})],
+        years__id=instance.year_id,
+    )
+
+
+@receiver(post_delete, sender=Year)
+def year_deleted(sender, instance, origin=None, **kwargs):
+    if origin is not None and _deleted_model(origin) is not Year:
+        return
+    ResultSheet.objects.filter(id=instance.sheet_id).update(
+        total_points=F("total_points") - instance.total_points,
+        total_credits=F("total_credits") - instance.total_credits,
+        **rollups.BUMP,
+    )
+    journal.record_bumped([journal.change("year", "delete", instance.id)], id=instance.sheet_id)
+
+
+@receiver(post_save, sender=Semester)
+def semester_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    rollups.bump(years__id=instance.year_id)
+    journal.record_bumped([journal.change(
+        "semester", "insert" if created else "update", instance.id,
+        {"year_id": instance.year_id, "index": instance.index, "label": instance.label},
+    )], years__id=instance.year_id)
+
+
+@receiver(post_save, sender=Year)
+def year_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    rollups.bump(id=instance.sheet_id)
+    journal.record_bumped([journal.change(
+        "year", "insert" if created else "update", instance.id,
+        {"index": instance.index, "year_label": instance.year_label},
+    )], id=instance.sheet_id)
+
+
+@receiver(post_save, sender=ResultSheet)
+def sheet_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        instance._loaded_grading_scale_id = instance.grading_scale_id
+        instance._loaded_owner_id = instance.owner_id
+        return
+    loaded = getattr(instance, "_loaded_grading_scale_id", instance.grading_scale_id)
+    if loaded != instance.grading_scale_id:
+        rollups.recompute_sheet(instance.id)
+    else:
+        rollups.bump(id=instance.id)
+        journal.record_bumped([journal.change("sheet", "update", instance.id, {
+            field: getattr(instance, field) for field in journal.SHEET_FIELDS
+        })], id=instance.id)
+    # Semesters and courses carry copies of the owner; an unknown previous
+    # owner may differ too.
+    if getattr(instance, "_loaded_owner_id", None) != instance.owner_id:
+        Semester.objects.filter(sheet_id=instance.id).update(owner_id=instance.owner_id)
+        Course.objects.filter(sheet_id=instance.id).update(owner_id=instance.owner_id)
+    instance._loaded_grading_scale_id = instance.grading_scale_id
+    instance._loaded_owner_id = instance.owner_id
+    instance.version += 1
+
+
+@receiver(post_delete, sender=ResultSheet)
+def sheet_deleted(sender, instance, **kwargs):
+    events.publish_on_commit(instance.owner_id, {"type": "sheet", "action": "delete", "sheet_id": instance.id})
+    sheet_id = instance.id
+    transaction.on_commit(lambda: transcripts.forget(sheet_id))
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def profile_changed(sender, instance, **kwargs):
+    # Its uid may have moved (firebase_login_sync) or gone.
+    middleware.forget(instance.id)
+
+
+# Scales changed in this thread's open transaction, regraded once on commit.
+_changed_scales = threading.local()
+
+
+def _regrade_changed_scales():
+    scale_ids = getattr(_changed_scales, "ids", None)
+    if not scale_ids:
+        return
+    _changed_scales.ids = set()
+    grading.invalidate()
+    for sheet_id in ResultSheet.objects.filter(grading_scale_id__in=scale_ids).values_list("id", flat=True):
+        rollups.recompute_sheet(sheet_id)
+
+
+@receiver([post_save, post_delete], sender=GradingScale)
+@receiver([post_save, post_delete], sender=GradeBand)
+def scale_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    grading.invalidate()
+    scale_ids = getattr(_changed_scales, "ids", None)
+    if scale_ids is None:
+        scale_ids = _changed_scales.ids = set()
+    scale_ids.add(instance.id if sender is GradingScale else instance.scale_id)
+    # Regrade once the new bands are committed and visible. An admin save
+    # touching many bands queues a callback each; the first regrades every
+    # scale collected, the rest find nothing left to do.
+    transaction.on_commit(_regrade_changed_scales)
@@ -0,0 +1,196 @@
+"""
+Immutable snapshots of a result sheet, read with one query and shared by
+the JSON, PDF and admin renderers.
+"""
+from collections import namedtuple
+
+from . import grading
+from .models import ResultSheet, _gpa
+
+HEADER_FIELDS = (
+    "id", "owner_id", "student_name", "university", "faculty", "department",
+    "years_of_study", "semesters_per_year", "entry_year", "mode", "grading_scale_id", "version",
+)
+
+# Header plus the stored rollups, enough for a header-only snapshot.
+HEADER_VALUES = HEADER_FIELDS + ("total_points", "total_credits")
+
+TREE_FIELDS = (
+    "years__id", "years__index", "years__year_label",
+    "years__semesters__id", "years__semesters__index", "years__semesters__label",
+    "years__semesters__courses__id", "years__semesters__courses__code",
+    "years__semesters__courses__title", "years__semesters__courses__credit_unit",
+    "years__semesters__courses__incourse", "years__semesters__courses__exam",
+)
+
+
+class CourseSnapshot(namedtuple("CourseSnapshot", (
+    "id", "code", "title", "credit_unit", "incourse", "exam", "score", "grade", "grade_point",
+))):
+    __slots__ = ()
+
+
+class SemesterSnapshot(namedtuple("SemesterSnapshot", (
+    "id", "index", "label", "total_points", "total_credits", "courses",
+))):
+    __slots__ = ()
+
+    @property
+    def gpa(self):
+        return _gpa(self.total_points, self.total_credits)
+
+
+class YearSnapshot(namedtuple("YearSnapshot", (
+    "id", "index", "year_label", "total_points", "total_credits", "semesters",
+))):
+    __slots__ = ()
+
+    @property
+    def year_gpa(self):
+        return _gpa(self.total_points, self.total_credits)
+
+
+class SheetSnapshot(namedtuple("SheetSnapshot", HEADER_FIELDS + ("total_points", "total_credits", "years"))):
+    """A sheet and, unless built by header_from_row(), its full year tree."""
+    __slots__ = ()
+
+    @property
+    def cgpa(self):
+        return _gpa(self.total_points, self.total_credits)
+
+
+def _freeze_semester(sem_row, courses, table):
+    sem_id, index, label = sem_row
+    frozen = []
+    total_points = 0
+    total_credits = 0
+    for course_id, code, title, credit_unit, incourse, exam in courses:
+        score = incourse + exam
+        grade, grade_point = table.lookup(score)
+        total_points += credit_unit * table.exact_point(score)
+        total_credits += credit_unit
+        frozen.append(CourseSnapshot(course_id, code, title, credit_unit, incourse, exam, score, grade, grade_point))
+    return SemesterSnapshot(sem_id, index, label, total_points, total_credits, tuple(frozen))
+
+
+def _freeze_year(year_row, semesters):
+    year_id, index, label = year_row
+    semesters = tuple(semesters)
+    return YearSnapshot(
+        year_id, index, label,
+        sum(s.total_points for s in semesters), sum(s.total_credits for s in semesters),
+        semesters,
+    )
+
+
+def load(sheet_id, **filters):
+    """
+    Snapshot of one sheet, in one query. Extra `filters` (e.g. owner__uid)
+    restrict which sheet may be loaded; raises ResultSheet.DoesNotExist.
+    """
+    for snap in _freeze(ResultSheet.objects.filter(id=sheet_id, **filters)):
+        return snap
+    raise ResultSheet.DoesNotExist(f"ResultSheet {sheet_id} not found")
+
+
+def load_many(sheet_ids, **filters):
+    """{sheet id: snapshot} of those of `sheet_ids` matching `filters`, in one query."""
+    return {snap.id: snap for snap in _freeze(ResultSheet.objects.filter(id__in=sheet_ids, **filters))}
+
+
+def _freeze(sheets):
+    rows = (
+        sheets.order_by("id", "years__index", "years__semesters__index", "years__semesters__courses__id")
+        .values_list(*HEADER_FIELDS, *TREE_FIELDS)
+    )
+    header = None
+    years = []
+    year_row, semesters = None, []
+    sem_row, courses = None, []
+    table = None
+    n = len(HEADER_FIELDS)
+
+    def finish():
+        if sem_row is not None:
+            semesters.append(_freeze_semester(sem_row, courses, table))
+        if year_row is not None:
+            years.append(_freeze_year(year_row, semesters))
+        frozen = tuple(years)
+        return SheetSnapshot(
+            *header,
+            total_points=sum(y.total_points for y in frozen),
+            total_credits=sum(y.total_credits for y in frozen),
+            years=frozen,
+        )
+
+    for row in rows:
+        if header is None or row[0] != header[0]:
+            if header is not None:
+                yield finish()
+            header = row[:n]
+            table = grading.get_table(header[HEADER_FIELDS.index("grading_scale_id")])
+            years = []
+            year_row, semesters = None, []
+            sem_row, courses = None, []
+        tree = row[n:]
+        if tree[0] is None:
+            continue  # sheet without years
+        if year_row is None or tree[0] != year_row[0]:
+            if sem_row is not None:
+                semesters.append(_freeze_semester(sem_row, courses, table))
+            if year_row is not None:
+                years.append(_freeze_year(year_row, semesters))
+            year_row, semesters = tree[0:3], []
+            sem_row, courses = None, []
+        if tree[3] is None:
+            continue  # year without semesters
+        if sem_row is None or tree[3] != sem_row[0]:
+            if sem_row is not None:
+                semesters.append(_freeze_semester(sem_row, courses, table))
+            sem_row, courses = tree[3:6], []
+        if tree[6] is not None:
+            courses.append(tree[6:12])
+
+    if header is not None:
+        yield finish()
+
+
+def header_from_row(row):
+    """Header-only snapshot (years=()) from a row starting with HEADER_VALUES."""
+    return SheetSnapshot(*row[:len(HEADER_VALUES)], years=())
+
+
+def header_dict(snap):
+    return {
+        "id": snap.id,
+        "student_name": snap.student_name,
+        "university": snap.university,
+        "faculty": snap.faculty,
+        "department": snap.department,
+        "years_of_study": snap.years_of_study,
+        "semesters_per_year": snap.semesters_per_year,
+        "entry_year": snap.entry_year,
+        "mode": snap.mode,
+        "grading_scale": snap.grading_scale_id,
+        "version": snap.version,
+        "cgpa": snap.cgpa,
+    }
+
+
+def as_dict(snap):
+    """JSON shape served by /api/sheet/<id>/."""
+    data = header_dict(snap)
+    data["years"] = [
+        {
+            "id": year.id, "index": year.index, "year_label": year.year_label, "year_gpa": year.year_gpa,
+            "semesters": [
+                {
+                    "id": sem.id, "index": sem.index, "label": sem.label, "gpa": sem.gpa,
+                    "courses": [c._asdict() for c in sem.courses],
+                }
+                for sem in year.semesters
+            ],
+        }
+        for year in snap.years
+    ]
+    return data
@@ -1,3 +1,1353 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from . import events, firebase, grading, jobs, middleware, snapshot, tokens, transcripts
+from .models import UserProfile, ResultSheet, Year, Semester, Course, GradingScale, GradeBand, SheetChange, _gpa
+
+
+def setUpModule():
+    # Keep test transcripts out of the real cache: they are named after
+    # sheet ids and versions, which every test database reuses.
+    global _transcripts
+    _transcripts = tempfile.TemporaryDirectory()
+    override_settings(TRANSCRIPT_CACHE_DIR=_transcripts.name).enable()
+
+
+def tearDownModule():
+    _transcripts.cleanup()
+
+
+def make_sheet(years=2, semesters=2, owner=None):
+    owner = owner or UserProfile.objects.create(uid="uid-1", email="one@example.com")
+    sheet = ResultSheet.objects.create(
+        owner=owner, student_name="Ada", years_of_study=years,
+        semesters_per_year=semesters, entry_year="2021/2022",
+    )
+    for y in range(1, years + 1):
+        year = Year.objects.create(sheet=sheet, index=y, year_label=f"Year {y}")
+        for s in range(1, semesters + 1):
+            Semester.objects.create(year=year, index=s, label=f"Semester {s}")
+    return sheet
+
+
+def sign_in(client, uid="uid-1"):
+    """Open the session firebase_login_sync would for `uid`."""
+    session = client.session
+    session[middleware.SESSION_UID] = uid
+    session.save()
+
+
+async def asign_in(client, uid="uid-1"):
+    session = await client.asession()
+    await session.aset(middleware.SESSION_UID, uid)
+    await session.asave()
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.sheet = make_sheet()
+        self.year = self.sheet.years.get(index=1)
+        self.sem = self.year.semesters.get(index=1)
+
+    def totals(self, obj):
+        obj.refresh_from_db()
+        return obj.total_points, obj.total_credits
+
+    def test_create_update_delete(self):
+        a = Course.objects.create(semester=self.sem, credit_unit=3, incourse=30, exam=45)  # A
+        Course.objects.create(semester=self.sem, credit_unit=2, incourse=20, exam=32)      # C
+        self.assertEqual(self.totals(self.sem), (21, 5))
+        self.assertEqual(self.totals(self.sheet), (21, 5))
+
+        a = Course.objects.get(id=a.id)
+        a.exam = 10  # 40 -> E
+        a.save()
+        self.assertEqual(self.totals(self.year), (9, 5))
+
+        a.delete()
+        self.assertEqual(self.totals(self.sem), (6, 2))
+        self.assertEqual(ResultSheet.objects.get(id=self.sheet.id).cgpa, 3.0)
+
+    def test_cascading_deletes(self):
+        other = self.year.semesters.get(index=2)
+        Course.objects.create(semester=self.sem, credit_unit=3, incourse=30, exam=45)
+        Course.objects.create(semester=other, credit_unit=1, incourse=30, exam=30)
+        self.assertEqual(self.totals(self.sheet), (19, 4))
+
+        Semester.objects.get(id=self.sem.id).delete()
+        self.assertEqual(self.totals(self.year), (4, 1))
+        self.assertEqual(self.totals(self.sheet), (4, 1))
+
+        self.sheet.years.filter(index=1).delete()
+        self.assertEqual(self.totals(self.sheet), (0, 0))
+
+
+class AggregateQueryTests(TestCase):
+    def test_annotations_match_rollups(self):
+        sheet = make_sheet()
+        for i, sem in enumerate(Semester.objects.filter(year__sheet=sheet)):
+            Course.objects.create(semester=sem, credit_unit=i + 1, incourse=20 + 5 * i, exam=30)
+            Course.objects.create(semester=sem, credit_unit=2, incourse=10, exam=25 + 8 * i)
+
+        annotated = ResultSheet.objects.with_cgpa().get(id=sheet.id)
+        self.assertEqual(annotated.cgpa, ResultSheet.objects.get(id=sheet.id).cgpa)
+        for year in Year.objects.with_gpa().filter(sheet=sheet):
+            self.assertEqual(year.year_gpa, Year.objects.get(id=year.id).year_gpa)
+        for sem in Semester.objects.with_gpa().filter(year__sheet=sheet):
+            self.assertEqual(sem.gpa, Semester.objects.get(id=sem.id).gpa)
+
+    def test_views_render(self):
+        sheet = make_sheet()
+        sign_in(self.client)
+        Course.objects.create(semester=Semester.objects.filter(year__sheet=sheet).first(), credit_unit=3, incourse=30, exam=40)
+        grading.all_tables()  # compiled once per process, outside the budget
+        with self.assertNumQueries(1):
+            list(ResultSheet.objects.with_cgpa())
+        data = self.client.get(f"/api/sheet/{sheet.id}/").json()
+        self.assertEqual(data["cgpa"], 5.0)
+        self.assertEqual(data["years"][0]["semesters"][0]["gpa"], 5.0)
+        listed = self.client.get("/api/list-sheets/").json()["sheets"]
+        self.assertEqual([(s["id"], s["cgpa"]) for s in listed], [(sheet.id, 5.0)])
+        response = self.client.get(f"/api/sheet/{sheet.id}/pdf/")
+        self.assertEqual(response["Content-Type"], "application/pdf")
+
+
+class GradingScaleTests(TestCase):
+    def setUp(self):
+        self.scale = GradingScale.objects.create(name="4.0")
+        for min_score, grade, point in ((80, "A", 4), (70, "B+", "3.5"), (60, "B", 3), (0, "F", 0)):
+            GradeBand.objects.create(scale=self.scale, min_score=min_score, grade=grade, point=point)
+        self.sheet = make_sheet(years=1, semesters=1)
+        self.sheet.grading_scale = self.scale
+        self.sheet.save()
+        self.sem = Semester.objects.get(year__sheet=self.sheet)
+
+    def test_lookup_and_rollups(self):
+        c = Course.objects.create(semester=self.sem, credit_unit=2, incourse=30, exam=45)
+        c = Course.objects.get(id=c.id)
+        self.assertEqual((c.grade, c.grade_point), ("B+", 3.5))
+        Course.objects.create(semester=self.sem, credit_unit=2, incourse=40, exam=60)
+        self.assertEqual(ResultSheet.objects.get(id=self.sheet.id).cgpa, 3.75)
+        self.assertEqual(ResultSheet.objects.with_cgpa().get(id=self.sheet.id).cgpa, 3.75)
+        self.assertEqual(Semester.objects.with_gpa().get(id=self.sem.id).gpa, 3.75)
+
+    def test_editing_scale_regrades(self):
+        Course.objects.create(semester=self.sem, credit_unit=2, incourse=30, exam=45)
+        with self.captureOnCommitCallbacks(execute=True):
+            GradeBand.objects.filter(scale=self.scale, min_score=70).get().delete()
+        self.assertEqual(Course.objects.get().grade, "B")
+        self.assertEqual(ResultSheet.objects.get(id=self.sheet.id).cgpa, 3.0)
+
+    def test_one_regrade_per_transaction(self):
+        from django.db import transaction
+        from . import rollups
+
+        with mock.patch.object(rollups, "recompute_sheet", wraps=rollups.recompute_sheet) as recompute, \
+                self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.scale.save()
+            for band in GradeBand.objects.filter(scale=self.scale):
+                band.save()
+        self.assertEqual(recompute.call_count, 1)
+
+    def test_table_found_in_one_query(self):
+        c = Course.objects.create(semester=self.sem, credit_unit=2, incourse=30, exam=45)
+        c = Course.objects.get(id=c.id)
+        with self.assertNumQueries(1):
+            self.assertEqual(c.grade, "B+")
+
+    def test_switching_sheet_scale_regrades(self):
+        Course.objects.create(semester=self.sem, credit_unit=2, incourse=30, exam=45)
+        sheet = ResultSheet.objects.get(id=self.sheet.id)
+        sheet.grading_scale = None
+        sheet.save()
+        self.assertEqual(ResultSheet.objects.get(id=self.sheet.id).cgpa, 5.0)
+
+    def test_move_to_sheet_on_another_scale(self):
+        other = make_sheet(years=1, semesters=1, owner=self.sheet.owner)
+        course = Course.objects.create(semester=self.sem, credit_unit=2, incourse=30, exam=45)
+        course = Course.objects.get(id=course.id)
+        course.semester = Semester.objects.get(year__sheet=other)
+        course.save()
+        sheet, other = ResultSheet.objects.get(id=self.sheet.id), ResultSheet.objects.get(id=other.id)
+        self.assertEqual((sheet.total_points, sheet.total_credits), (0, 0))
+        self.assertEqual((other.total_points, other.total_credits), (10, 2))
+        self.assertEqual(Semester.objects.get(id=self.sem.id).total_points, 0)
+
+
+class BatchEngineTests(TestCase):
+    def test_matches_per_object_properties(self):
+        from .gpa_engine import compute_gpas
+
+        scale = GradingScale.objects.create(name="4.0")
+        for min_score, grade, point in ((75, "A", 4), (65, "B", "3.3"), (0, "F", 0)):
+            GradeBand.objects.create(scale=scale, min_score=min_score, grade=grade, point=point)
+        owner = UserProfile.objects.create(uid="adviser", email="adviser@example.com")
+        sheets = [make_sheet(years=2, semesters=2, owner=owner) for _ in range(3)]
+        sheets[1].grading_scale = scale
+        sheets[1].save()
+        for n, sem in enumerate(Semester.objects.filter(year__sheet__in=sheets)):
+            for k in range(n % 3 + 1):
+                Course.objects.create(semester=sem, credit_unit=(n + k) % 4 + 1, incourse=(7 * n + k) % 40, exam=(11 * n + 5 * k) % 61)
+        Semester.objects.filter(year__sheet=sheets[2], index=2).first().courses.all().delete()
+
+        result = compute_gpas(ResultSheet.objects.filter(owner=owner))
+        self.assertEqual(len(result.sheets), 3)
+        for sheet in ResultSheet.objects.filter(owner=owner):
+            self.assertEqual(result.sheets.get(sheet.id, 0), sheet.cgpa)
+            for year in sheet.years.all():
+                self.assertEqual(result.years.get((sheet.id, year.index), 0), year.year_gpa)
+                for sem in year.semesters.all():
+                    self.assertEqual(result.semesters.get((sheet.id, year.index, sem.index), 0), sem.gpa)
+
+
+class SnapshotTests(TestCase):
+    def test_tree_and_rollups(self):
+        from . import snapshot
+
+        sheet = make_sheet()
+        first = Semester.objects.filter(year__sheet=sheet).order_by("year__index", "index").first()
+        Course.objects.create(semester=first, code="MTH101", credit_unit=3, incourse=30, exam=40)
+        Course.objects.create(semester=first, code="PHY101", credit_unit=2, incourse=10, exam=35)
+
+        grading.all_tables()
+        with self.assertNumQueries(1):
+            snap = snapshot.load(sheet.id)
+        self.assertEqual([len(y.semesters) for y in snap.years], [2, 2])
+        sem = snap.years[0].semesters[0]
+        self.assertEqual([c.code for c in sem.courses], ["MTH101", "PHY101"])
+        self.assertEqual((sem.courses[1].grade, sem.courses[1].grade_point), ("D", 2))
+        self.assertEqual(snap.cgpa, ResultSheet.objects.get(id=sheet.id).cgpa)
+        self.assertEqual(snap.years[1].semesters[0].courses, ())
+        with self.assertRaises(AttributeError):
+            snap.cgpa = 0
+
+        empty = make_sheet(years=0, owner=sheet.owner)
+        self.assertEqual(snapshot.load(empty.id).years, ())
+        with self.assertRaises(ResultSheet.DoesNotExist):
+            snapshot.load(sheet.id, owner__uid="someone-else")
+
+    def test_admin_transcript(self):
+        from django.contrib import admin
+
+        sheet = make_sheet(years=1, semesters=1)
+        Course.objects.create(semester=Semester.objects.get(year__sheet=sheet), code="A", credit_unit=3, exam=70)
+        html = admin.site._registry[ResultSheet].transcript(sheet)
+        self.assertEqual(html, "<ul><li>Year 1 Semester 1: 1 courses, 3 credits, GPA 5.00</li></ul><strong>CGPA 5.00</strong>")
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Every API endpoint runs a fixed number of queries however large the
+    sheet is. Raising a budget here needs a reason in the commit.
+
+    Each budget includes the session read that identifies the caller; the
+    caller's profile id is cached per process (warmed in setUp).
+    """
+    SIZES = ((1, 1, 1), (6, 3, 8))   # years, semesters per year, courses per semester
+
+    def setUp(self):
+        grading.all_tables()   # compiled once per process, outside the budgets
+        self.owner = UserProfile.objects.create(uid="uid-1", email="one@example.com")
+        sign_in(self.client)
+        self.client.get("/api/list-sheets/")
+
+    def build(self, years, semesters, courses):
+        sheet = make_sheet(years, semesters, owner=self.owner)
+        for sem in Semester.objects.filter(year__sheet=sheet):
+            for n in range(courses):
+                Course.objects.create(semester=sem, code=f"C{n}", credit_unit=2, incourse=20, exam=30 + n)
+        return sheet
+
+    def assertBudget(self, budget, method, url, payload=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(
+                url, data=json.dumps(payload) if payload is not None else None,
+                content_type="application/json",
+            )
+        self.assertLess(response.status_code, 400, url)
+        self.assertLessEqual(len(ctx), budget, "\n".join(q["sql"] for q in ctx.captured_queries))
+
+    def check(self, budget, request):
+        for size in self.SIZES:
+            with self.subTest(size=size):
+                sheet = self.build(*size)
+                method, url, payload = request(sheet)
+                self.assertBudget(budget, method, url, payload)
+
+    def first_semester(self, sheet):
+        return Semester.objects.filter(year__sheet=sheet).order_by("year__index", "index").first()
+
+    def first_course(self, sheet):
+        return Course.objects.filter(semester=self.first_semester(sheet)).order_by("id").first()
+
+    def test_sheet_detail(self):
+        self.check(2, lambda sheet: ("get", f"/api/sheet/{sheet.id}/", None))
+
+    # The first download renders (version, snapshot); repeats are served
+    # from the transcript cache (version only).
+    def test_export_pdf(self):
+        def download(sheet):
+            return "get", f"/api/sheet/{sheet.id}/pdf/", None
+        self.check(3, download)
+        for sheet in ResultSheet.objects.all():
+            self.assertBudget(2, *download(sheet))
+
+    def test_list_sheets(self):
+        self.check(2, lambda sheet: ("get", "/api/list-sheets/", None))
+
+    def test_course_detail(self):
+        self.check(2, lambda sheet: ("get", f"/api/course/{self.first_course(sheet).id}/", None))
+
+    def test_semester_courses(self):
+        self.check(2, lambda sheet: ("get", f"/api/semester/{self.first_semester(sheet).id}/courses/", None))
+
+    # Single-course writes lock the sheet row and return the new rollups:
+    # savepoint, lock, read, write, one UPDATE per rollup level, the
+    # journal entry, release.
+    def test_add_course(self):
+        self.check(10, lambda sheet: (
+            "post", "/api/add-course/", {"semester_id": self.first_semester(sheet).id, "credit_unit": 3, "exam": 55},
+        ))
+
+    def test_update_course(self):
+        self.check(10, lambda sheet: ("put", f"/api/update-course/{self.first_course(sheet).id}/", {"exam": 10}))
+
+    def test_delete_course(self):
+        def delete_first(sheet):
+            ResultSheet.objects.filter(id=sheet.id).update(mode="available")
+            return "delete", f"/api/delete-course/{self.first_course(sheet).id}/", None
+        self.check(10, delete_first)
+
+    def test_update_sheet(self):
+        # Locked read, UPDATE, version bump, journal entry and the
+        # empty-semester check, in a savepoint.
+        def switch_to_zeros(sheet):
+            ResultSheet.objects.filter(id=sheet.id).update(mode="available")
+            return "put", f"/api/update-sheet/{sheet.id}/", {"mode": "zeros"}
+        self.check(9, switch_to_zeros)
+
+    def test_create_sheet(self):
+        self.check(8, lambda sheet: ("post", "/api/create-sheet/", {
+            "years_of_study": sheet.years_of_study, "semesters_per_year": sheet.semesters_per_year,
+        }))
+
+    def test_create_sheets(self):
+        # One INSERT per level, as long as a level fits in one batch of the
+        # backend's parameter limit (~140 course rows on SQLite).
+        self.check(8, lambda sheet: ("post", "/api/create-sheets/", {
+            "sheets": [{"years_of_study": sheet.years_of_study}] * 5,
+        }))
+
+    def test_batch_add_courses(self):
+        def replace_first(sheet):
+            sem = self.first_semester(sheet)
+            kept = [{"id": c.id, "code": c.code, "credit_unit": c.credit_unit, "incourse": c.incourse, "exam": 60}
+                    for c in sem.courses.order_by("id")[1:]]
+            return "post", "/api/batch-add-courses/", {
+                "semester_id": sem.id, "courses": kept + [{"code": "NEW", "credit_unit": 2, "exam": 50}] * 3,
+            }
+        self.check(14, replace_first)
+
+    def test_mutate_sheet(self):
+        def mixed_ops(sheet):
+            semesters = Semester.objects.filter(year__sheet=sheet)
+            courses = list(Course.objects.filter(semester__year__sheet=sheet).order_by("id")[:2])
+            ops = [{"op": "add", "semester_id": sem.id, "credit_unit": 2, "exam": 50} for sem in semesters]
+            ops.append({"op": "update", "id": courses[0].id, "exam": 70})
+            ops.append({"op": "delete", "id": courses[-1].id})
+            return "post", f"/api/sheet/{sheet.id}/mutate/", {"ops": ops}
+        self.check(14, mixed_ops)
+
+    def test_sheet_changes(self):
+        def after_an_edit(sheet):
+            since = ResultSheet.objects.get(id=sheet.id).version
+            course = self.first_course(sheet)
+            course.exam += 1
+            course.save()
+            return "get", f"/api/sheet/{sheet.id}/changes/?since={since}", None
+        self.check(4, after_an_edit)
+
+    def test_delete_sheet(self):
+        # The cascade deletes courses in batches of 100 rows: one extra
+        # DELETE for the 144-course sheet. The locked read for If-Match
+        # runs in a savepoint; the journal goes with the sheet.
+        self.check(13, lambda sheet: ("delete", f"/api/delete-sheet/{sheet.id}/", None))
+
+
+class ListSheetsTests(TestCase):
+    def setUp(self):
+        self.owner = UserProfile.objects.create(uid="uid-1", email="one@example.com")
+        self.sheets = []
+        for n in range(5):
+            sheet = make_sheet(years=1, semesters=1, owner=self.owner)
+            sheet.department = "Physics" if n % 2 else "Maths"
+            sheet.save()
+            Course.objects.create(semester=Semester.objects.get(year__sheet=sheet), credit_unit=2, incourse=10 * n, exam=30)
+            self.sheets.append(sheet)
+        sign_in(self.client)
+
+    def pages(self, **params):
+        ids, cursor = [], None
+        while True:
+            query = {"limit": 2, **params}
+            if cursor:
+                query["cursor"] = cursor
+            data = self.client.get("/api/list-sheets/", query).json()
+            ids.append([s["id"] for s in data["sheets"]])
+            cursor = data["next_cursor"]
+            if not cursor:
+                return ids
+
+    def test_keyset_pages(self):
+        ids = [s.id for s in self.sheets]
+        self.assertEqual(self.pages(), [ids[0:2], ids[2:4], ids[4:]])
+        self.assertEqual(sum(self.pages(sort="-created"), []), ids[::-1])
+
+    def test_sort_by_cgpa_and_filter(self):
+        by_cgpa = sorted(self.sheets, key=lambda s: (ResultSheet.objects.get(id=s.id).cgpa, s.id))
+        self.assertEqual(sum(self.pages(sort="cgpa"), []), [s.id for s in by_cgpa])
+        physics = [s.id for s in self.sheets if s.department == "Physics"]
+        self.assertEqual(sum(self.pages(department="Physics"), []), physics)
+
+    def test_summary_covers_every_page(self):
+        data = self.client.get("/api/list-sheets/", {"limit": 2, "summary": 1}).json()
+        cgpas = [ResultSheet.objects.get(id=s.id).cgpa for s in self.sheets]
+        self.assertEqual(len(data["sheets"]), 2)
+        self.assertEqual(data["summary"], {
+            "count": 5, "avg_cgpa": round(sum(cgpas) / 5, 2), "best_cgpa": max(cgpas),
+        })
+        self.assertNotIn("summary", self.client.get("/api/list-sheets/").json())
+
+    def test_bad_cursor(self):
+        response = self.client.get("/api/list-sheets/", {"cursor": "nonsense"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ScaffoldTests(TestCase):
+    def test_bulk_scaffold(self):
+        from . import rollups
+
+        owner = UserProfile.objects.create(uid="uid-1", email="one@example.com")
+        sign_in(self.client)
+        response = self.client.post("/api/create-sheets/", data=json.dumps({"sheets": [
+            {"student_name": "Ada", "years_of_study": 3, "semesters_per_year": 3, "entry_year": "2021/2022"},
+            {"student_name": "Ben", "years_of_study": 2, "mode": "available"},
+        ]}), content_type="application/json")
+        ada, ben = response.json()["sheet_ids"]
+
+        self.assertEqual(
+            list(Year.objects.filter(sheet_id=ada).values_list("year_label", flat=True)),
+            ["2021/2022 Year 1", "2022/2023 Year 2", "2023/2024 Year 3"],
+        )
+        self.assertEqual(Semester.objects.filter(year__sheet_id=ada).count(), 9)
+        self.assertEqual(Course.objects.filter(semester__year__sheet_id=ada).count(), 9)
+        self.assertEqual(Course.objects.filter(semester__year__sheet_id=ben).count(), 0)
+
+        stored = [(s.total_points, s.total_credits) for s in Semester.objects.filter(year__sheet__owner=owner)]
+        rollups.recompute_sheet(ada)
+        rollups.recompute_sheet(ben)
+        self.assertEqual(stored, [(s.total_points, s.total_credits) for s in Semester.objects.filter(year__sheet__owner=owner)])
+        self.assertEqual(ResultSheet.objects.get(id=ada).total_credits, 9)
+
+    def test_failure_leaves_nothing(self):
+        UserProfile.objects.create(uid="uid-1", email="one@example.com")
+        sign_in(self.client)
+        response = self.client.post("/api/create-sheets/", data=json.dumps({"sheets": [
+            {"student_name": "Ada"}, {"student_name": "Ben", "years_of_study": "four"},
+        ]}), content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ResultSheet.objects.exists())
+
+    def test_sizes_are_bounded(self):
+        UserProfile.objects.create(uid="uid-1", email="one@example.com")
+        sign_in(self.client)
+        for fields in ({"years_of_study": 11}, {"semesters_per_year": 5}, {"years_of_study": 0}):
+            response = self.client.post("/api/create-sheets/", data=json.dumps({"sheets": [
+                {"student_name": "Ada", **fields},
+            ]}), content_type="application/json")
+            self.assertEqual(response.status_code, 400, fields)
+        response = self.client.post("/api/create-sheet/", data=json.dumps({"semesters_per_year": 1000}),
+                                    content_type="application/json")
+        self.assertEqual(response.json(), {"error": "semesters_per_year must be between 1 and 4"})
+        self.assertFalse(ResultSheet.objects.exists())
+
+
+class OwnerKeyTests(TestCase):
+    def assertKeysMatch(self, sheet):
+        sheet.refresh_from_db()
+        for row in [*Semester.objects.filter(year__sheet=sheet), *Course.objects.filter(semester__year__sheet=sheet)]:
+            self.assertEqual((row.sheet_id, row.owner_id), (sheet.id, sheet.owner_id), row)
+
+    def test_filled_on_every_write_path(self):
+        UserProfile.objects.create(uid="uid-1", email="one@example.com")
+        sign_in(self.client)
+        sheet_id, = self.client.post("/api/create-sheets/", data=json.dumps({"sheets": [
+            {"student_name": "Ada", "years_of_study": 2, "semesters_per_year": 2},
+        ]}), content_type="application/json").json()["sheet_ids"]
+        sheet = ResultSheet.objects.get(id=sheet_id)
+        sem = Semester.objects.filter(year__sheet=sheet).first()
+        self.client.post("/api/add-course/", data=json.dumps({"semester_id": sem.id, "code": "A"}),
+                         content_type="application/json")
+        Course.objects.create(semester=sem, code="B")
+        self.assertKeysMatch(sheet)
+
+    def test_follow_moves_and_owner_changes(self):
+        sheet, other = make_sheet(), make_sheet(owner=UserProfile.objects.create(uid="uid-2", email="two@example.com"))
+        course = Course.objects.create(semester=Semester.objects.filter(year__sheet=sheet).first(), code="A")
+        course.semester = Semester.objects.filter(year__sheet=other).first()
+        course.save()
+        self.assertKeysMatch(other)
+
+        sheet.owner = other.owner
+        sheet.save()
+        self.assertKeysMatch(sheet)
+
+    def test_years_and_semesters_stay_on_their_sheet(self):
+        from django.contrib import admin
+
+        sheet = make_sheet()
+        other = make_sheet(owner=sheet.owner)
+        semester = Semester.objects.filter(year__sheet=sheet).first()
+        Course.objects.create(semester=semester, code="A", credit_unit=3, exam=70)
+        semester.year = Year.objects.filter(sheet=other).first()
+        with self.assertRaises(ValueError):
+            semester.save()
+        year = Year.objects.filter(sheet=sheet).first()
+        year.sheet = other
+        with self.assertRaises(ValueError):
+            year.save()
+        sheet.refresh_from_db()
+        self.assertEqual((sheet.total_points, sheet.total_credits), (15, 3))
+        self.assertKeysMatch(sheet)
+
+        self.assertEqual(admin.site._registry[Semester].get_readonly_fields(None, semester), ("year",))
+        self.assertEqual(admin.site._registry[Year].get_readonly_fields(None, year), ("sheet",))
+
+    def test_course_endpoints_check_owner(self):
+        sheet = make_sheet()
+        course = Course.objects.create(semester=Semester.objects.filter(year__sheet=sheet).first(), code="A")
+        UserProfile.objects.create(uid="uid-2", email="two@example.com")
+        sign_in(self.client, "uid-2")
+        self.assertEqual(self.client.get(f"/api/course/{course.id}/").status_code, 404)
+        self.assertEqual(self.client.get(f"/api/semester/{course.semester_id}/courses/").json(), {"courses": []})
+        response = self.client.put(f"/api/update-course/{course.id}/", data=json.dumps({"exam": 70}),
+                                   content_type="application/json")
+        self.assertEqual(response.status_code, 404)
+        sign_in(self.client)
+        self.assertEqual(self.client.get(f"/api/course/{course.id}/").json()["code"], "A")
+
+
+class BatchCoursesTests(TestCase):
+    def setUp(self):
+        self.sheet = make_sheet()
+        self.sem = Semester.objects.get(year__sheet=self.sheet, year__index=1, index=1)
+        self.a = Course.objects.create(semester=self.sem, code="A", credit_unit=3, incourse=30, exam=45)
+        self.b = Course.objects.create(semester=self.sem, code="B", credit_unit=2, incourse=20, exam=32)
+        self.c = Course.objects.create(semester=self.sem, code="C", credit_unit=1, incourse=10, exam=10)
+        sign_in(self.client)
+
+    def batch(self, courses):
+        return self.client.post("/api/batch-add-courses/", data=json.dumps({
+            "semester_id": self.sem.id, "courses": courses,
+        }), content_type="application/json")
+
+    def test_diff_keeps_ids_and_rollups(self):
+        from . import rollups
+
+        response = self.batch([
+            {"id": self.a.id, "code": "A", "credit_unit": 3, "incourse": 30, "exam": 45},   # unchanged
+            {"id": self.b.id, "code": "B2", "credit_unit": 2, "incourse": 30, "exam": 40},  # updated
+            {"code": "D", "credit_unit": 4, "incourse": "", "exam": ""},                    # added
+        ]).json()
+
+        ids = [c["id"] for c in response["courses"]]
+        self.assertEqual(ids[:2], [self.a.id, self.b.id])
+        self.assertFalse(Course.objects.filter(id=self.c.id).exists())
+        self.assertEqual(list(self.sem.courses.order_by("id").values_list("id", flat=True)), ids)
+        self.assertEqual(response["courses"][1]["grade"], "A")
+
+        stored = {
+            "semester": Semester.objects.get(id=self.sem.id),
+            "year": Year.objects.get(id=self.sem.year_id),
+            "sheet": ResultSheet.objects.get(id=self.sheet.id),
+        }
+        for level, row in stored.items():
+            self.assertEqual(response[level]["total_points"], float(row.total_points), level)
+            self.assertEqual(response[level]["total_credits"], row.total_credits, level)
+        rollups.recompute_sheet(self.sheet.id)
+        self.sheet.refresh_from_db()
+        self.assertEqual(
+            (self.sheet.total_points, self.sheet.total_credits),
+            (stored["sheet"].total_points, stored["sheet"].total_credits),
+        )
+
+    def test_foreign_course_id_rejected(self):
+        other = Semester.objects.get(year__sheet=self.sheet, year__index=2, index=1)
+        stranger = Course.objects.create(semester=other, code="X", credit_unit=2, exam=50)
+        response = self.batch([{"id": stranger.id, "code": "X"}])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.sem.courses.count(), 3)
+
+
+class MutateSheetTests(TestCase):
+    def setUp(self):
+        self.sheet = make_sheet()
+        ResultSheet.objects.filter(id=self.sheet.id).update(mode="available")
+        self.s1, self.s2 = Semester.objects.filter(year__sheet=self.sheet).order_by("year__index", "index")[1:3]
+        self.a = Course.objects.create(semester=self.s1, code="A", credit_unit=3, incourse=30, exam=45)
+        self.b = Course.objects.create(semester=self.s2, code="B", credit_unit=2, incourse=20, exam=32)
+        sign_in(self.client)
+
+    def mutate(self, ops):
+        return self.client.post(f"/api/sheet/{self.sheet.id}/mutate/", data=json.dumps({
+            "ops": ops,
+        }), content_type="application/json")
+
+    def test_ordered_ops(self):
+        from . import rollups
+
+        response = self.mutate([
+            {"op": "add", "ref": "x", "semester_id": self.s1.id, "code": "X", "credit_unit": 2, "exam": 40},
+            {"op": "add", "ref": "y", "semester_id": self.s2.id, "code": "Y", "credit_unit": 1},
+            {"op": "update", "ref": "x", "incourse": 25},
+            {"op": "delete", "ref": "y"},
+            {"op": "update", "id": self.a.id, "exam": 20},
+            {"op": "delete", "id": self.b.id},
+        ]).json()
+
+        x = Course.objects.get(id=response["ids"]["x"])
+        self.assertEqual((x.code, x.incourse, x.exam), ("X", 25, 40))
+        self.assertEqual(list(response["ids"]), ["x"])
+        self.assertEqual(Course.objects.get(id=self.a.id).exam, 20)
+        self.assertFalse(Course.objects.filter(id=self.b.id).exists())
+        self.assertEqual(response["deleted"], [self.b.id])
+
+        rollups.recompute_sheet(self.sheet.id)
+        for key, model in (("semesters", Semester), ("years", Year)):
+            for rollup in response[key]:
+                row = model.objects.get(id=rollup["id"])
+                self.assertEqual((rollup["total_points"], rollup["total_credits"]), (float(row.total_points), row.total_credits))
+        self.sheet.refresh_from_db()
+        self.assertEqual(response["sheet"]["total_credits"], self.sheet.total_credits)
+        self.assertEqual(response["sheet"]["gpa"], self.sheet.cgpa)
+
+    def test_rejects_foreign_and_unknown(self):
+        UserProfile.objects.create(uid="uid-2", email="two@example.com")
+        sign_in(self.client, "uid-2")
+        self.assertEqual(self.mutate([{"op": "delete", "id": self.a.id}]).status_code, 404)
+        sign_in(self.client)
+        self.assertEqual(self.mutate([{"op": "update", "ref": "nope"}]).status_code, 400)
+        other = make_sheet(owner=self.sheet.owner)
+        foreign = Semester.objects.filter(year__sheet=other).first()
+        response = self.mutate([
+            {"op": "delete", "id": self.a.id},
+            {"op": "add", "semester_id": foreign.id, "code": "Z"},
+        ])
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(Course.objects.filter(id=self.a.id).exists())
+
+    def test_rejects_malformed_bodies(self):
+        for url, body in (
+            (f"/api/sheet/{self.sheet.id}/mutate/", []),
+            ("/api/batch-add-courses/", ["x"]),
+            ("/api/batch-add-courses/", {"semester_id": self.s1.id, "courses": ["x"]}),
+            ("/api/batch-add-courses/", {"semester_id": self.s1.id, "courses": {"code": "X"}}),
+        ):
+            with self.subTest(body=body):
+                response = self.client.post(url, data=json.dumps(body), content_type="application/json")
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(Course.objects.filter(sheet=self.sheet).count(), 2)
+
+
+class CourseMutationResponseTests(TestCase):
+    def setUp(self):
+        self.sheet = make_sheet()
+        self.sem = Semester.objects.get(year__sheet=self.sheet, year__index=1, index=1)
+        sign_in(self.client)
+
+    def assertRollupsStored(self, data):
+        for key, row in (("semester", Semester.objects.get(id=self.sem.id)),
+                         ("year", Year.objects.get(id=self.sem.year_id)),
+                         ("sheet", ResultSheet.objects.get(id=self.sheet.id))):
+            self.assertEqual(data[key]["total_points"], float(row.total_points), key)
+            self.assertEqual(data[key]["total_credits"], row.total_credits, key)
+            self.assertEqual(data[key]["gpa"], _gpa(row.total_points, row.total_credits), key)
+
+    def test_add_update_delete(self):
+        data = self.client.post("/api/add-course/", data=json.dumps({
+            "semester_id": self.sem.id, "code": "A", "credit_unit": 3, "incourse": 30, "exam": 45,
+        }), content_type="application/json").json()
+        self.assertEqual((data["course"]["score"], data["course"]["grade"], data["course"]["grade_point"]), (75, "A", 5))
+        self.assertEqual(data["semester"]["gpa"], 5.0)
+        self.assertRollupsStored(data)
+        self.client.post("/api/add-course/", data=json.dumps({
+            "semester_id": self.sem.id, "code": "B", "credit_unit": 2, "exam": 50,
+        }), content_type="application/json")
+
+        data = self.client.put(f"/api/update-course/{data['course_id']}/", data=json.dumps({"exam": 20}),
+                               content_type="application/json").json()
+        self.assertEqual(data["course"]["grade"], "C")
+        self.assertRollupsStored(data)
+
+        data = self.client.delete(f"/api/delete-course/{data['course']['id']}/").json()
+        self.assertEqual(data["semester"]["total_credits"], 2)
+        self.assertRollupsStored(data)
+
+    def test_delete_rules(self):
+        course = Course.objects.create(semester=self.sem, code="A", credit_unit=3, exam=60)
+        UserProfile.objects.create(uid="uid-2", email="two@example.com")
+        sign_in(self.client, "uid-2")
+        self.assertEqual(self.client.delete(f"/api/delete-course/{course.id}/").status_code, 404)
+        sign_in(self.client)
+        self.assertEqual(self.client.delete(f"/api/delete-course/{course.id}/").status_code, 403)
+        self.assertTrue(Course.objects.filter(id=course.id).exists())
+
+        from django.db import DatabaseError
+        from . import mutations
+
+        with mock.patch.object(mutations, "apply", side_effect=DatabaseError("disk I/O error")):
+            response = self.client.delete(f"/api/delete-course/{course.id}/")
+        self.assertEqual((response.status_code, response.json()), (500, {"error": "disk I/O error"}))
+
+
+class TranscriptCacheTests(TestCase):
+    def setUp(self):
+        self.sheet = make_sheet()
+        self.course = Course.objects.create(semester=Semester.objects.filter(year__sheet=self.sheet).first(),
+                                            code="A", credit_unit=3, exam=60)
+        sign_in(self.client)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(TRANSCRIPT_CACHE_DIR=directory.name))
+        # Finished jobs point into another test's cache directory.
+        self.addCleanup(jobs._jobs.clear)
+
+    def download(self):
+        response = self.client.get(f"/api/sheet/{self.sheet.id}/pdf/")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="ResultSheet_Ada.pdf"')
+        return response.getvalue()
+
+    def cached_files(self):
+        return sorted(os.listdir(settings.TRANSCRIPT_CACHE_DIR))
+
+    def test_rendered_once_per_version(self):
+        from . import pdf
+
+        with mock.patch.object(pdf, "render_transcript", wraps=pdf.render_transcript) as render:
+            first = self.download()
+            self.assertTrue(first.startswith(b"%PDF"))
+            self.assertEqual(self.download(), first)
+            self.assertEqual(render.call_count, 1)
+
+            self.client.put(f"/api/update-course/{self.course.id}/", data=json.dumps({"exam": 20}),
+                            content_type="application/json")
+            self.download()
+            self.assertEqual(render.call_count, 2)
+        self.sheet.refresh_from_db()
+        self.assertEqual(self.cached_files(), [f"{self.sheet.id}-{self.sheet.version}-t{transcripts.TEMPLATE_VERSION}.pdf"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/delete-sheet/{self.sheet.id}/")
+        self.assertEqual(self.cached_files(), [])
+
+    def test_late_render_keeps_newer_versions(self):
+        old = snapshot.load(self.sheet.id)
+        self.client.put(f"/api/update-course/{self.course.id}/", data=json.dumps({"exam": 20}),
+                        content_type="application/json")
+        self.download()
+        self.sheet.refresh_from_db()
+        transcripts.render_into(settings.TRANSCRIPT_CACHE_DIR, old)
+        self.assertIn(f"{self.sheet.id}-{self.sheet.version}-t{transcripts.TEMPLATE_VERSION}.pdf", self.cached_files())
+
+    def test_job_and_bulk_zip(self):
+        import zipfile
+
+        job = self.client.post(f"/api/sheet/{self.sheet.id}/pdf/jobs/").json()
+        deadline = time.monotonic() + 60
+        while (response := self.client.get(job["status_url"])).status_code == 202:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.1)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertEqual(response.getvalue(), self.download())
+        self.assertEqual(self.client.post(f"/api/sheet/{self.sheet.id}/pdf/jobs/").json()["status"], "ready")
+
+        self.client.put(f"/api/update-course/{self.course.id}/", data=json.dumps({"exam": 20}),
+                        content_type="application/json")
+        self.download()   # renders the new version and retires the job's file
+        self.assertEqual(self.client.get(job["status_url"]).status_code, 410)
+
+        other = make_sheet(owner=self.sheet.owner)
+        response = self.client.post("/api/export-pdfs/", data=json.dumps({}), content_type="application/json")
+        archive = zipfile.ZipFile(io.BytesIO(response.getvalue()))
+        self.assertEqual(archive.namelist(), [f"ResultSheet_{self.sheet.id}_Ada.pdf", f"ResultSheet_{other.id}_Ada.pdf"])
+        self.assertTrue(all(archive.read(name).startswith(b"%PDF") for name in archive.namelist()))
+
+        response = self.client.post("/api/export-pdfs/", data=json.dumps({"sheet_ids": [other.id, 0]}),
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 404)
+
+        # A sheet deleted after the listing is left out.
+        third = make_sheet(owner=self.sheet.owner)
+        with mock.patch.object(snapshot, "load_many", return_value={}):
+            response = self.client.post("/api/export-pdfs/", data=json.dumps({"sheet_ids": [self.sheet.id, third.id]}),
+                                        content_type="application/json")
+        archive = zipfile.ZipFile(io.BytesIO(response.getvalue()))
+        self.assertEqual(archive.namelist(), [f"ResultSheet_{self.sheet.id}_Ada.pdf"])
+
+    @skipUnless(os.path.isdir("/proc/self/fd"), "needs /proc")
+    def test_bulk_zip_opens_files_as_it_goes(self):
+        import zipfile
+
+        self.download()
+        fds = len(os.listdir("/proc/self/fd"))
+        response = self.client.post("/api/export-pdfs/", data=json.dumps({}), content_type="application/json")
+        self.assertEqual(len(os.listdir("/proc/self/fd")), fds)
+
+        # A cached file replaced after the listing is rendered again.
+        transcripts.forget(self.sheet.id)
+        archive = zipfile.ZipFile(io.BytesIO(response.getvalue()))
+        self.assertTrue(archive.read(f"ResultSheet_{self.sheet.id}_Ada.pdf").startswith(b"%PDF"))
+
+
+class ExportResultsTests(TestCase):
+    def setUp(self):
+        self.sheet = make_sheet()
+        self.sheet.department = "CS"
+        self.sheet.save()
+        semesters = list(Semester.objects.filter(sheet=self.sheet).order_by("year__index", "index"))
+        Course.objects.create(semester=semesters[1], code="B", title='Say "hi" <now>', credit_unit=2, exam=40)
+        Course.objects.create(semester=semesters[0], code="A", title="Intro, part 1", credit_unit=3, incourse=20, exam=55)
+        other = ResultSheet.objects.create(owner=self.sheet.owner, student_name="Bo", department="EE", entry_year="2022/2023")
+        Course.objects.create(semester=Semester.objects.create(year=Year.objects.create(sheet=other, index=1, year_label="Y1"),
+                                                               index=1, label="S1"), code="C", credit_unit=1, exam=70)
+        sign_in(self.client)
+
+    def test_formats(self):
+        import csv
+        import zipfile
+        import xml.etree.ElementTree as ET
+
+        response = self.client.get("/api/export-results/csv/?department=CS")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        rows = list(csv.reader(io.StringIO(response.getvalue().decode())))
+        self.assertEqual(rows[0][:2], ["sheet_id", "student_name"])
+        self.assertEqual([(r[10], r[11], r[15], r[16]) for r in rows[1:]],
+                         [("A", "Intro, part 1", "75", "A"), ("B", 'Say "hi" <now>', "40", "E")])
+
+        response = self.client.get(f"/api/sheet/{self.sheet.id}/results/ndjson/")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="Results_Ada.ndjson"')
+        lines = [json.loads(line) for line in response.getvalue().splitlines()]
+        self.assertEqual([(r["code"], r["year"], r["semester"], r["score"]) for r in lines], [("A", 1, 1, 75), ("B", 1, 2, 40)])
+
+        response = self.client.get("/api/export-results/xlsx/")
+        archive = zipfile.ZipFile(io.BytesIO(response.getvalue()))
+        ns = {"m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+        self.assertIn('sheetId="1"', archive.read("xl/workbook.xml").decode())
+        sheet = ET.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+        cells = [[c.findtext("m:is/m:t", namespaces=ns) or c.findtext("m:v", namespaces=ns) for c in row]
+                 for row in sheet.iterfind("m:sheetData/m:row", ns)]
+        self.assertEqual([(r[1], r[10], r[11]) for r in cells[1:]],
+                         [("Ada", "A", "Intro, part 1"), ("Ada", "B", 'Say "hi" <now>'), ("Bo", "C", None)])
+
+        self.assertEqual(self.client.get("/api/export-results/pdf/").status_code, 404)
+        sign_in(self.client, uid="uid-2")
+        self.assertEqual(self.client.get(f"/api/sheet/{self.sheet.id}/results/csv/").status_code, 404)
+        self.assertEqual(self.client.get("/api/export-results/csv/").getvalue().count(b"\n"), 1)
+
+    def test_streamed_in_chunks(self):
+        from django.core.management import call_command
+        from . import exports
+
+        with mock.patch.object(exports, "FLUSH_BYTES", 1), CaptureQueriesContext(connection) as ctx:
+            chunks = list(exports.stream("ndjson", exports.courses(), chunk_size=1))
+        self.assertEqual(len(chunks), 4)   # one per row, and the empty tail
+        self.assertEqual(sum(1 for q in ctx.captured_queries if "acadegradecore_course" in q["sql"]), 1)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "ee.csv")
+            call_command("export_results", "--department", "EE", "-o", path)
+            with open(path) as f:
+                self.assertEqual(len(f.read().splitlines()), 2)
+
+    def test_command_writes_to_stdout(self):
+        import zipfile
+        from django.core.management import CommandError, call_command
+
+        out = io.StringIO()
+        call_command("export_results", "-f", "ndjson", "--department", "EE", "-o", "-", stdout=out)
+        self.assertEqual([json.loads(line)["code"] for line in out.getvalue().splitlines()], ["C"])
+
+        binary = io.TextIOWrapper(io.BytesIO())
+        call_command("export_results", "-f", "xlsx", stdout=binary)
+        self.assertIn("xl/workbook.xml", zipfile.ZipFile(binary.buffer).namelist())
+        with self.assertRaises(CommandError):
+            call_command("export_results", "-f", "xlsx", stdout=io.StringIO())
+
+
+class BroadsheetTests(TestCase):
+    def setUp(self):
+        grading.all_tables()
+        owner = UserProfile.objects.create(uid="uid-1", email="one@example.com")
+        for name, scores in (("Zed", {"A": 70, "B": 45}), ("Ada", {"B": 30}), ("Eve", {"C": 90})):
+            sheet = make_sheet(years=1, owner=owner)
+            sheet.student_name, sheet.department = name, "EE" if name == "Eve" else "CS"
+            sheet.save()
+            semesters = Semester.objects.filter(sheet=sheet).order_by("index")
+            for code, exam in scores.items():
+                Course.objects.create(semester=semesters[0], code=code, credit_unit=2, exam=exam)
+            if name == "Ada":
+                # A retake of B; an uncoded course only counts towards the GPAs.
+                Course.objects.create(semester=semesters[1], code="B", credit_unit=2, exam=65)
+                Course.objects.create(semester=semesters[1], credit_unit=2, exam=50)
+        sign_in(self.client)
+
+    def test_csv(self):
+        import csv
+
+        with self.assertNumQueries(5):   # session, profile, two for the layout, one for the rows
+            response = self.client.get("/api/broadsheet/csv/?department=CS")
+            rows = list(csv.reader(io.StringIO(response.getvalue().decode())))
+        self.assertEqual(rows, [
+            ["Student", "A", "B", "GPA Y1S1", "GPA Y1S2", "CGPA"],
+            ["Ada", "", "B", "0.00", "3.50", "2.33"],
+            ["Zed", "A", "D", "3.50", "", "3.50"],
+        ])
+
+    def test_pdf(self):
+        response = self.client.get("/api/broadsheet/pdf/?department=CS&entry_year=2021/2022")
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertTrue(response.getvalue().startswith(b"%PDF"))
+        self.assertEqual(self.client.get("/api/broadsheet/doc/").status_code, 404)
+
+    def test_pdf_reads_rows_as_it_lays_out(self):
+        from reportlab.platypus import Table
+        from . import broadsheet, pdf
+
+        events = []
+        def rows():
+            for i in range(6):
+                events.append("row")
+                yield [f"Student {i}", "A", "5.00"]
+        wrap = Table.wrap
+        def logged_wrap(table, *args):
+            events.append("table")
+            return wrap(table, *args)
+
+        with mock.patch.object(pdf, "BROADSHEET_ROWS_PER_TABLE", 2), mock.patch.object(Table, "wrap", logged_wrap):
+            out = broadsheet.render_pdf("Broadsheet", broadsheet.Layout(("A",), ()), rows())
+        self.assertTrue(out.read().startswith(b"%PDF"))
+        self.assertEqual(events.count("row"), 6)
+        self.assertLess(events.index("table"), events.index("row", 2))
+
+
+class SheetVersionTests(TestCase):
+    def setUp(self):
+        grading.all_tables()
+        self.sheet = make_sheet()
+        self.sem = Semester.objects.filter(year__sheet=self.sheet).first()
+        self.course = Course.objects.create(semester=self.sem, code="A", credit_unit=3, exam=60)
+        sign_in(self.client)
+
+    def etag(self, url="/api/sheet/{}/"):
+        return self.client.get(url.format(self.sheet.id))["ETag"]
+
+    def test_not_modified_until_changed(self):
+        etag = self.etag()
+        with self.assertNumQueries(2):   # the session, the version
+            response = self.client.get(f"/api/sheet/{self.sheet.id}/", headers={"If-None-Match": etag})
+        self.assertEqual((response.status_code, response["ETag"]), (304, etag))
+        self.assertEqual(self.client.get(f"/api/sheet/{self.sheet.id}/pdf/", headers={"If-None-Match": etag}).status_code, 304)
+
+        # A title-only edit moves no rollup but still changes the sheet.
+        self.client.put(f"/api/update-course/{self.course.id}/", data=json.dumps({"title": "Algebra"}),
+                        content_type="application/json")
+        response = self.client.get(f"/api/sheet/{self.sheet.id}/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+        stale = self.etag()
+        Semester.objects.create(year=self.sem.year, index=9, label="Extra")
+        self.assertNotEqual(self.etag(), stale)
+
+    def test_list_sheets_not_modified(self):
+        url = "/api/list-sheets/"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 304)
+        self.assertEqual(self.client.get(url + "?sort=cgpa", headers={"If-None-Match": etag}).status_code, 200)
+        Course.objects.create(semester=self.sem, code="B", credit_unit=2, exam=40)
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 200)
+
+    def test_if_match(self):
+        etag = self.etag()
+        url = f"/api/update-course/{self.course.id}/"
+        response = self.client.put(url, data=json.dumps({"exam": 70}), content_type="application/json",
+                                   headers={"If-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], self.etag())
+
+        # A second tab still holding the old ETag must not overwrite it.
+        response = self.client.put(url, data=json.dumps({"exam": 10}), content_type="application/json",
+                                   headers={"If-Match": etag})
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Course.objects.get(id=self.course.id).exam, 70)
+        response = self.client.put(f"/api/update-sheet/{self.sheet.id}/", data=json.dumps({
+            "student_name": "Bo",
+        }), content_type="application/json", headers={"If-Match": etag})
+        self.assertEqual(response.status_code, 412)
+
+    def test_stale_save_keeps_counters(self):
+        stale = ResultSheet.objects.get(id=self.sheet.id)
+        loaded_version = stale.version
+        Course.objects.create(semester=self.sem, code="B", credit_unit=2, exam=40)
+        stale.student_name = "Bo"
+        stale.save()
+        fresh = ResultSheet.objects.get(id=self.sheet.id)
+        self.assertEqual(fresh.total_credits, 5)
+        self.assertEqual(fresh.version, loaded_version + 2)
+        self.assertEqual(fresh.student_name, "Bo")
+
+
+class JournalTests(TestCase):
+    def setUp(self):
+        self.sheet = make_sheet()
+        self.sem = Semester.objects.filter(year__sheet=self.sheet).first()
+        self.course = Course.objects.create(semester=self.sem, code="A", credit_unit=3, exam=60)
+        sign_in(self.client)
+
+    def version(self):
+        return ResultSheet.objects.get(id=self.sheet.id).version
+
+    def changes(self, since):
+        return self.client.get(f"/api/sheet/{self.sheet.id}/changes/?since={since}").json()
+
+    def test_changes_since(self):
+        since = self.version()
+        self.assertEqual(self.changes(since)["changes"], [])
+
+        self.client.put(f"/api/update-course/{self.course.id}/", data=json.dumps({"exam": 40}),
+                        content_type="application/json")
+        added = self.client.post(f"/api/sheet/{self.sheet.id}/mutate/", data=json.dumps({"ops": [
+            {"op": "add", "ref": "b", "semester_id": self.sem.id, "code": "B", "credit_unit": 2, "exam": 50},
+        ]}), content_type="application/json").json()["ids"]["b"]
+        Course.objects.get(id=self.course.id).delete()
+
+        feed = self.changes(since)
+        self.assertFalse(feed["resync"])
+        self.assertEqual(feed["version"], self.version())
+        self.assertEqual(
+            [(c["version"], c["action"], c["id"]) for c in feed["changes"]],
+            [(since + 1, "update", self.course.id), (since + 2, "insert", added), (since + 3, "delete", self.course.id)],
+        )
+        self.assertEqual(feed["changes"][0]["data"]["grade"], "E")
+        sem = Semester.objects.get(id=self.sem.id)
+        self.assertEqual(feed["semesters"], [{
+            "id": sem.id, "year_id": sem.year_id, "total_points": float(sem.total_points),
+            "total_credits": sem.total_credits, "gpa": sem.gpa,
+        }])
+        self.assertEqual([c["version"] for c in self.changes(since + 2)["changes"]], [since + 3])
+
+    def test_resync(self):
+        since = self.version()
+        Course.objects.create(semester=self.sem, code="B", credit_unit=2, exam=50)
+        SheetChange.objects.filter(sheet=self.sheet, version__lte=since + 1).delete()   # compacted
+        self.assertTrue(self.changes(since)["resync"])
+
+        since = self.version()
+        self.client.put(f"/api/update-sheet/{self.sheet.id}/", data=json.dumps({
+            "grading_scale": GradingScale.objects.create(name="Flat").id,
+        }), content_type="application/json")
+        self.assertTrue(self.changes(since)["resync"])
+        self.assertEqual(self.client.get(f"/api/sheet/{self.sheet.id}/changes/?since=x").status_code, 400)
+
+
+class EventsTests(TestCase):
+    def setUp(self):
+        self.sheet = make_sheet()
+        self.course = Course.objects.create(semester=Semester.objects.filter(year__sheet=self.sheet).first(),
+                                            code="A", credit_unit=3, exam=60)
+        sign_in(self.client)
+        self.loop = asyncio.new_event_loop()
+        self.queue = self.loop.run_until_complete(self.subscribe())
+
+    def tearDown(self):
+        events.unsubscribe(self.sheet.owner_id, self.queue)
+        self.loop.close()
+
+    async def subscribe(self):
+        return events.subscribe(self.sheet.owner_id)
+
+    def next_event(self):
+        return self.loop.run_until_complete(asyncio.wait_for(self.queue.get(), 1))
+
+    def test_published_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.put(f"/api/update-course/{self.course.id}/", data=json.dumps({"exam": 40}),
+                            content_type="application/json")
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertTrue(self.queue.empty())
+        for callback in callbacks:
+            callback()
+        event = self.next_event()
+        self.assertEqual((event["type"], event["sheet_id"]), ("change", self.sheet.id))
+        self.assertEqual(event["version"], ResultSheet.objects.get(id=self.sheet.id).version)
+        self.assertEqual(event["changes"][0]["data"]["exam"], 40)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/delete-sheet/{self.sheet.id}/")
+        self.assertEqual(self.next_event(), {"type": "sheet", "action": "delete", "sheet_id": self.sheet.id})
+
+    def test_slow_subscriber_gets_resync(self):
+        for n in range(events.QUEUE_SIZE + 1):
+            events.publish(self.sheet.owner_id, {"type": "change", "sheet_id": self.sheet.id, "version": n})
+        self.assertEqual(self.next_event(), events.RESYNC)
+        self.assertTrue(self.queue.empty())
+
+
+class EventStreamTests(TestCase):
+    async def test_stream(self):
+        owner = await UserProfile.objects.acreate(uid="uid-1", email="one@example.com")
+        await asign_in(self.async_client)
+        response = await self.async_client.get("/api/events/")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b"retry:"))
+
+        await asyncio.to_thread(events.publish, owner.id, {"type": "change", "sheet_id": 7, "version": 3})
+        chunk = await asyncio.wait_for(anext(stream), 1)
+        self.assertTrue(chunk.startswith(b'id: 7.3\nevent: change\ndata: {"type": "change"'))
+        await stream.aclose()
+
+    def test_refused_under_wsgi(self):
+        UserProfile.objects.create(uid="uid-1", email="one@example.com")
+        sign_in(self.client)
+        response = self.client.get("/api/events/")
+        self.assertEqual(response.status_code, 501)
+        self.assertFalse(response.streaming)
+
+
+class AsyncViewTests(TestCase):
+    def test_api_views_are_async(self):
+        from asgiref.sync import iscoroutinefunction
+        from django.urls import get_resolver
+
+        api = [p for p in get_resolver().url_patterns if str(p.pattern).startswith("api/")]
+        self.assertTrue(api)
+        for pattern in api:
+            self.assertTrue(iscoroutinefunction(pattern.callback), pattern.name)
+
+    async def test_offloaded_pdf_and_async_orm(self):
+        owner = await UserProfile.objects.acreate(uid="uid-1", email="one@example.com")
+        sheet = await ResultSheet.objects.acreate(
+            owner=owner, student_name="Ada", years_of_study=1, semesters_per_year=1,
+        )
+        await asign_in(self.async_client)
+        response = await self.async_client.get(f"/api/sheet/{sheet.id}/pdf/")
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertTrue(response.getvalue().startswith(b"%PDF"))
+
+        response = await self.async_client.get("/api/list-sheets/")
+        self.assertEqual([s["id"] for s in response.json()["sheets"]], [sheet.id])
+
+        response = await self.async_client.get(f"/api/sheet/{sheet.id}/results/csv/")
+        self.assertEqual(b"".join([chunk async for chunk in response.streaming_content]).count(b"\n"), 1)
+
+
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "firebase": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "firebase-tests"},
+}, FIREBASE_CACHE="firebase")
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        tokens.clear()
+        caches["firebase"].clear()
+        self.calls = []
+
+        def verify_id_token(id_token):
+            self.calls.append(id_token)
+            return {"uid": id_token, "email": f"{id_token}@example.com", "exp": self.exp}
+
+        self.exp = time.time() + 3600
+        patcher = mock.patch.object(firebase.auth, "verify_id_token", verify_id_token)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(tokens.clear)
+
+    def test_verified_once_until_expiry(self):
+        self.assertEqual(tokens.verify("t1")["uid"], "t1")
+        self.assertEqual(tokens.cached("t1")["uid"], "t1")
+        tokens.verify("t1")
+        self.assertEqual(self.calls, ["t1"])
+        self.assertIsNone(tokens.cached("t2"))
+
+        self.exp = time.time() - 1
+        tokens.verify("t2")
+        self.assertIsNone(tokens.cached("t2"))
+        tokens.verify("t2")
+        self.assertEqual(self.calls, ["t1", "t2", "t2"])
+
+    def test_shared_between_workers_and_bounded(self):
+        tokens.verify("t1")
+        tokens.clear()   # another process: only the shared cache knows t1
+        tokens.verify("t1")
+        self.assertEqual(self.calls, ["t1"])
+
+        with override_settings(FIREBASE_CACHE=""), mock.patch.object(tokens, "MAX_TOKENS", 2):
+            for token in ("a", "b", "c"):
+                tokens.verify(token)
+            self.assertIsNone(tokens.cached("a"))
+            self.assertIsNotNone(tokens.cached("c"))
+
+    def test_views_use_cache(self):
+        UserProfile.objects.create(uid="t1", email="t1@example.com")
+        for _ in range(3):
+            response = self.client.post(
+                "/sync-user/", "{}", content_type="application/json", headers={"Authorization": "Bearer t1"},
+            )
+            self.assertEqual(response.json()["user"]["uid"], "t1")
+        self.assertEqual(self.calls, ["t1"])
+
+    def test_certificate_cache(self):
+        store = firebase.CertificateCache(caches["firebase"])
+        store.set("https://certs", b"response", 60)
+        self.assertEqual(store.get("https://certs"), b"response")
+        store.delete("https://certs")
+        self.assertIsNone(store.get("https://certs"))
+
+    def test_off_by_default_and_private(self):
+        from django.core.exceptions import ImproperlyConfigured
+
+        with override_settings(FIREBASE_CACHE=""):
+            self.assertIsNone(tokens._shared())
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={"firebase": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": directory,
+        }}):
+            os.chmod(directory, 0o777)
+            with self.assertRaises(ImproperlyConfigured):
+                tokens.verify("t1")
+            os.chmod(directory, 0o700)
+            self.assertEqual(tokens.verify("t1")["uid"], "t1")
+
+    def test_unpinned_when_firebase_internals_move(self):
+        self.addCleanup(setattr, firebase, "_pinned", False)
+        firebase._pinned = False
+        with mock.patch.object(firebase.auth, "_get_client", return_value=object()), \
+                redirect_stdout(io.StringIO()) as out:
+            self.assertEqual(tokens.verify("t1")["uid"], "t1")
+        self.assertIn("not pinned", out.getvalue())
+        self.assertTrue(firebase._pinned)
+
+
+class IdentitySyncTests(TestCase):
+    def test_writes_only_what_changed(self):
+        from . import identity
+
+        user, profile = identity.sync("uid-1", "one@example.com", "Ada")
+        self.assertEqual((user.username, profile.uid), ("uid-1", "uid-1"))
+        self.assertIsNotNone(profile.id)
+        with self.assertNumQueries(2):   # one read per table, no writes
+            self.assertEqual(identity.sync("uid-1", "one@example.com", "Ada")[1].id, profile.id)
+
+        identity.sync("uid-1", "new@example.com", "Ada L.")
+        profile.refresh_from_db()
+        user.refresh_from_db()
+        self.assertEqual((profile.email, profile.name, user.email, user.first_name),
+                         ("new@example.com", "Ada L.", "new@example.com", "Ada L."))
+
+        # The account is re-created in Firebase: the profile takes the new uid.
+        moved, created = identity.sync_profile("uid-9", "new@example.com", "Ada L.")
+        self.assertEqual((moved.id, created), (profile.id, False))
+        self.assertEqual(list(UserProfile.objects.values_list("uid", flat=True)), ["uid-9"])
+
+    @override_settings(FIREBASE_CACHE="")
+    def test_login_sync(self):
+        claims = {"uid": "uid-1", "email": "one@example.com", "name": "Ada", "exp": time.time() + 3600}
+        with mock.patch.object(firebase.auth, "verify_id_token", return_value=claims):
+            self.addCleanup(tokens.clear)
+            for _ in range(2):
+                response = self.client.post("/firebase-login-sync/", json.dumps({"idToken": "t1"}),
+                                            content_type="application/json")
+                self.assertEqual(response.json()["redirect"], "/dashboard/")
+        self.assertEqual(UserProfile.objects.get().name, "Ada")
+        self.assertEqual(self.client.get("/api/list-sheets/").status_code, 200)
+
+
+class ProfileMiddlewareTests(TestCase):
+    def setUp(self):
+        self.sheet = make_sheet()
+        self.course = Course.objects.create(semester=Semester.objects.filter(year__sheet=self.sheet).first(),
+                                            code="A", credit_unit=3, exam=60)
+        UserProfile.objects.create(uid="uid-2", email="two@example.com")
+
+    def test_authentication_required(self):
+        for url in ("/api/list-sheets/", f"/api/sheet/{self.sheet.id}/", f"/api/course/{self.course.id}/"):
+            self.assertEqual(self.client.get(url).status_code, 401, url)
+        sign_in(self.client, "nobody")
+        self.assertEqual(self.client.get("/api/list-sheets/").status_code, 401)
+
+    def test_other_users_sheets_are_not_found(self):
+        sign_in(self.client, "uid-2")
+        for url in (f"/api/sheet/{self.sheet.id}/", f"/api/sheet/{self.sheet.id}/pdf/",
+                    f"/api/course/{self.course.id}/", f"/api/sheet/{self.sheet.id}/changes/?since=1"):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+        response = self.client.put(f"/api/update-course/{self.course.id}/", data=json.dumps({"exam": 1}),
+                                   content_type="application/json")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get("/api/list-sheets/").json()["sheets"], [])
+
+    def test_bearer_token_and_profile_cache(self):
+        claims = {"uid": "uid-1", "exp": time.time() + 3600}
+        with mock.patch.object(firebase.auth, "verify_id_token", return_value=claims):
+            self.addCleanup(tokens.clear)
+            headers = {"Authorization": "Bearer t1"}
+            self.assertEqual(self.client.get(f"/api/sheet/{self.sheet.id}/", headers=headers).status_code, 200)
+            with self.assertNumQueries(1):   # no session, no profile lookup
+                response = self.client.get(f"/api/sheet/{self.sheet.id}/", headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("Authorization", response["Vary"])
+
+            # The uid moves to another profile: the cached id must go.
+            for old, new in (("uid-1", "old-uid-1"), ("uid-2", "uid-1")):
+                profile = UserProfile.objects.get(uid=old)
+                profile.uid = new
+                profile.save()
+            self.assertEqual(self.client.get(f"/api/sheet/{self.sheet.id}/", headers=headers).status_code, 404)
+
+        with mock.patch.object(firebase.auth, "verify_id_token", side_effect=ValueError("bad token")):
+            response = self.client.get("/api/list-sheets/", headers={"Authorization": "Bearer forged"})
+            self.assertEqual(response.status_code, 401)
+
+
+class StartupTests(SimpleTestCase):
+    # Cumulative import time of django.setup() in a fresh interpreter, as
+    # reported by python -X importtime; about twice what it takes today.
+    IMPORT_BUDGET_MS = 800
+    DEFERRED = ("firebase_admin", "google.auth", "grpc", "reportlab", "numpy")
+
+    def test_import_time(self):
+        script = (
+            "import sys, django; django.setup(); sys.stderr.write('--- urls\\n'); "
+            "import acadegrade.urls; print(sorted(m for m in sys.modules if m.startswith(%r)))" % (self.DEFERRED,)
+        )
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": "acadegrade.settings"}
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", script],
+                              capture_output=True, text=True, env=env, check=True)
+        setup = proc.stderr.split("--- urls")[0]
+        # Top-level imports only: nested ones are in their parent's cumulative time.
+        top = [line.split("|") for line in setup.splitlines() if line.startswith("import time:")]
+        total_ms = sum(int(cumulative) for _, cumulative, name in top[1:] if not name.startswith("  ")) / 1000
+        self.assertLess(total_ms, self.IMPORT_BUDGET_MS)
+        self.assertEqual(proc.stdout.strip(), "[]", "loaded by django.setup() or the URLconf")
@@ -0,0 +1,96 @@
+"""
+Cache of verified Firebase ID token claims, keyed by a SHA-256 of the
+token and kept until the token expires.
+"""
+import hashlib
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.exceptions import ImproperlyConfigured
+
+MAX_TOKENS = 1024
+
+_lock = threading.Lock()
+_claims = OrderedDict()   # token hash -> (claims, exp)
+
+
+def _hash(id_token):
+    return hashlib.sha256(id_token.encode()).hexdigest()
+
+
+def _shared():
+    alias = settings.FIREBASE_CACHE
+    if not alias:
+        return None
+    cache = caches[alias]
+    if isinstance(cache, FileBasedCache):
+        _check_private(cache._dir)
+    return cache
+
+
+def _check_private(directory):
+    # Whoever can write the cache's pickles can forge claims, or run code
+    # when they are loaded. Django creates the directory 0700 if missing.
+    try:
+        info = os.stat(directory)
+    except FileNotFoundError:
+        return
+    if info.st_uid != os.getuid() or info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise ImproperlyConfigured(
+            f"FIREBASE_CACHE directory {directory} must be owned by this user and writable by no one else."
+        )
+
+
+def _remember(key, claims):
+    with _lock:
+        _claims[key] = (claims, claims["exp"])
+        _claims.move_to_end(key)
+        while len(_claims) > MAX_TOKENS:
+            _claims.popitem(last=False)
+
+
+def cached(id_token):
+    """Claims of `id_token` if this process verified it and it has not expired, else None."""
+    key = _hash(id_token)
+    with _lock:
+        hit = _claims.get(key)
+        if hit is None:
+            return None
+        if hit[1] <= time.time():
+            del _claims[key]
+            return None
+        _claims.move_to_end(key)
+        return hit[0]
+
+
+def verify(id_token):
+    """
+    firebase_auth.verify_id_token() behind the caches; raises whatever it
+    raises for a bad token. Blocks on the network when the certificates
+    are not cached, so async views run it on the offload pool.
+    """
+    claims = cached(id_token)
+    if claims is not None:
+        return claims
+    key = _hash(id_token)
+    shared = _shared()
+    claims = shared.get(f"firebase-token:{key}") if shared else None
+    if claims is None or claims["exp"] <= time.time():
+        from . import firebase
+        claims = firebase.verify_id_token(id_token, certificate_cache=shared)
+        ttl = int(claims["exp"] - time.time())
+        if shared and ttl > 0:
+            shared.set(f"firebase-token:{key}", claims, ttl)
+    _remember(key, claims)
+    return claims
+
+
+def clear():
+    with _lock:
+        _claims.clear()
@@ -0,0 +1,82 @@
+"""
+Rendered PDF transcripts, cached on disk under names that carry the sheet
+version, so a cached file never goes stale.
+"""
+import glob
+import os
+import re
+import tempfile
+
+from django.conf import settings
+
+# Bump when acadegradecore.pdf renders differently, to retire every cached file.
+TEMPLATE_VERSION = 1
+
+_NAME = re.compile(r"\d+-(\d+)-t(\d+)\.pdf")   # see _path()
+
+
+def _path(directory, sheet_id, version):
+    return os.path.join(directory, f"{sheet_id}-{version}-t{TEMPLATE_VERSION}.pdf")
+
+
+def cached_path(sheet_id, version):
+    """Path of the cached transcript of that sheet version, or None."""
+    path = _path(settings.TRANSCRIPT_CACHE_DIR, sheet_id, version)
+    return path if os.path.exists(path) else None
+
+
+def open_cached(sheet_id, version):
+    """The cached transcript of that sheet version, opened for reading, or None."""
+    try:
+        return open(_path(settings.TRANSCRIPT_CACHE_DIR, sheet_id, version), "rb")
+    except FileNotFoundError:
+        return None
+
+
+def render(snap):
+    """Render the transcript of `snap` into the cache and return it opened for reading."""
+    return open(render_into(settings.TRANSCRIPT_CACHE_DIR, snap), "rb")
+
+
+def render_into(directory, snap):
+    """
+    Render the transcript of `snap` into the cache `directory` and return
+    its path. Takes the directory rather than reading settings, so the
+    render worker processes (acadegradecore.jobs) can call it.
+    """
+    from .pdf import render_transcript
+
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    target = _path(directory, snap.id, snap.version)
+    # Render beside the target and rename, so readers never see a partial file.
+    fd, partial = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            render_transcript(snap, out)
+        os.replace(partial, target)
+    except BaseException:
+        os.unlink(partial)
+        raise
+    forget(snap.id, below=snap.version, directory=directory)
+    return target
+
+
+def forget(sheet_id, below=None, directory=None):
+    """
+    Remove the cached transcripts of a sheet, or only those of versions
+    before `below` (a late render of an old version keeps newer files).
+    """
+    directory = directory or settings.TRANSCRIPT_CACHE_DIR
+    for path in glob.glob(os.path.join(directory, f"{sheet_id}-*.pdf")):
+        match = _NAME.fullmatch(os.path.basename(path))
+        if below is None or not match or int(match[2]) != TEMPLATE_VERSION or int(match[1]) < below:
+            try:
+                os.unlink(path)
+            except OSError:   # already gone, or open elsewhere on Windows
+                pass
+
+
+def filename(sheet_id, student_name):
+    """Name of a transcript inside a bulk ZIP; sheet ids keep namesakes apart."""
+    return f"ResultSheet_{sheet_id}_{student_name}.pdf".replace("/", "-")
+
@@ -2,9 +2,6 @@
 from django.shortcuts import render
 
 import os
-# for Firebase Admin SDK
-import firebase_admin
-from firebase_admin import auth as firebase_auth, credentials
 
 
 # for advanced email with HTML support
@@ -22,7 +19,10 @@ from django.utils.decorators import method_decorator
 from .models import ContactMessage
 
 # for JSON parsing
+import asyncio
+import hashlib
 import json
+from datetime import datetime
 
 
 
@@ -30,16 +30,20 @@ import json
 from .models import UserProfile
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import get_object_or_404
-from .models import UserProfile, ResultSheet, Year, Semester, Course
+from .models import UserProfile, ResultSheet, Semester, Course, GradingScale, _gpa
 
 from django.shortcuts import redirect
+from django.db import transaction
+from django.db.models import Avg, Count, Max
 from django.contrib.auth.decorators import login_required
 
-from django.http import HttpResponse
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, parse_etags
+from asgiref.sync import sync_to_async
+from . import broadsheet, events, exports, grading, identity, jobs, journal, mutations, offload, pagination, scaffold, snapshot, tokens, transcripts
+from .middleware import SESSION_UID, profile_required
 
 
 from decouple import config
@@ -54,7 +58,7 @@ def about(request):
     return render(request, "about.html")
 
 # Contact page with form handling and email notifications
-def contact(request):
+async def contact(request):
     status = None
     name = ""
 
@@ -66,7 +70,7 @@ def contact(request):
         try:
             # ✅ Save in DB
             if name and email and message:
-                ContactMessage.objects.create(
+                await ContactMessage.objects.acreate(
                     name=name, email=email, message=message
                 )
 
@@ -80,7 +84,7 @@ def contact(request):
                 from_email=settings.EMAIL_HOST_USER,
                 to=[settings.EMAIL_HOST_USER],
             )
-            admin_email.send(fail_silently=False)
+            await offload.run(admin_email.send, fail_silently=False)
 
             # ✅ Send confirmation to the user (HTML)
             user_subject = "✅ We received your message"
@@ -109,7 +113,7 @@ def contact(request):
                 to=[email],
             )
             user_email.attach_alternative(html_body, "text/html")
-            user_email.send(fail_silently=False)
+            await offload.run(user_email.send, fail_silently=False)
 
             status = "success"
 
@@ -117,17 +121,17 @@ def contact(request):
             print("❌ Email sending failed:", e)
             status = "error"
 
-    return render(request, "contact.html", {"status": status, "name": name})
+    return await sync_to_async(render)(request, "contact.html", {"status": status, "name": name})
 
 
-def verify_firebase_token(request):
+async def verify_firebase_token(request):
     """Verify Firebase ID token from Authorization header."""
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
         return None
     id_token = auth_header.split(" ")[1]
     try:
-        decoded = firebase_auth.verify_id_token(id_token)
+        decoded = tokens.cached(id_token) or await offload.run(tokens.verify, id_token)
         return decoded  # contains 'uid', 'email', etc.
     except Exception as e:
         print("❌ Token verification failed:", e)
@@ -135,9 +139,9 @@ def verify_firebase_token(request):
 
 
 @csrf_exempt
-def sync_user(request):
+async def sync_user(request):
     if request.method == "POST":
-        decoded = verify_firebase_token(request)
+        decoded = await verify_firebase_token(request)
         if not decoded:
             return JsonResponse({"error": "Invalid or missing token"}, status=401)
 
@@ -150,10 +154,7 @@ def sync_user(request):
             if not uid or not email:
                 return JsonResponse({"error": "Missing uid or email"}, status=400)
 
-            profile, created = UserProfile.objects.update_or_create(
-                uid=uid,
-                defaults={"name": name, "email": email}
-            )
+            profile, created = await sync_to_async(identity.sync_profile)(uid, email, name)
 
             return JsonResponse({
                 "status": "success",
@@ -171,7 +172,7 @@ def sync_user(request):
 
 # Firebase login sync endpoint for Django session login
 @csrf_exempt
-def firebase_login_sync(request):
+async def firebase_login_sync(request):
     """
     POST /firebase-login-sync/
     Accepts: { idToken: <Firebase ID token> }
@@ -188,7 +189,7 @@ def firebase_login_sync(request):
 
         decoded = None
         try:
-            decoded = firebase_auth.verify_id_token(id_token)
+            decoded = tokens.cached(id_token) or await offload.run(tokens.verify, id_token)
         except Exception as e:
             print("❌ Firebase token verification failed:", e)
             return JsonResponse({"error": "Invalid Firebase token"}, status=401)
@@ -199,28 +200,13 @@ def firebase_login_sync(request):
         if not uid or not email:
             return JsonResponse({"error": "Missing uid or email in token"}, status=400)
 
-        # Get or create Django user
-        from django.contrib.auth import get_user_model, login
-        User = get_user_model()
-        user, created = User.objects.get_or_create(username=uid, defaults={"email": email, "first_name": name})
+        # Django user and UserProfile in one pass; no writes when unchanged
+        from django.contrib.auth import alogin
+        user, profile = await sync_to_async(identity.sync)(uid, email, name)
 
         # Log in user via Django session
-        login(request, user)
-
-        # Optionally sync UserProfile, handling unique email constraint
-        from .models import UserProfile
-        try:
-            profile, _ = UserProfile.objects.update_or_create(uid=uid, defaults={"name": name, "email": email})
-        except Exception as e:
-            # If email already exists, update UID for that profile
-            try:
-                profile = UserProfile.objects.get(email=email)
-                profile.uid = uid
-                profile.name = name
-                profile.save()
-            except UserProfile.DoesNotExist:
-                # If not found, create new profile
-                profile = UserProfile.objects.create(uid=uid, name=name, email=email)
+        await alogin(request, user)
+        await request.session.aset(SESSION_UID, uid)
 
         return JsonResponse({"success": True, "redirect": "/dashboard/"})
     except Exception as e:
@@ -230,15 +216,67 @@ def firebase_login_sync(request):
 # Dashboard view (requires login)
 @login_required(login_url="/")
 def dashboard(request):
-    return render(request, "dashboard.html")
+    return render(request, "dashboard.html", {"live_events": settings.LIVE_EVENTS})
+
+
+def _grading_scale(scale_id):
+    return get_object_or_404(GradingScale, id=scale_id) if scale_id else None
+
+
+def _sheet_etag(sheet_id, version):
+    return f'"{sheet_id}.{version}"'
+
+
+def _if_match(request):
+    """
+    (sheet_id, version) pairs named by If-Match, for mutations.check_version();
+    None when the header is absent or "*".
+    """
+    header = request.headers.get("If-Match")
+    if not header:
+        return None
+    etags = parse_etags(header)
+    if "*" in etags:
+        return None
+    pairs = set()
+    for etag in etags:
+        # Weak (W/"...") tags never match: If-Match compares strongly.
+        sheet_id, _, version = etag.strip('"').partition(".")
+        if sheet_id.isdigit() and version.isdigit():
+            pairs.add((int(sheet_id), int(version)))
+    return pairs
+
+
+async def _not_modified(request, sheet_id):
+    """
+    304 when If-None-Match already names the sheet's current version,
+    checked with a single-row lookup before anything is loaded.
+    """
+    if not request.headers.get("If-None-Match"):
+        return None
+    version = await (
+        ResultSheet.objects.filter(id=sheet_id, owner_id=request.profile.id).values_list("version", flat=True).afirst()
+    )
+    if version is None:
+        return None
+    etag = _sheet_etag(sheet_id, version)
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response["ETag"] = etag
+    return response
+
+
+def _with_etag(response, sheet):
+    response["ETag"] = _sheet_etag(sheet.id, sheet.version)
+    return response
 
 
 @csrf_exempt
-def create_sheet(request):
+@profile_required
+async def create_sheet(request):
     """
-    POST JSON:
+    POST JSON (owned by the caller):
     {
-      "uid": "...",            # Firebase UID of owner
       "student_name": "John Doe",
       "university": "...",
       "faculty": "...",
@@ -246,7 +284,8 @@ def create_sheet(request):
       "years_of_study": 4,
       "semesters_per_year": 2,
       "entry_year": "2021/2022",
-      "mode": "zeros" # or "available"
+      "mode": "zeros", # or "available"
+      "grading_scale": 2 # optional GradingScale id, default Nigerian 5-point
     }
     """
     if request.method != "POST":
@@ -255,79 +294,50 @@ def create_sheet(request):
     try:
         payload = json.loads(request.body)
         print("[DEBUG] create_sheet payload:", payload)
-        uid = payload.get("uid")
-        owner = get_object_or_404(UserProfile, uid=uid)
-
-        sheet = ResultSheet.objects.create(
-            owner=owner,
-            student_name=payload.get("student_name", "Unnamed"),
-            university=payload.get("university",""),
-            faculty=payload.get("faculty",""),
-            department=payload.get("department",""),
-            years_of_study=int(payload.get("years_of_study", 4)),
-            semesters_per_year=int(payload.get("semesters_per_year", 2)),
-            entry_year=payload.get("entry_year",""),
-            mode=payload.get("mode","zeros")
-        )
-
-        # generate years and semesters
-        years = sheet.years_of_study
-        semesters_per_year = sheet.semesters_per_year
-        entry = sheet.entry_year.strip()  # e.g. "2021/2022"
-        # parse starting year string for label generation
-        start_left = None
-        if entry and '/' in entry:
-            try:
-                start_left = int(entry.split('/')[0])
-            except:
-                start_left = None
-
-        for y in range(1, years+1):
-            if start_left:
-                left = start_left + (y-1)
-                right = left + 1
-                label = f"{left}/{right} Year {y}"
-            else:
-                label = f"Year {y}"
-
-            year_obj = Year.objects.create(sheet=sheet, index=y, year_label=label)
-
-            for sidx in range(1, semesters_per_year+1):
-                sem_label = f"{sidx}{'st' if sidx==1 else 'nd' if sidx==2 else 'th'} Semester"
-                sem_obj = Semester.objects.create(year=year_obj, index=sidx, label=sem_label)
-                # If mode is 'zeros', auto-create 1 zeroed course per semester
-                if sheet.mode == 'zeros':
-                    Course.objects.create(
-                        semester=sem_obj,
-                        code=f"C code 1",
-                        title=f"C title 1",
-                        credit_unit=1,
-                        incourse=0,
-                        exam=0
-                    )
-
+        sheet, = await sync_to_async(scaffold.create_sheets)(request.profile, [payload])
         return JsonResponse({"status":"ok","sheet_id": sheet.id})
 
+    except scaffold.InvalidSheet as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except GradingScale.DoesNotExist as e:
+        return JsonResponse({"error": str(e)}, status=404)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
+CREATE_SHEETS_MAX = 500
+
 @csrf_exempt
-def update_sheet(request, sheet_id):
+@profile_required
+async def create_sheets(request):
     """
-    PUT /api/update-sheet/<id>/
-    JSON: { "uid": "...", "student_name": "...", "university": "...", ... }
+    POST /api/create-sheets/
+    JSON: { "sheets": [ {create_sheet fields}, ... ] }
+    Creates a whole cohort of sheets in one transaction.
     """
-    if request.method != "PUT":
-        return JsonResponse({"error": "PUT only"}, status=405)
+    if request.method != "POST":
+        return JsonResponse({"error":"POST only"}, status=405)
 
     try:
         payload = json.loads(request.body)
-        print(f"[DEBUG] update_sheet payload for sheet_id={sheet_id}:", payload)
-        uid = payload.get("uid")
-        if not uid:
-            return JsonResponse({"error": "uid required"}, status=400)
+        items = payload.get("sheets") or []
+        if not isinstance(items, list) or not items:
+            return JsonResponse({"error": "sheets must be a non-empty list"}, status=400)
+        if len(items) > CREATE_SHEETS_MAX:
+            return JsonResponse({"error": f"At most {CREATE_SHEETS_MAX} sheets per request"}, status=400)
+
+        sheets = await sync_to_async(scaffold.create_sheets)(request.profile, items)
+        return JsonResponse({"status": "ok", "sheet_ids": [sheet.id for sheet in sheets]})
+    except scaffold.InvalidSheet as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except GradingScale.DoesNotExist as e:
+        return JsonResponse({"error": str(e)}, status=404)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
 
-        sheet = ResultSheet.objects.get(id=sheet_id, owner__uid=uid)
+def _update_sheet(sheet_id, owner_id, payload, if_match):
+    with transaction.atomic():
+        sheet = ResultSheet.objects.select_for_update().get(id=sheet_id, owner_id=owner_id)
+        mutations.check_version(sheet, if_match)
 
         # Update fields
         sheet.student_name = payload.get("student_name", sheet.student_name)
@@ -335,6 +345,8 @@ def update_sheet(request, sheet_id):
         sheet.faculty = payload.get("faculty", sheet.faculty)
         sheet.department = payload.get("department", sheet.department)
         sheet.entry_year = payload.get("entry_year", sheet.entry_year)
+        if "grading_scale" in payload:
+            sheet.grading_scale = _grading_scale(payload["grading_scale"])
         prev_mode = sheet.mode
         new_mode = payload.get("mode", sheet.mode)
         sheet.mode = new_mode
@@ -342,19 +354,30 @@ def update_sheet(request, sheet_id):
 
         # If switching to 'zeros' mode, ensure every semester has at least one zeroed course
         if prev_mode != "zeros" and new_mode == "zeros":
-            for year in sheet.years.all():
-                for sem in year.semesters.all():
-                    if sem.courses.count() == 0:
-                        Course.objects.create(
-                            semester=sem,
-                            code=f"C code 1",
-                            title=f"C title 1",
-                            credit_unit=1,
-                            incourse=0,
-                            exam=0
-                        )
+            empty = Semester.objects.filter(year__sheet=sheet, courses__isnull=True).values_list("id", flat=True)
+            adds = [(sem_id, scaffold.PLACEHOLDER_COURSE) for sem_id in empty]
+            if adds:
+                sheet.version = mutations.apply(sheet.id, adds=adds).sheet.version
+    return sheet
 
-        return JsonResponse({"status": "ok"})
+
+@csrf_exempt
+@profile_required
+async def update_sheet(request, sheet_id):
+    """
+    PUT /api/update-sheet/<id>/
+    JSON: { "student_name": "...", "university": "...", ... }
+    """
+    if request.method != "PUT":
+        return JsonResponse({"error": "PUT only"}, status=405)
+
+    try:
+        payload = json.loads(request.body)
+        print(f"[DEBUG] update_sheet payload for sheet_id={sheet_id}:", payload)
+        sheet = await sync_to_async(_update_sheet)(sheet_id, request.profile.id, payload, _if_match(request))
+        return _with_etag(JsonResponse({"status": "ok", "version": sheet.version}), sheet)
+    except mutations.MutationError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
     except ResultSheet.DoesNotExist:
         return JsonResponse({"error": "Sheet not found or not yours"}, status=404)
     except Exception as e:
@@ -362,7 +385,8 @@ def update_sheet(request, sheet_id):
 
 
 @csrf_exempt
-def sheet_detail_api(request, sheet_id):
+@profile_required
+async def sheet_detail_api(request, sheet_id):
     """
     GET /api/sheet/<id>/
     Returns details of a single sheet (basic info only)
@@ -371,7 +395,7 @@ def sheet_detail_api(request, sheet_id):
         return JsonResponse({"error": "GET only"}, status=405)
 
     try:
-        sheet = ResultSheet.objects.get(id=sheet_id)
+        sheet = await ResultSheet.objects.aget(id=sheet_id, owner_id=request.profile.id)
         data = {
             "id": sheet.id,
             "student_name": sheet.student_name,
@@ -389,91 +413,175 @@ def sheet_detail_api(request, sheet_id):
 
 
 @csrf_exempt
-def add_course(request):
+@profile_required
+async def add_course(request):
     """
     Add a course to a semester (POST)
     JSON:
     { "semester_id": 3, "code": "...", "title": "...", "credit_unit": 3, "incourse": 12, "exam": 58 }
+    Returns the graded course and the new semester/year/sheet rollups.
     """
     if request.method != "POST":
         return JsonResponse({"error":"POST only"}, status=405)
     try:
         payload = json.loads(request.body)
         semester_id = int(payload.get("semester_id"))
-        sem = Semester.objects.get(id=semester_id)
-
-        c = Course.objects.create(
-            semester=sem,
-            code=payload.get("code",""),
-            title=payload.get("title",""),
-            credit_unit=int(payload.get("credit_unit",0)),
-            incourse=int(payload.get("incourse",0)),
-            exam=int(payload.get("exam",0))
+        result = await sync_to_async(mutations.apply)(
+            adds=[(semester_id, payload)],
+            if_match=_if_match(request), not_found="Semester not found",
+            id__in=Semester.objects.filter(id=semester_id).values("sheet_id"), owner_id=request.profile.id,
         )
-        return JsonResponse({"status":"ok","course_id": c.id})
+        c, = result.created
+        data = await _course_result(c, result)
+        return _with_etag(JsonResponse({"status":"ok","course_id": c.id, **data}), result.sheet)
+    except mutations.MutationError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
 
 # --- Batch Course API ---
 @csrf_exempt
-def get_semester_courses(request, semester_id):
+@profile_required
+async def get_semester_courses(request, semester_id):
     """
     GET /api/semester/<id>/courses/
     Returns all courses for a semester (for batch modal)
     """
     if request.method != "GET":
         return JsonResponse({"error": "GET only"}, status=405)
-    try:
-        sem = Semester.objects.get(id=semester_id)
-        courses = [
-            {
-                "id": c.id,
-                "code": c.code,
-                "title": c.title,
-                "credit_unit": c.credit_unit,
-                "incourse": c.incourse,
-                "exam": c.exam
-            }
-            for c in sem.courses.all()
-        ]
-        return JsonResponse({"courses": courses})
-    except Semester.DoesNotExist:
-        return JsonResponse({"courses": []})
+    # Unknown semesters and other users' semesters both come back empty.
+    courses = [
+        {
+            "id": c.id,
+            "code": c.code,
+            "title": c.title,
+            "credit_unit": c.credit_unit,
+            "incourse": c.incourse,
+            "exam": c.exam
+        }
+        async for c in Course.objects.filter(semester_id=semester_id, owner_id=request.profile.id)
+    ]
+    return JsonResponse({"courses": courses})
+
+def _course_dict(course, table):
+    grade, grade_point = table.lookup(course.score)
+    return {
+        "id": course.id,
+        "code": course.code,
+        "title": course.title,
+        "credit_unit": course.credit_unit,
+        "incourse": course.incourse,
+        "exam": course.exam,
+        "score": course.score,
+        "grade": grade,
+        "grade_point": grade_point,
+    }
+
+
+def _rollup_dict(row):
+    """Stored totals and GPA of a Semester, Year or ResultSheet."""
+    return {
+        "id": row.id,
+        "total_points": float(row.total_points),
+        "total_credits": row.total_credits,
+        "gpa": _gpa(row.total_points, row.total_credits),
+    }
+
+
+async def _course_result(course, result):
+    """The rollups a single-course mutation moved, plus the course itself."""
+    data = {
+        "semester": _rollup_dict(result.semesters[0]),
+        "year": _rollup_dict(result.years[0]),
+        "sheet": _rollup_dict(result.sheet),
+    }
+    if course is not None:
+        data["course"] = _course_dict(course, await grading.aget_table(result.sheet.grading_scale_id))
+    return data
+
 
 @csrf_exempt
-def batch_add_courses(request):
+@profile_required
+async def batch_add_courses(request):
     """
     POST /api/batch-add-courses/
-    JSON: { "semester_id": <id>, "courses": [ {...}, ... ] }
-    Adds/replaces all courses for a semester.
+    JSON: { "semester_id": <id>, "courses": [ {"id": <optional>, ...}, ... ] }
+    Makes the semester's courses match the list: courses with an id are
+    updated in place, new ones are added and unlisted ones deleted.
+    Returns the courses and the new semester/year/sheet rollups.
     """
     if request.method != "POST":
         return JsonResponse({"error": "POST only"}, status=405)
     try:
         payload = json.loads(request.body)
+        if not isinstance(payload, dict):
+            raise mutations.MutationError("Request body must be a JSON object")
         semester_id = int(payload.get("semester_id"))
-        courses_data = payload.get("courses", [])
-        sem = Semester.objects.get(id=semester_id)
-        # Remove existing courses (for replace semantics)
-        sem.courses.all().delete()
-        # Add new courses
-        for cdata in courses_data:
-            Course.objects.create(
-                semester=sem,
-                code=cdata.get("code", ""),
-                title=cdata.get("title", ""),
-                credit_unit=int(cdata.get("credit_unit", 0)),
-                incourse=int(cdata.get("incourse", 0)),
-                exam=int(cdata.get("exam", 0))
-            )
-        return JsonResponse({"status": "ok"})
+        result = await sync_to_async(mutations.replace_semester)(
+            semester_id, payload.get("courses", []), if_match=_if_match(request), owner_id=request.profile.id,
+        )
+        table = await grading.aget_table(result.sheet.grading_scale_id)
+        kept = sorted(result.created + result.updated + result.unchanged, key=lambda c: c.id)
+        return _with_etag(JsonResponse({
+            "status": "ok",
+            "courses": [_course_dict(c, table) for c in kept],
+            "semester": _rollup_dict(result.semesters[0]),
+            "year": _rollup_dict(result.years[0]),
+            "sheet": _rollup_dict(result.sheet),
+        }), result.sheet)
+    except mutations.MutationError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
 
+MUTATE_MAX_OPS = 1000
+
 @csrf_exempt
-def course_detail(request, course_id):
+@profile_required
+async def mutate_sheet(request, sheet_id):
+    """
+    POST /api/sheet/<id>/mutate/
+    JSON: { "ops": [ {"op": "add" | "update" | "delete", ...}, ... ] }
+    Applies the course operations (see mutations.fold_ops) in one
+    transaction. Returns the ids of added courses by ref, the changed
+    courses and the new rollups of every semester and year touched.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST only"}, status=405)
+    try:
+        payload = json.loads(request.body)
+        if not isinstance(payload, dict):
+            raise mutations.MutationError("Request body must be a JSON object")
+        ops = payload.get("ops") or []
+        if len(ops) > MUTATE_MAX_OPS:
+            return JsonResponse({"error": f"At most {MUTATE_MAX_OPS} ops per request"}, status=400)
+
+        adds, refs, updates, deletes = mutations.fold_ops(ops)
+        result = await sync_to_async(mutations.apply)(
+            sheet_id, adds, updates, deletes, if_match=_if_match(request), owner_id=request.profile.id,
+        )
+        table = await grading.aget_table(result.sheet.grading_scale_id)
+        return _with_etag(JsonResponse({
+            "status": "ok",
+            "ids": {ref: c.id for ref, c in zip(refs, result.created) if ref is not None},
+            "created": [_course_dict(c, table) for c in result.created],
+            "updated": [_course_dict(c, table) for c in result.updated + result.unchanged],
+            "deleted": result.deleted,
+            "semesters": [_rollup_dict(s) for s in result.semesters],
+            "years": [_rollup_dict(y) for y in result.years],
+            "sheet": _rollup_dict(result.sheet),
+        }), result.sheet)
+    except mutations.MutationError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@csrf_exempt
+@profile_required
+async def course_detail(request, course_id):
     """
     GET /api/course/<id>/
     Returns details of a single course
@@ -482,7 +590,9 @@ def course_detail(request, course_id):
         return JsonResponse({"error": "GET only"}, status=405)
 
     try:
-        course = Course.objects.get(id=course_id)
+        course = await Course.objects.select_related("sheet").aget(id=course_id, owner_id=request.profile.id)
+        table = await grading.aget_table(course.sheet.grading_scale_id)
+        grade, grade_point = table.lookup(course.score)
         data = {
             "id": course.id,
             "code": course.code,
@@ -491,8 +601,8 @@ def course_detail(request, course_id):
             "incourse": course.incourse,
             "exam": course.exam,
             "score": course.score,
-            "grade": course.grade,
-            "grade_point": course.grade_point,
+            "grade": grade,
+            "grade_point": grade_point,
         }
         return JsonResponse(data)
     except Course.DoesNotExist:
@@ -500,249 +610,489 @@ def course_detail(request, course_id):
 
 
 @csrf_exempt
-def update_course(request, course_id):
+@profile_required
+async def update_course(request, course_id):
     """
     PUT /api/update-course/<id>/
     JSON: { "code": "...", "title": "...", "credit_unit": 3, "incourse": 20, "exam": 60 }
+    Returns the graded course and the new semester/year/sheet rollups.
     """
     if request.method != "PUT":
         return JsonResponse({"error": "PUT only"}, status=405)
 
     try:
         payload = json.loads(request.body)
-        course = Course.objects.get(id=course_id)
-
-        # Update fields
-        course.code = payload.get("code", course.code)
-        course.title = payload.get("title", course.title)
-        course.credit_unit = int(payload.get("credit_unit", course.credit_unit))
-        course.incourse = int(payload.get("incourse", course.incourse))
-        course.exam = int(payload.get("exam", course.exam))
-        course.save()
-
-        return JsonResponse({"status": "ok"})
-    except Course.DoesNotExist:
-        return JsonResponse({"error": "Course not found"}, status=404)
+        result = await sync_to_async(mutations.apply)(
+            updates={course_id: payload},
+            if_match=_if_match(request), not_found="Course not found",
+            id__in=Course.objects.filter(id=course_id).values("sheet_id"), owner_id=request.profile.id,
+        )
+        course, = result.updated + result.unchanged
+        data = await _course_result(course, result)
+        return _with_etag(JsonResponse({"status": "ok", **data}), result.sheet)
+    except mutations.MutationError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
 # New: Delete course endpoint
 @csrf_exempt
-def delete_course(request, course_id):
+@profile_required
+async def delete_course(request, course_id):
     """
-    DELETE /api/delete-course/<id>/?uid=<firebase_uid>
+    DELETE /api/delete-course/<id>/
+    Returns the new semester/year/sheet rollups.
     """
     if request.method != "DELETE":
         return JsonResponse({"error": "DELETE only"}, status=405)
 
-    uid = request.GET.get("uid")
-    if not uid:
-        return JsonResponse({"error": "uid required"}, status=400)
-
     try:
-        course = Course.objects.get(id=course_id)
-        # Check ownership via course.semester.year.sheet.owner.uid
-        if course.semester.year.sheet.owner.uid != uid:
-            return JsonResponse({"error": "Not authorized"}, status=403)
-        sheet = course.semester.year.sheet
-        semester = course.semester
-        if sheet.mode == "zeros":
-            course_count = semester.courses.count()
-            if course_count <= 1:
-                return JsonResponse({"error": "Cannot delete the last course in this semester (All 0s mode)."}, status=403)
-        course.delete()
-        return JsonResponse({"status": "ok"})
-    except Course.DoesNotExist:
-        return JsonResponse({"error": "Course not found"}, status=404)
+        result = await sync_to_async(mutations.apply)(
+            deletes=[course_id], if_match=_if_match(request),
+            not_found="Course not found or not yours",
+            id__in=Course.objects.filter(id=course_id).values("sheet_id"), owner_id=request.profile.id,
+        )
+        data = await _course_result(None, result)
+        return _with_etag(JsonResponse({"status": "ok", "deleted": course_id, **data}), result.sheet)
+    except mutations.MutationError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
 
 
-def sheet_detail(request, sheet_id):
+@profile_required
+async def sheet_detail(request, sheet_id):
     """
     Return sheet + years + semesters + courses summary (GET)
+    ETag is the sheet version; If-None-Match gets a 304 when unchanged.
     """
-    sheet = get_object_or_404(ResultSheet, id=sheet_id)
-    data = {
-        "id": sheet.id,
-        "student_name": sheet.student_name,
-        "university": sheet.university,
-        "faculty": sheet.faculty,
-        "department": sheet.department,
-        "years_of_study": sheet.years_of_study,
-        "semesters_per_year": sheet.semesters_per_year,
-        "entry_year": sheet.entry_year,
-        "mode": sheet.mode,
-        "cgpa": sheet.cgpa,
-        "years": []
-    }
-    for year in sheet.years.all():
-        ydata = {"id": year.id, "index": year.index, "year_label": year.year_label, "year_gpa": year.year_gpa, "semesters": []}
-        for sem in year.semesters.all():
-            semdata = {"id": sem.id, "index": sem.index, "label": sem.label, "gpa": sem.gpa, "courses": []}
-            for c in sem.courses.all():
-                semdata["courses"].append({
-                    "id": c.id, "code": c.code, "title": c.title,
-                    "credit_unit": c.credit_unit, "incourse": c.incourse,
-                    "exam": c.exam, "score": c.score, "grade": c.grade, "grade_point": c.grade_point
-                })
-            ydata["semesters"].append(semdata)
-        data["years"].append(ydata)
-    return JsonResponse(data)
+    not_modified = await _not_modified(request, sheet_id)
+    if not_modified is not None:
+        return not_modified
+    try:
+        snap = await sync_to_async(snapshot.load)(sheet_id, owner_id=request.profile.id)
+    except ResultSheet.DoesNotExist:
+        return JsonResponse({"error": "Sheet not found"}, status=404)
+    return _with_etag(JsonResponse(snapshot.as_dict(snap)), snap)
+
+@profile_required
+async def sheet_changes(request, sheet_id):
+    """
+    GET /api/sheet/<id>/changes/?since=<version>
+    The journal entries that took the sheet from `since` to its current
+    version, with the new rollups of the semesters they touched (and of
+    their years and the sheet). {"resync": true} when the journal no
+    longer reaches back to `since`: reload /api/sheet/<id>/ instead.
+    """
+    try:
+        version = int(request.GET.get("since", ""))
+    except ValueError:
+        return JsonResponse({"error": "since must be a sheet version"}, status=400)
+    try:
+        sheet, entries = await sync_to_async(journal.since)(sheet_id, version, owner_id=request.profile.id)
+    except ResultSheet.DoesNotExist:
+        return JsonResponse({"error": "Sheet not found"}, status=404)
+    if entries is None:
+        return _with_etag(JsonResponse({"version": sheet.version, "resync": True}), sheet)
+
+    sem_ids = {e.data["semester_id"] for e in entries if e.kind == "course"}
+    sem_ids |= {e.object_id for e in entries if e.kind == "semester" and e.action != "delete"}
+    semesters = [
+        sem async for sem in Semester.objects.select_related("year").filter(id__in=sem_ids, sheet_id=sheet_id)
+    ] if sem_ids else []
+    years = {sem.year_id: sem.year for sem in semesters}
+    return _with_etag(JsonResponse({
+        "version": sheet.version,
+        "resync": False,
+        "changes": [journal.as_dict(e) for e in entries],
+        "semesters": [{**_rollup_dict(sem), "year_id": sem.year_id} for sem in semesters],
+        "years": [_rollup_dict(year) for year in years.values()],
+        "sheet": _rollup_dict(sheet),
+    }), sheet)
+
+EVENTS_KEEPALIVE = 25   # seconds; below common proxy idle timeouts
+
+
+def _sse(event):
+    version = f"id: {event['sheet_id']}.{event['version']}\n" if "version" in event else ""
+    return f"{version}event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+@profile_required
+async def user_events(request):
+    """
+    GET /api/events/
+    Server-Sent Events stream of the user's sheet changes as they commit:
+    "change" events carry the journal entries of one sheet version,
+    "sheet" events creations and deletions, and "resync" means events were
+    dropped and the client should reload. Needs an ASGI server: under
+    WSGI the stream would hold a worker for good, so it is refused.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "Live events need the ASGI server"}, status=501)
+    owner_id = request.profile.id
+
+    async def stream():
+        queue = events.subscribe(owner_id)
+        try:
+            yield f"retry: {EVENTS_KEEPALIVE * 1000}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(event)
+        finally:
+            events.unsubscribe(owner_id, queue)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+LIST_SHEETS_PAGE_SIZE = 50
+LIST_SHEETS_MAX_PAGE_SIZE = 200
+LIST_SHEETS_FILTERS = ("university", "department", "entry_year")
+# sort -> (keyset ordering, cursor value types)
+LIST_SHEETS_ORDERINGS = {
+    "created": (("created_at", "id"), (datetime.fromisoformat, int)),
+    "-created": (("-created_at", "-id"), (datetime.fromisoformat, int)),
+    "cgpa": (("cgpa_key", "id"), (float, int)),
+    "-cgpa": (("-cgpa_key", "-id"), (float, int)),
+}
 
 @csrf_exempt
-def list_sheets(request):
+@profile_required
+async def list_sheets(request):
     """
-    GET /api/list-sheets/?uid=<firebase_uid>
-    Return all sheets for a user.
+    GET /api/list-sheets/
+        [?university=...&department=...&entry_year=...]
+        [&sort=created|-created|cgpa|-cgpa][&limit=50][&cursor=<next_cursor>][&summary=1]
+    Return one page of the caller's sheets; follow next_cursor for the rest.
+    summary=1 adds {"count", "avg_cgpa", "best_cgpa"} over every matching sheet.
     """
-    uid = request.GET.get("uid")
-    if not uid:
-        return JsonResponse({"error": "uid required"}, status=400)
+    sort = request.GET.get("sort", "created")
+    if sort not in LIST_SHEETS_ORDERINGS:
+        return JsonResponse({"error": f"sort must be one of {', '.join(LIST_SHEETS_ORDERINGS)}"}, status=400)
+    ordering, types = LIST_SHEETS_ORDERINGS[sort]
+    try:
+        limit = min(max(int(request.GET.get("limit", LIST_SHEETS_PAGE_SIZE)), 1), LIST_SHEETS_MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({"error": "limit must be an integer"}, status=400)
 
+    filters = {f: request.GET[f] for f in LIST_SHEETS_FILTERS if request.GET.get(f)}
+    sheets = ResultSheet.objects.filter(owner_id=request.profile.id, **filters).with_cgpa_key()
+    keys = [field.lstrip("-") for field in ordering]
     try:
-        user = UserProfile.objects.get(uid=uid)
-    except UserProfile.DoesNotExist:
-        return JsonResponse({"sheets": []})
+        rows, next_cursor = await pagination.apaginate(
+            sheets.values_list(*snapshot.HEADER_VALUES, *keys),
+            ordering, request.GET.get("cursor"), types, limit,
+        )
+    except pagination.InvalidCursor:
+        return JsonResponse({"error": "Invalid cursor"}, status=400)
+
+    page = [snapshot.header_dict(snapshot.header_from_row(row)) for row in rows]
+    data = {"sheets": page, "next_cursor": next_cursor}
+    if request.GET.get("summary"):
+        totals = await sheets.aaggregate(count=Count("id"), avg=Avg("cgpa_key"), best=Max("cgpa_key"))
+        data["summary"] = {
+            "count": totals["count"],
+            "avg_cgpa": round(totals["avg"] or 0, 2),
+            "best_cgpa": round(totals["best"] or 0, 2),
+        }
+    # A page only changes when its query, its sheets or their versions (or the summary) do.
+    etag = hashlib.sha1(json.dumps([
+        sorted(request.GET.items()), [(s["id"], s["version"]) for s in page], next_cursor, data.get("summary"),
+    ]).encode()).hexdigest()
+    etag = f'"{etag}"'
+    response = get_conditional_response(request, etag=etag) or JsonResponse(data)
+    response["ETag"] = etag
+    return response
 
-    sheets = []
-    for sheet in user.sheets.all():
-        sheets.append({
-            "id": sheet.id,
-            "student_name": sheet.student_name,
-            "university": sheet.university,
-            "faculty": sheet.faculty,
-            "department": sheet.department,
-            "years_of_study": sheet.years_of_study,
-            "semesters_per_year": sheet.semesters_per_year,
-            "entry_year": sheet.entry_year,
-            "mode": sheet.mode,
-            "cgpa": sheet.cgpa,
-        })
+async def list_grading_scales(request):
+    """
+    GET /api/grading-scales/
+    Return the grading scales a sheet can be created with.
+    """
+    tables = await grading.aall_tables()
+    scales = [
+        {
+            "id": scale.id,
+            "name": scale.name,
+            "description": scale.description,
+            "bands": [
+                {"min_score": min_score, "grade": grade, "grade_point": float(point)}
+                for min_score, grade, point in tables.get(scale.id, grading.DEFAULT_TABLE).bands
+            ],
+        }
+        async for scale in GradingScale.objects.order_by("name")
+    ]
+    return JsonResponse({"scales": scales})
+
+def _delete_sheet(sheet_id, owner_id, if_match):
+    with transaction.atomic():
+        sheet = ResultSheet.objects.select_for_update().get(id=sheet_id, owner_id=owner_id)
+        mutations.check_version(sheet, if_match)
+        sheet.delete()
 
-    return JsonResponse({"sheets": sheets})
 
 @csrf_exempt
-def delete_sheet(request, sheet_id):
+@profile_required
+async def delete_sheet(request, sheet_id):
     """
-    DELETE /api/delete-sheet/<id>/?uid=<firebase_uid>
+    DELETE /api/delete-sheet/<id>/
     """
     if request.method != "DELETE":
         return JsonResponse({"error": "DELETE only"}, status=405)
 
-    uid = request.GET.get("uid")
-    if not uid:
-        return JsonResponse({"error": "uid required"}, status=400)
-
     try:
-        sheet = ResultSheet.objects.get(id=sheet_id, owner__uid=uid)
-        sheet.delete()
+        await sync_to_async(_delete_sheet)(sheet_id, request.profile.id, _if_match(request))
         return JsonResponse({"status": "ok"})
     except ResultSheet.DoesNotExist:
         return JsonResponse({"error": "Sheet not found or not yours"}, status=404)
+    except mutations.MutationError as e:
+        return JsonResponse({"error": str(e)}, status=e.status)
+
+
+@profile_required
+async def export_pdf(request, sheet_id):
+    """
+    GET /api/sheet/<id>/pdf/
+    The transcript is rendered once per sheet version and served from
+    the on-disk cache after that (see acadegradecore.transcripts).
+    """
+    row = await (
+        ResultSheet.objects.filter(id=sheet_id, owner_id=request.profile.id)
+        .values_list("version", "student_name").afirst()
+    )
+    if row is None:
+        return JsonResponse({"error": "Sheet not found"}, status=404)
+    version, student_name = row
+    etag = _sheet_etag(sheet_id, version)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        not_modified["ETag"] = etag
+        return not_modified
+
+    pdf = transcripts.open_cached(sheet_id, version)
+    if pdf is None:
+        try:
+            snap = await sync_to_async(snapshot.load)(sheet_id, owner_id=request.profile.id)
+        except ResultSheet.DoesNotExist:
+            return JsonResponse({"error": "Sheet not found"}, status=404)
+        pdf = await offload.run(transcripts.render, snap)
+        version = snap.version
+
+    response = FileResponse(
+        pdf, as_attachment=True, filename=f"ResultSheet_{student_name}.pdf", content_type="application/pdf",
+    )
+    response["ETag"] = _sheet_etag(sheet_id, version)
+    return response
 
 
-def export_pdf(request, sheet_id):
-    # Fetch the sheet
-    sheet = ResultSheet.objects.get(id=sheet_id)
+def _job_dict(sheet_id, version, status):
+    return {
+        "job_id": jobs.job_id(sheet_id, version),
+        "status": status,
+        "status_url": f"/api/sheet/{sheet_id}/pdf/jobs/{version}/",
+    }
 
-    # Prepare response
-    response = HttpResponse(content_type="application/pdf")
-    response["Content-Disposition"] = f'attachment; filename="ResultSheet_{sheet.student_name}.pdf"'
 
-    # Create PDF
-    doc = SimpleDocTemplate(response, pagesize=A4)
-    styles = getSampleStyleSheet()
-    story = []
+@csrf_exempt
+@profile_required
+async def start_pdf_job(request, sheet_id):
+    """
+    POST /api/sheet/<id>/pdf/jobs/
+    Renders the transcript of the sheet's current version on the render
+    worker pool. 202 {"job_id", "status": "pending", "status_url"}, or 200
+    with "status": "ready" when it is already cached; poll status_url.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST only"}, status=405)
+    row = await (
+        ResultSheet.objects.filter(id=sheet_id, owner_id=request.profile.id).values_list("version", flat=True).afirst()
+    )
+    if row is None:
+        return JsonResponse({"error": "Sheet not found"}, status=404)
+    if transcripts.cached_path(sheet_id, row) is not None:
+        return JsonResponse(_job_dict(sheet_id, row, "ready"))
+    try:
+        snap = await sync_to_async(snapshot.load)(sheet_id, owner_id=request.profile.id)
+    except ResultSheet.DoesNotExist:
+        return JsonResponse({"error": "Sheet not found"}, status=404)
+    jobs.submit(snap)
+    return JsonResponse(_job_dict(sheet_id, snap.version, "pending"), status=202)
+
 
-    # --- Branding header ---
-    title_style = ParagraphStyle(
-        "title",
-        parent=styles["Heading1"],
-        alignment=1,
-        fontSize=18,
-        spaceAfter=12,
+@profile_required
+async def pdf_job_status(request, sheet_id, version):
+    """
+    GET /api/sheet/<id>/pdf/jobs/<version>/
+    The PDF once the job is done; otherwise 202 {"status": "pending"},
+    500 {"status": "failed"}, or 410 {"status": "expired"} when the sheet
+    changed before the transcript was rendered.
+    """
+    row = await (
+        ResultSheet.objects.filter(id=sheet_id, owner_id=request.profile.id)
+        .values_list("version", "student_name").afirst()
     )
-    story.append(Paragraph("🎓 AcadeGrade", title_style))
-    story.append(Spacer(1, 12))
-
-    # --- Student info ---
-    info = f"""
-    <b>Student:</b> {sheet.student_name}<br/>
-    <b>University:</b> {sheet.university or '-'}<br/>
-    <b>Faculty:</b> {sheet.faculty or '-'}<br/>
-    <b>Department:</b> {sheet.department or '-'}<br/>
-    <b>Entry Year:</b> {sheet.entry_year}<br/>
-    <b>Years of Study:</b> {sheet.years_of_study} <br/>
-    <b>Semesters/Year:</b> {sheet.semesters_per_year} <br/>
-    <b>Mode:</b> {"Build-up (Zeros)" if sheet.mode == "zeros" else "Availability"}<br/>
-    """
-    story.append(Paragraph(info, styles["Normal"]))
-    story.append(Spacer(1, 12))
-
-    # --- Year by year breakdown ---
-    years = {}
-    for semester in sheet.semester_set.all().order_by("id"):
-        year_index = (semester.index // sheet.semesters_per_year) + 1
-        years.setdefault(year_index, []).append(semester)
-
-    for year, semesters in years.items():
-        # Year heading
-        story.append(Paragraph(f"<b>Year {year}</b>", styles["Heading2"]))
-        story.append(Spacer(1, 6))
-
-        year_total_points = 0
-        year_total_units = 0
-
-        for sem in semesters:
-            story.append(Paragraph(f"<u>{sem.label}</u>", styles["Heading3"]))
-            table_data = [["Code", "Title", "Unit", "Score", "Grade"]]
-
-            sem_total_points = 0
-            sem_total_units = 0
-
-            for course in sem.course_set.all():
-                table_data.append([
-                    course.code,
-                    course.title,
-                    str(course.credit_unit),
-                    str(course.score),
-                    course.grade,
-                ])
-                sem_total_units += course.credit_unit
-                sem_total_points += course.credit_unit * course.grade_point
-
-            # Add semester table
-            table = Table(table_data, hAlign="LEFT")
-            table.setStyle(TableStyle([
-                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#0d6efd")),
-                ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                ("BOTTOMPADDING", (0, 0), (-1, 0), 8),
-                ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-            ]))
-            story.append(table)
-
-            # Semester GPA
-            sem_gpa = sem_total_points / sem_total_units if sem_total_units else 0
-            story.append(Paragraph(f"<b>Semester GPA:</b> {sem_gpa:.2f}", styles["Normal"]))
-            story.append(Spacer(1, 6))
-
-            year_total_points += sem_total_points
-            year_total_units += sem_total_units
-
-        # Year GPA summary
-        year_gpa = year_total_points / year_total_units if year_total_units else 0
-        story.append(Paragraph(f"<b>Year {year} GPA:</b> {year_gpa:.2f}", styles["Heading3"]))
-        story.append(Spacer(1, 12))
-
-    # --- Overall CGPA ---
-    cgpa = getattr(sheet, "cgpa", 0.0)
-    story.append(Paragraph(f"<b>Total CGPA:</b> {cgpa:.2f}", styles["Heading2"]))
-
-    # Build document
-    doc.build(story)
+    if row is None or version > row[0]:
+        return JsonResponse({"error": "Job not found"}, status=404)
+    current, student_name = row
+    pdf = transcripts.open_cached(sheet_id, version)
+    if pdf is not None:
+        response = FileResponse(
+            pdf, as_attachment=True, filename=f"ResultSheet_{student_name}.pdf", content_type="application/pdf",
+        )
+        response["ETag"] = _sheet_etag(sheet_id, version)
+        return response
+    error = jobs.failure(sheet_id, version)
+    if error is not None:
+        return JsonResponse({**_job_dict(sheet_id, version, "failed"), "error": str(error)}, status=500)
+    if version < current:
+        return JsonResponse({**_job_dict(sheet_id, version, "expired"),
+                             "error": "The sheet changed; start a new job"}, status=410)
+    return JsonResponse(_job_dict(sheet_id, version, "pending"), status=202)
+
+
+@csrf_exempt
+@profile_required
+async def export_pdfs(request):
+    """
+    POST /api/export-pdfs/
+    JSON: { "sheet_ids": [1, 2, ...] }, or {} for all of the user's sheets.
+    Streams one ZIP of their transcripts. Sheets without a cached
+    transcript are rendered in parallel on the render worker pool, and
+    each file is sent as soon as it and those before it are ready.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST only"}, status=405)
+    try:
+        payload = json.loads(request.body or b"{}")
+        sheet_ids = payload.get("sheet_ids")
+        sheets = ResultSheet.objects.filter(owner_id=request.profile.id).order_by("id")
+        if sheet_ids is not None:
+            sheet_ids = [int(i) for i in sheet_ids]
+            sheets = sheets.filter(id__in=sheet_ids)
+    except (AttributeError, TypeError, ValueError) as e:
+        return JsonResponse({"error": f"Invalid sheet_ids: {e}"}, status=400)
+    rows = [row async for row in sheets.values_list("id", "version", "student_name")]
+    if sheet_ids is not None and len(rows) != len(set(sheet_ids)):
+        missing = sorted(set(sheet_ids) - {row[0] for row in rows})
+        return JsonResponse({"error": f"Sheet(s) not found: {missing}"}, status=404)
+
+    # Files are opened one at a time as they are added to the ZIP.
+    cached = {sheet_id: transcripts.cached_path(sheet_id, version) for sheet_id, version, _ in rows}
+    stale = [sheet_id for sheet_id, path in cached.items() if path is None]
+    renders = {}
+    if stale:
+        snaps = await sync_to_async(snapshot.load_many)(stale, owner_id=request.profile.id)
+        renders = {sheet_id: jobs.submit(snap) for sheet_id, snap in snaps.items()}
+    # Sheets deleted since they were listed have neither.
+    rows = [row for row in rows if cached[row[0]] is not None or row[0] in renders]
+
+    def rerender(sheet_id):
+        # The file was replaced by a newer version's since the listing.
+        try:
+            return jobs.submit(snapshot.load(sheet_id, owner_id=request.profile.id))
+        except ResultSheet.DoesNotExist:
+            return None
+
+    def stream():
+        archive = exports.ZipStream()
+        for sheet_id, _, student_name in rows:
+            path = cached[sheet_id] or renders[sheet_id].result()
+            try:
+                pdf = open(path, "rb")
+            except FileNotFoundError:
+                render = rerender(sheet_id)
+                if render is None:
+                    continue
+                pdf = open(render.result(), "rb")
+            archive.add(transcripts.filename(sheet_id, student_name), pdf)
+            yield archive.drain()
+        archive.close()
+        yield archive.drain()
+
+    async def astream():
+        archive = exports.ZipStream()
+        for sheet_id, _, student_name in rows:
+            path = cached[sheet_id] or await asyncio.wrap_future(renders[sheet_id])
+            try:
+                pdf = open(path, "rb")
+            except FileNotFoundError:
+                render = await sync_to_async(rerender)(sheet_id)
+                if render is None:
+                    continue
+                pdf = open(await asyncio.wrap_future(render), "rb")
+            await offload.run(archive.add, transcripts.filename(sheet_id, student_name), pdf)
+            yield archive.drain()
+        archive.close()
+        yield archive.drain()
+
+    # As in _streamed_rows: each server only streams its own kind of iterator.
+    content = astream() if isinstance(request, ASGIRequest) else stream()
+    response = StreamingHttpResponse(content, content_type="application/zip")
+    response["Content-Disposition"] = 'attachment; filename="transcripts.zip"'
+    return response
+
+@csrf_exempt
+@profile_required
+async def export_results(request, fmt, sheet_id=None):
+    """
+    GET /api/export-results/<csv|ndjson|xlsx>/[?university=...&department=...&entry_year=...]
+    GET /api/sheet/<sheet_id>/results/<csv|ndjson|xlsx>/
+    Stream one row per course of the caller's sheets, or of one sheet.
+    """
+    if fmt not in exports.FORMATS:
+        return JsonResponse({"error": f"format must be one of {', '.join(exports.FORMATS)}"}, status=404)
+    if sheet_id is not None:
+        name = await ResultSheet.objects.filter(id=sheet_id, owner_id=request.profile.id).values_list(
+            "student_name", flat=True).afirst()
+        if name is None:
+            return JsonResponse({"error": "Sheet not found"}, status=404)
+        filters = {"sheet_id": sheet_id}
+        filename = f"Results_{name}.{fmt}"
+    else:
+        filters = {f"sheet__{f}": request.GET[f] for f in LIST_SHEETS_FILTERS if request.GET.get(f)}
+        filename = f"results.{fmt}"
+    rows = exports.results(exports.courses(owner_id=request.profile.id, **filters))
+    return _streamed_rows(request, exports.FORMATS[fmt](), rows, filename)
+
+def _streamed_rows(request, writer, rows, filename):
+    """Download of `rows`, encoded by `writer` while they are read."""
+    # Each server only streams its own kind of iterator; given the other,
+    # Django reads it to the end first, which is what this must not do.
+    if isinstance(request, ASGIRequest):
+        content = exports.aencode(writer, rows)
+    else:
+        content = exports.encode(writer, rows)
+    response = StreamingHttpResponse(content, content_type=writer.content_type)
+    response["Content-Disposition"] = content_disposition_header(True, filename)
     return response
 
+@csrf_exempt
+@profile_required
+async def broadsheet_report(request, fmt):
+    """
+    GET /api/broadsheet/<pdf|csv|ndjson|xlsx>/[?university=...&department=...&entry_year=...]
+    The class broadsheet of the caller's matching sheets: one row per
+    student, one column per course code, then semester GPAs and CGPA.
+    """
+    if fmt != "pdf" and fmt not in exports.FORMATS:
+        return JsonResponse({"error": f"format must be one of pdf, {', '.join(exports.FORMATS)}"}, status=404)
+    filters = {f"sheet__{f}": request.GET[f] for f in LIST_SHEETS_FILTERS if request.GET.get(f)}
+    layout = await sync_to_async(broadsheet.layout)(owner_id=request.profile.id, **filters)
+    rows = broadsheet.rows(layout, owner_id=request.profile.id, **filters)
+    if fmt != "pdf":
+        return _streamed_rows(request, exports.FORMATS[fmt](layout.columns), rows, f"broadsheet.{fmt}")
+
+    title = " ".join(["Broadsheet", *(request.GET[f] for f in LIST_SHEETS_FILTERS if request.GET.get(f))])
+    # Rows are read while the tables are laid out, so render where the ORM may run.
+    pdf = await sync_to_async(broadsheet.render_pdf)(title, layout, rows)
+    return FileResponse(pdf, as_attachment=True, filename="broadsheet.pdf", content_type="application/pdf")
+
 
 
 
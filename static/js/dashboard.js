@@ -6,6 +6,18 @@ document.addEventListener('DOMContentLoaded', () => {
   const addBatchRowBtn = document.getElementById('addBatchRowBtn');
   const saveBatchCoursesBtn = document.getElementById('saveBatchCoursesBtn');
 
+  // ETag of the sheet last fetched; writes send it as If-Match so an edit
+  // made meanwhile in another tab is refused (412) instead of overwritten.
+  let openSheetEtag = null;
+
+  function ifMatch(headers = {}) {
+    return openSheetEtag ? { ...headers, 'If-Match': openSheetEtag } : headers;
+  }
+
+  function rememberEtag(res) {
+    if (res.ok && res.headers.get('ETag')) openSheetEtag = res.headers.get('ETag');
+  }
+
   // Helper to create a table row
   function createBatchRow(values = {}, index = 1, mode = "available") {
     // Pre-fill code/title if not present
@@ -16,6 +28,8 @@ document.addEventListener('DOMContentLoaded', () => {
     const exam = (mode === "zeros") ? (values.exam ?? 0) : (values.exam ?? "");
     const required = (mode === "zeros") ? "required" : "";
     const row = document.createElement('tr');
+    // Existing courses keep their id so the batch updates them in place
+    if (values.id) row.dataset.courseId = values.id;
     row.innerHTML = `
       <td><input type="text" class="form-control" name="code" value="${code}" ${required}></td>
       <td><input type="text" class="form-control" name="title" value="${title}" ${required}></td>
@@ -137,6 +151,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     let courses = rows.map((row, idx) => {
       return {
+        id: row.dataset.courseId || null,
         code: row.querySelector('input[name="code"]').value.trim(),
         title: row.querySelector('input[name="title"]').value.trim(),
         credit_unit: row.querySelector('input[name="credit_unit"]').value,
@@ -172,9 +187,10 @@ document.addEventListener('DOMContentLoaded', () => {
       };
       const res = await fetch('/api/batch-add-courses/', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: ifMatch({ 'Content-Type': 'application/json' }),
         body: JSON.stringify(payload)
       });
+      rememberEtag(res);
       const data = await res.json();
       if (data.status === 'ok') {
         batchCourseModal.hide();
@@ -193,6 +209,7 @@ document.addEventListener('DOMContentLoaded', () => {
   function waitForUidAndLoadSheets(retries = 20) {
     if (window.currentUserUid) {
       loadSheets();
+      connectEvents();
     } else if (retries > 0) {
       setTimeout(() => waitForUidAndLoadSheets(retries - 1), 100);
     } else {
@@ -201,6 +218,43 @@ document.addEventListener('DOMContentLoaded', () => {
   }
   waitForUidAndLoadSheets();
 
+  // ----------------- LIVE UPDATES -----------------
+  // Changes committed from other tabs and devices arrive as Server-Sent
+  // Events; the open sheet is refetched (If-None-Match) or the list reloaded.
+  let openSheetId = null;
+  let reloadTimer = null;
+
+  function scheduleReload() {
+    clearTimeout(reloadTimer);
+    reloadTimer = setTimeout(loadSheets, 300);
+  }
+
+  async function refreshOpenSheet() {
+    const res = await fetch(`/api/sheet/${openSheetId}/`, {
+      headers: openSheetEtag ? { 'If-None-Match': openSheetEtag } : {}
+    });
+    if (res.status === 304 || !res.ok) return;
+    rememberEtag(res);
+    renderSheetDetail(await res.json());
+  }
+
+  function connectEvents() {
+    // Offered only when the server runs on ASGI (settings.LIVE_EVENTS)
+    if (!window.EventSource || !window.liveEvents) return;
+    const source = new EventSource('/api/events/');
+    const onEvent = (e) => {
+      const event = e.data ? JSON.parse(e.data) : {};
+      if (openSheetId === null) {
+        scheduleReload();
+      } else if (event.type === 'resync' || event.sheet_id === openSheetId) {
+        // Our own writes already moved openSheetEtag to this version
+        if (event.version && `"${event.sheet_id}.${event.version}"` === openSheetEtag) return;
+        refreshOpenSheet();
+      }
+    };
+    ['change', 'sheet', 'resync'].forEach(type => source.addEventListener(type, onEvent));
+  }
+
   // console.log("Current UID:", window.currentUserUid);
   const createBtn = document.getElementById('createSheetBtn');
   const fabBtn = document.getElementById('fabCreateSheetBtn');
@@ -266,7 +320,6 @@ document.addEventListener('DOMContentLoaded', () => {
 
     const formData = new FormData(createForm);
     const payload = Object.fromEntries(formData.entries());
-    payload.uid = window.currentUserUid;
 
     try {
       const res = await fetch('/api/create-sheet/', {
@@ -309,8 +362,8 @@ document.addEventListener('DOMContentLoaded', () => {
     showLoadingSkeleton();
 
     try {
-      const res = await fetch(`/api/list-sheets/?uid=${window.currentUserUid}`);
-      const data = await res.json();
+      // The first page, with stats over every sheet; later pages load on demand
+      const data = await (await fetch('/api/list-sheets/?summary=1')).json();
 
       const container = document.getElementById("sheetsList");
       container.innerHTML = "";
@@ -331,9 +384,9 @@ document.addEventListener('DOMContentLoaded', () => {
         return;
       }
 
-      const totalSheets = data.sheets.length;
-      const avgCgpa = data.sheets.reduce((sum, sheet) => sum + sheet.cgpa, 0) / totalSheets;
-      const bestCgpa = Math.max(...data.sheets.map(sheet => sheet.cgpa));
+      const totalSheets = data.summary.count;
+      const avgCgpa = data.summary.avg_cgpa;
+      const bestCgpa = data.summary.best_cgpa;
 
       // Animate stats update
       animateValue('statTotalSheets', 0, totalSheets, 1000);
@@ -348,162 +401,200 @@ document.addEventListener('DOMContentLoaded', () => {
         updateCgpaIndicator('bestCgpaIndicator', 'bestCgpaStatus', bestCgpa);
       }, 500);
 
-      data.sheets.forEach((sheet, index) => {
-        const card = document.createElement("div");
-        card.className = "col-12 col-md-6 col-lg-4";
-        const cgpaPercent = Math.min((sheet.cgpa / 5) * 100, 100);
-        const cgpaClass = getCgpaClass(sheet.cgpa);
-        
-        card.innerHTML = `
-          <div class="card h-100 border-0 rounded-4 shadow-sm hover-lift" data-aos="fade-up" data-aos-delay="${index * 100}">
-            <div class="card-body p-3 p-md-4">
-              <div class="d-flex justify-content-between align-items-start mb-3">
-                <div class="flex-grow-1 me-2">
-                  <h5 class="fw-bold mb-1">
-                    <i class="bi bi-person-badge me-2 text-primary"></i>
-                    <span class="d-inline d-md-none">${sheet.student_name.split(' ')[0]}</span>
-                    <span class="d-none d-md-inline">${sheet.student_name}</span>
-                  </h5>
-                  <p class="text-muted small mb-0">${sheet.university || "University not specified"}</p>
-                  <div class="d-flex flex-wrap gap-1 mt-2">
-                    <span class="badge bg-light text-dark border">
-                      <i class="bi bi-building me-1"></i>
-                      ${sheet.faculty || "Faculty not specified"}
-                    </span>
-                    <span class="badge bg-light text-dark border">
-                      <i class="bi bi-diagram-3 me-1"></i>
-                      ${sheet.department || "Department not specified"}
-                    </span>
-                  </div>
-                </div>
-                <span class="badge ${sheet.mode === "zeros" ? "bg-info" : "bg-success"} rounded-pill">
-                  <span class="d-none d-sm-inline">${sheet.mode === "zeros" ? "Build-up" : "Available"}</span>
-                  <span class="d-sm-none">${sheet.mode === "zeros" ? "Build" : "Avail"}</span>
-                </span>
-              </div>
+      appendSheetCards(container, data.sheets, data.next_cursor);
 
-              <div class="mb-3">
-                <div class="d-flex flex-wrap gap-1">
-                  <span class="badge bg-light text-dark border">
-                    <i class="bi bi-calendar3 me-1"></i>
-                    <span class="d-none d-sm-inline">${sheet.years_of_study} years</span>
-                    <span class="d-sm-none">${sheet.years_of_study}y</span>
-                  </span>
+    } catch (error) {
+      document.getElementById("sheetsList").innerHTML = `
+        <div class="col-12">
+          <div class="card border-0 rounded-4 shadow-sm text-center p-4 p-md-5">
+            <i class="bi bi-exclamation-triangle" style="font-size: 3rem; color: var(--warning);"></i>
+            <h5 class="mt-3 text-muted">Error loading sheets</h5>
+            <p class="text-muted mb-4">Please check your connection and try again.</p>
+            <button class="btn btn-primary" onclick="loadSheets()">
+              <i class="bi bi-arrow-clockwise me-1"></i> Retry
+            </button>
+          </div>
+        </div>
+      `;
+    }
+  }
+
+  // Cards for one page of list-sheets, then a "Load more" button while pages remain
+  function appendSheetCards(container, sheets, nextCursor) {
+    sheets.forEach((sheet, index) => {
+      const card = document.createElement("div");
+      card.className = "col-12 col-md-6 col-lg-4";
+      const cgpaPercent = Math.min((sheet.cgpa / 5) * 100, 100);
+      const cgpaClass = getCgpaClass(sheet.cgpa);
+      
+      card.innerHTML = `
+        <div class="card h-100 border-0 rounded-4 shadow-sm hover-lift" data-aos="fade-up" data-aos-delay="${index * 100}">
+          <div class="card-body p-3 p-md-4">
+            <div class="d-flex justify-content-between align-items-start mb-3">
+              <div class="flex-grow-1 me-2">
+                <h5 class="fw-bold mb-1">
+                  <i class="bi bi-person-badge me-2 text-primary"></i>
+                  <span class="d-inline d-md-none">${sheet.student_name.split(' ')[0]}</span>
+                  <span class="d-none d-md-inline">${sheet.student_name}</span>
+                </h5>
+                <p class="text-muted small mb-0">${sheet.university || "University not specified"}</p>
+                <div class="d-flex flex-wrap gap-1 mt-2">
                   <span class="badge bg-light text-dark border">
-                    <i class="bi bi-book me-1"></i>
-                    <span class="d-none d-sm-inline">${sheet.semesters_per_year} sem/yr</span>
-                    <span class="d-sm-none">${sheet.semesters_per_year}s/y</span>
+                    <i class="bi bi-building me-1"></i>
+                    ${sheet.faculty || "Faculty not specified"}
                   </span>
                   <span class="badge bg-light text-dark border">
-                    <i class="bi bi-mortarboard me-1"></i>${sheet.entry_year}
+                    <i class="bi bi-diagram-3 me-1"></i>
+                    ${sheet.department || "Department not specified"}
                   </span>
                 </div>
               </div>
+              <span class="badge ${sheet.mode === "zeros" ? "bg-info" : "bg-success"} rounded-pill">
+                <span class="d-none d-sm-inline">${sheet.mode === "zeros" ? "Build-up" : "Available"}</span>
+                <span class="d-sm-none">${sheet.mode === "zeros" ? "Build" : "Avail"}</span>
+              </span>
+            </div>
 
-              <div class="mb-3">
-                <div class="d-flex justify-content-between align-items-center mb-2">
-                  <span class="fw-semibold">CGPA</span>
-                  <div class="d-flex align-items-center gap-2">
-                    <span class="fw-bold fs-5 ${sheet.cgpa >= 4.5 ? "text-success" : sheet.cgpa >= 3.5 ? "text-primary" : sheet.cgpa >= 2.5 ? "text-warning" : "text-danger"}">
-                      ${sheet.cgpa.toFixed(2)}
-                    </span>
-                    <span class="cgpa-indicator ${cgpaClass} d-none d-sm-inline-flex" style="font-size: 0.75rem; padding: 0.125rem 0.5rem;">
-                      ${getCgpaStatus(sheet.cgpa)}
-                    </span>
-                  </div>
-                </div>
-                <div class="progress-enhanced">
-                  <div class="progress-bar ${sheet.cgpa >= 4.5 ? "bg-success" : sheet.cgpa >= 3.5 ? "bg-primary" : sheet.cgpa >= 2.5 ? "bg-warning" : "bg-danger"}"
-                       role="progressbar" style="width: ${cgpaPercent}%" aria-valuenow="${sheet.cgpa}" aria-valuemin="0" aria-valuemax="5"></div>
-                </div>
-                <div class="d-flex justify-content-between mt-1">
-                  <small class="text-muted">0.0</small>
-                  <small class="text-muted">5.0</small>
-                </div>
+            <div class="mb-3">
+              <div class="d-flex flex-wrap gap-1">
+                <span class="badge bg-light text-dark border">
+                  <i class="bi bi-calendar3 me-1"></i>
+                  <span class="d-none d-sm-inline">${sheet.years_of_study} years</span>
+                  <span class="d-sm-none">${sheet.years_of_study}y</span>
+                </span>
+                <span class="badge bg-light text-dark border">
+                  <i class="bi bi-book me-1"></i>
+                  <span class="d-none d-sm-inline">${sheet.semesters_per_year} sem/yr</span>
+                  <span class="d-sm-none">${sheet.semesters_per_year}s/y</span>
+                </span>
+                <span class="badge bg-light text-dark border">
+                  <i class="bi bi-mortarboard me-1"></i>${sheet.entry_year}
+                </span>
               </div>
+            </div>
 
-              <div class="d-flex gap-1 gap-md-2">
-                <button class="btn btn-outline-primary btn-sm flex-fill viewSheetBtn" data-id="${sheet.id}">
-                  <i class="bi bi-eye me-1"></i> 
-                  <span class="d-none d-sm-inline">View</span>
-                </button>
-                <button class="btn btn-outline-secondary btn-sm editSheetBtn" data-id="${sheet.id}" title="Edit Sheet">
-                  <i class="bi bi-pencil"></i>
-                </button>
-                <button class="btn btn-outline-danger btn-sm deleteSheetBtn" data-id="${sheet.id}" title="Delete Sheet">
-                  <i class="bi bi-trash"></i>
-                </button>
+            <div class="mb-3">
+              <div class="d-flex justify-content-between align-items-center mb-2">
+                <span class="fw-semibold">CGPA</span>
+                <div class="d-flex align-items-center gap-2">
+                  <span class="fw-bold fs-5 ${sheet.cgpa >= 4.5 ? "text-success" : sheet.cgpa >= 3.5 ? "text-primary" : sheet.cgpa >= 2.5 ? "text-warning" : "text-danger"}">
+                    ${sheet.cgpa.toFixed(2)}
+                  </span>
+                  <span class="cgpa-indicator ${cgpaClass} d-none d-sm-inline-flex" style="font-size: 0.75rem; padding: 0.125rem 0.5rem;">
+                    ${getCgpaStatus(sheet.cgpa)}
+                  </span>
+                </div>
+              </div>
+              <div class="progress-enhanced">
+                <div class="progress-bar ${sheet.cgpa >= 4.5 ? "bg-success" : sheet.cgpa >= 3.5 ? "bg-primary" : sheet.cgpa >= 2.5 ? "bg-warning" : "bg-danger"}"
+                     role="progressbar" style="width: ${cgpaPercent}%" aria-valuenow="${sheet.cgpa}" aria-valuemin="0" aria-valuemax="5"></div>
               </div>
+              <div class="d-flex justify-content-between mt-1">
+                <small class="text-muted">0.0</small>
+                <small class="text-muted">5.0</small>
+              </div>
+            </div>
+
+            <div class="d-flex gap-1 gap-md-2">
+              <button class="btn btn-outline-primary btn-sm flex-fill viewSheetBtn" data-id="${sheet.id}">
+                <i class="bi bi-eye me-1"></i> 
+                <span class="d-none d-sm-inline">View</span>
+              </button>
+              <button class="btn btn-outline-secondary btn-sm editSheetBtn" data-id="${sheet.id}" title="Edit Sheet">
+                <i class="bi bi-pencil"></i>
+              </button>
+              <button class="btn btn-outline-danger btn-sm deleteSheetBtn" data-id="${sheet.id}" title="Delete Sheet">
+                <i class="bi bi-trash"></i>
+              </button>
             </div>
           </div>
-        `;
-        container.appendChild(card);
-      });
+        </div>
+      `;
+      container.appendChild(card);
+      attachSheetCardHandlers(card);
+    });
 
-      // DELETE
-      document.querySelectorAll(".deleteSheetBtn").forEach(btn => {
-        btn.addEventListener("click", async () => {
-          if (!confirm("Are you sure you want to delete this sheet?")) return;
-          
-          const originalContent = btn.innerHTML;
-          btn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span>';
-          btn.disabled = true;
-          
-          try {
-            const id = btn.dataset.id;
-            const res = await fetch(`/api/delete-sheet/${id}/?uid=${window.currentUserUid}`, { method: "DELETE" });
-            const data = await res.json();
-            
-            if (data.status === "ok") {
-              showToast("Sheet deleted successfully!", "success");
-              loadSheets();
-            } else {
-              showToast("Error deleting: " + data.error, "danger");
-            }
-          } catch (error) {
-            showToast("Network error. Please try again.", "danger");
-          } finally {
-            btn.innerHTML = originalContent;
-            btn.disabled = false;
-          }
-        });
-      });
+    if (nextCursor) {
+      const more = document.createElement("div");
+      more.className = "col-12 text-center";
+      more.innerHTML = `
+        <button class="btn btn-outline-primary">
+          <i class="bi bi-arrow-down-circle me-1"></i> Load more
+        </button>
+      `;
+      container.appendChild(more);
+      more.querySelector("button").addEventListener("click", () => loadMoreSheets(container, more, nextCursor));
+    }
+  }
 
-      // VIEW
-      document.querySelectorAll(".viewSheetBtn").forEach(btn => {
-        btn.addEventListener("click", async () => {
-          const originalContent = btn.innerHTML;
-          btn.innerHTML = '<span class="spinner-border spinner-border-sm me-1" role="status" aria-hidden="true"></span>Loading...';
-          btn.disabled = true;
+  async function loadMoreSheets(container, more, cursor) {
+    const btn = more.querySelector("button");
+    const originalContent = btn.innerHTML;
+    btn.innerHTML = '<span class="spinner-border spinner-border-sm me-1" role="status" aria-hidden="true"></span>Loading...';
+    btn.disabled = true;
+
+    try {
+      const page = await (await fetch(`/api/list-sheets/?cursor=${encodeURIComponent(cursor)}`)).json();
+      more.remove();
+      appendSheetCards(container, page.sheets || [], page.next_cursor);
+    } catch (error) {
+      showToast("Error loading more sheets.", "danger");
+      btn.innerHTML = originalContent;
+      btn.disabled = false;
+    }
+  }
+
+  function attachSheetCardHandlers(root) {
+    // DELETE
+    root.querySelectorAll(".deleteSheetBtn").forEach(btn => {
+      btn.addEventListener("click", async () => {
+        if (!confirm("Are you sure you want to delete this sheet?")) return;
+        
+        const originalContent = btn.innerHTML;
+        btn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span>';
+        btn.disabled = true;
+        
+        try {
+          const id = btn.dataset.id;
+          const res = await fetch(`/api/delete-sheet/${id}/`, { method: "DELETE" });
+          const data = await res.json();
           
-          try {
-            const id = btn.dataset.id;
-            const res = await fetch(`/api/sheet/${id}/`);
-            const data = await res.json();
-            renderSheetDetail(data);
-          } catch (error) {
-            showToast("Error loading sheet details.", "danger");
-          } finally {
-            btn.innerHTML = originalContent;
-            btn.disabled = false;
+          if (data.status === "ok") {
+            showToast("Sheet deleted successfully!", "success");
+            loadSheets();
+          } else {
+            showToast("Error deleting: " + data.error, "danger");
           }
-        });
+        } catch (error) {
+          showToast("Network error. Please try again.", "danger");
+        } finally {
+          btn.innerHTML = originalContent;
+          btn.disabled = false;
+        }
       });
+    });
 
-    } catch (error) {
-      document.getElementById("sheetsList").innerHTML = `
-        <div class="col-12">
-          <div class="card border-0 rounded-4 shadow-sm text-center p-4 p-md-5">
-            <i class="bi bi-exclamation-triangle" style="font-size: 3rem; color: var(--warning);"></i>
-            <h5 class="mt-3 text-muted">Error loading sheets</h5>
-            <p class="text-muted mb-4">Please check your connection and try again.</p>
-            <button class="btn btn-primary" onclick="loadSheets()">
-              <i class="bi bi-arrow-clockwise me-1"></i> Retry
-            </button>
-          </div>
-        </div>
-      `;
-    }
+    // VIEW
+    root.querySelectorAll(".viewSheetBtn").forEach(btn => {
+      btn.addEventListener("click", async () => {
+        const originalContent = btn.innerHTML;
+        btn.innerHTML = '<span class="spinner-border spinner-border-sm me-1" role="status" aria-hidden="true"></span>Loading...';
+        btn.disabled = true;
+        
+        try {
+          const id = btn.dataset.id;
+          const res = await fetch(`/api/sheet/${id}/`);
+          rememberEtag(res);
+          const data = await res.json();
+          renderSheetDetail(data);
+        } catch (error) {
+          showToast("Error loading sheet details.", "danger");
+        } finally {
+          btn.innerHTML = originalContent;
+          btn.disabled = false;
+        }
+      });
+    });
   }
 
   // ----------------- ANIMATION HELPERS -----------------
@@ -532,6 +623,7 @@ document.addEventListener('DOMContentLoaded', () => {
   }
 
   function renderSheetDetail(sheet) {
+    openSheetId = sheet.id;
     const container = document.getElementById("sheetsList");
     
     container.innerHTML = `
@@ -552,7 +644,7 @@ document.addEventListener('DOMContentLoaded', () => {
               <div class="text-start text-md-end">
                 <div class="d-flex align-items-center gap-2 mb-2">
                   <span class="text-muted">Overall CGPA:</span>
-                  <span class="badge fs-6 px-3 py-2 ${sheet.cgpa >= 4.5 ? "bg-success" : sheet.cgpa >= 3.5 ? "bg-primary" : sheet.cgpa >= 2.5 ? "bg-warning" : "bg-danger"}">
+                  <span class="badge fs-6 px-3 py-2 ${sheet.cgpa >= 4.5 ? "bg-success" : sheet.cgpa >= 3.5 ? "bg-primary" : sheet.cgpa >= 2.5 ? "bg-warning" : "bg-danger"}" data-sheet-cgpa="${sheet.id}">
                     ${sheet.cgpa.toFixed(2)}
                   </span>
                 </div>
@@ -577,7 +669,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 <i class="bi bi-calendar-check me-2 text-primary"></i>
                 ${y.year_label}
               </h5>
-              <span class="badge fs-6 px-3 py-2 ${y.year_gpa >= 4.5 ? "bg-success" : y.year_gpa >= 3.5 ? "bg-primary" : y.year_gpa >= 2.5 ? "bg-warning" : "bg-danger"}">
+              <span class="badge fs-6 px-3 py-2 ${y.year_gpa >= 4.5 ? "bg-success" : y.year_gpa >= 3.5 ? "bg-primary" : y.year_gpa >= 2.5 ? "bg-warning" : "bg-danger"}" data-year-gpa="${y.id}">
                 GPA: ${y.year_gpa.toFixed(2)}
               </span>
             </div>
@@ -593,40 +685,18 @@ document.addEventListener('DOMContentLoaded', () => {
                           <i class="bi bi-book-half me-2"></i>
                           ${s.label}
                         </h6>
-                        <span class="badge ${s.gpa >= 4.5 ? "bg-success" : s.gpa >= 3.5 ? "bg-primary" : s.gpa >= 2.5 ? "bg-warning" : s.gpa >= 1.5 ? "bg-secondary" : "bg-danger"}">
+                        <span class="badge ${s.gpa >= 4.5 ? "bg-success" : s.gpa >= 3.5 ? "bg-primary" : s.gpa >= 2.5 ? "bg-warning" : s.gpa >= 1.5 ? "bg-secondary" : "bg-danger"}" data-semester-gpa="${s.id}">
                           ${s.gpa.toFixed(2)}
                         </span>
                       </div>
                       
                       <div class="progress mb-3" style="height: 6px;">
                         <div class="progress-bar ${s.gpa >= 4.5 ? "bg-success" : s.gpa >= 3.5 ? "bg-primary" : s.gpa >= 2.5 ? "bg-warning" : s.gpa >= 1.5 ? "bg-secondary" : "bg-danger"}"
-                             role="progressbar" style="width: ${(s.gpa/5)*100}%" aria-valuenow="${s.gpa}" aria-valuemin="0" aria-valuemax="5"></div>
+                             role="progressbar" style="width: ${(s.gpa/5)*100}%" aria-valuenow="${s.gpa}" aria-valuemin="0" aria-valuemax="5" data-semester-progress="${s.id}"></div>
                       </div>
 
-                      <div class="courses-list mb-3" style="max-height: 200px; overflow-y: auto;">
-                        ${s.courses.map(c => `
-                          <div class="d-flex justify-content-between align-items-start py-2 border-bottom">
-                            <div class="flex-grow-1 me-2">
-                              <div class="fw-semibold">${c.code}</div>
-                              <div class="small text-muted">${c.title}</div>
-                              <div class="small">
-                                <span class="badge bg-light text-dark">${c.credit_unit}u</span>
-                              </div>
-                            </div>
-                            <div class="text-end">
-                              <span class="badge ${c.grade === "A" ? "bg-success" : c.grade === "B" ? "bg-primary" : c.grade === "C" ? "bg-info" : c.grade === "D" ? "bg-warning" : c.grade === "E" ? "bg-secondary" : "bg-danger"}">
-                                ${c.grade}
-                              </span>
-                              <div class="small text-muted">${c.score}</div>
-                              <button class="btn btn-sm btn-outline-secondary ms-1 editCourseBtn" data-id="${c.id}" title="Edit Course">
-                                <i class="bi bi-pencil"></i>
-                              </button>
-                              <button class="btn btn-sm btn-outline-danger ms-1 deleteCourseBtn" data-id="${c.id}" title="Delete Course">
-                                <i class="bi bi-trash"></i>
-                              </button>
-                            </div>
-                          </div>
-                        `).join("")}
+                      <div class="courses-list mb-3" style="max-height: 200px; overflow-y: auto;" data-semester-courses="${s.id}">
+                        ${s.courses.map(courseRowHtml).join("")}
                       </div>
 
                       <button class="btn btn-sm btn-success w-100 addCourseBtn" data-id="${s.id}" data-label="${s.label}">
@@ -670,8 +740,95 @@ document.addEventListener('DOMContentLoaded', () => {
       }
     });
 
-        // DELETE COURSE
-    document.querySelectorAll('.deleteCourseBtn').forEach(btn => {
+    attachCourseRowHandlers(document);
+  }
+
+  function courseRowHtml(c) {
+    return `
+      <div class="d-flex justify-content-between align-items-start py-2 border-bottom" data-course-row="${c.id}">
+        <div class="flex-grow-1 me-2">
+          <div class="fw-semibold">${c.code}</div>
+          <div class="small text-muted">${c.title}</div>
+          <div class="small">
+            <span class="badge bg-light text-dark">${c.credit_unit}u</span>
+          </div>
+        </div>
+        <div class="text-end">
+          <span class="badge ${c.grade === "A" ? "bg-success" : c.grade === "B" ? "bg-primary" : c.grade === "C" ? "bg-info" : c.grade === "D" ? "bg-warning" : c.grade === "E" ? "bg-secondary" : "bg-danger"}">
+            ${c.grade}
+          </span>
+          <div class="small text-muted">${c.score}</div>
+          <button class="btn btn-sm btn-outline-secondary ms-1 editCourseBtn" data-id="${c.id}" title="Edit Course">
+            <i class="bi bi-pencil"></i>
+          </button>
+          <button class="btn btn-sm btn-outline-danger ms-1 deleteCourseBtn" data-id="${c.id}" title="Delete Course">
+            <i class="bi bi-trash"></i>
+          </button>
+        </div>
+      </div>
+    `;
+  }
+
+  function attachCourseRowHandlers(root) {
+    attachDeleteCourseHandlers(root);
+    attachEditCourseHandlers(root);
+  }
+
+  // ----------------- IN-PLACE UPDATES -----------------
+  // Course endpoints answer with the changed course and the new semester,
+  // year and sheet rollups, so the open sheet is patched, not refetched.
+  const GPA_CLASSES = ["bg-success", "bg-primary", "bg-warning", "bg-secondary", "bg-danger"];
+
+  function setGpaClass(el, gpa, withSecondary = false) {
+    el.classList.remove(...GPA_CLASSES);
+    el.classList.add(gpa >= 4.5 ? "bg-success" : gpa >= 3.5 ? "bg-primary" : gpa >= 2.5 ? "bg-warning" : (withSecondary && gpa >= 1.5) ? "bg-secondary" : "bg-danger");
+  }
+
+  function applyRollups(data) {
+    const sheetBadge = document.querySelector(`[data-sheet-cgpa="${data.sheet.id}"]`);
+    if (!sheetBadge) return false;
+    setGpaClass(sheetBadge, data.sheet.gpa);
+    sheetBadge.textContent = data.sheet.gpa.toFixed(2);
+
+    const yearBadge = document.querySelector(`[data-year-gpa="${data.year.id}"]`);
+    setGpaClass(yearBadge, data.year.gpa);
+    yearBadge.textContent = `GPA: ${data.year.gpa.toFixed(2)}`;
+
+    const sem = data.semester;
+    const semBadge = document.querySelector(`[data-semester-gpa="${sem.id}"]`);
+    setGpaClass(semBadge, sem.gpa, true);
+    semBadge.textContent = sem.gpa.toFixed(2);
+    const bar = document.querySelector(`[data-semester-progress="${sem.id}"]`);
+    setGpaClass(bar, sem.gpa, true);
+    bar.style.width = `${(sem.gpa / 5) * 100}%`;
+    bar.setAttribute("aria-valuenow", sem.gpa);
+    return true;
+  }
+
+  // Patch the open sheet after a course add/update/delete; false when the
+  // sheet is not on screen and the caller should reload instead.
+  function applyCourseChange(data) {
+    if (!applyRollups(data)) return false;
+    if (data.deleted) {
+      document.querySelector(`[data-course-row="${data.deleted}"]`)?.remove();
+      return true;
+    }
+    const tpl = document.createElement("template");
+    tpl.innerHTML = courseRowHtml(data.course).trim();
+    const row = tpl.content.firstElementChild;
+    const current = document.querySelector(`[data-course-row="${data.course.id}"]`);
+    if (current) {
+      current.replaceWith(row);
+    } else {
+      document.querySelector(`[data-semester-courses="${data.semester.id}"]`).appendChild(row);
+    }
+    attachCourseRowHandlers(row);
+    return true;
+  }
+
+  // ----------------- DELETE COURSE -----------------
+  function attachDeleteCourseHandlers(root) {
+    root.querySelectorAll('.deleteCourseBtn').forEach(btn => {
       btn.addEventListener('click', async () => {
         if (!confirm('Are you sure you want to delete this course?')) return;
         const originalContent = btn.innerHTML;
@@ -679,11 +836,12 @@ document.addEventListener('DOMContentLoaded', () => {
         btn.disabled = true;
         try {
           const id = btn.dataset.id;
-          const res = await fetch(`/api/delete-course/${id}/?uid=${window.currentUserUid}`, { method: 'DELETE' });
+          const res = await fetch(`/api/delete-course/${id}/`, { method: 'DELETE', headers: ifMatch() });
+          rememberEtag(res);
           const data = await res.json();
           if (data.status === 'ok') {
             showToast('Course deleted successfully!', 'success');
-            loadSheets();
+            if (!applyCourseChange(data)) loadSheets();
           } else {
             showToast('Error deleting course: ' + data.error, 'danger');
           }
@@ -695,13 +853,11 @@ document.addEventListener('DOMContentLoaded', () => {
         }
       });
     });
-
-    attachEditCourseHandlers();
   }
 
   // ----------------- EDIT COURSE -----------------
-  function attachEditCourseHandlers() {
-    document.querySelectorAll(".editCourseBtn").forEach(btn => {
+  function attachEditCourseHandlers(root) {
+    root.querySelectorAll(".editCourseBtn").forEach(btn => {
       btn.addEventListener("click", async () => {
         const originalContent = btn.innerHTML;
         btn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span>';
@@ -748,15 +904,16 @@ document.addEventListener('DOMContentLoaded', () => {
 
       const res = await fetch(`/api/update-course/${id}/`, {
         method: "PUT",
-        headers: { "Content-Type": "application/json" },
+        headers: ifMatch({ "Content-Type": "application/json" }),
         body: JSON.stringify(payload)
       });
+      rememberEtag(res);
       const data = await res.json();
 
       if (data.status === "ok") {
         bootstrap.Modal.getInstance(document.getElementById("editCourseModal")).hide();
         showToast("Course updated successfully!", "success");
-        loadSheets();
+        if (!applyCourseChange(data)) loadSheets();
       } else {
         showToast("Error updating course: " + data.error, "danger");
       }
@@ -778,6 +935,7 @@ document.addEventListener('DOMContentLoaded', () => {
       try {
         const id = btn.dataset.id;
         const res = await fetch(`/api/sheet/${id}/`);
+        rememberEtag(res);
         const sheet = await res.json();
 
         document.getElementById("editSheetId").value = sheet.id;
@@ -806,14 +964,13 @@ document.addEventListener('DOMContentLoaded', () => {
       const payload = Object.fromEntries(new FormData(e.target).entries());
       const id = payload.sheet_id;
       delete payload.sheet_id;
-      // Ensure UID is sent in update payload
-      payload.uid = window.currentUserUid;
 
       const res = await fetch(`/api/update-sheet/${id}/`, {
         method: "PUT",
-        headers: { "Content-Type": "application/json" },
+        headers: ifMatch({ "Content-Type": "application/json" }),
         body: JSON.stringify(payload)
       });
+      rememberEtag(res);
       const data = await res.json();
 
       if (data.status === "ok") {
@@ -839,15 +996,16 @@ document.addEventListener('DOMContentLoaded', () => {
       const payload = Object.fromEntries(new FormData(e.target).entries());
       const res = await fetch('/api/add-course/', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: ifMatch({ 'Content-Type': 'application/json' }),
         body: JSON.stringify(payload)
       });
+      rememberEtag(res);
       const data = await res.json();
       
       if (data.status === 'ok') {
         showToast("Course added successfully!", "success");
         e.target.reset();
-        loadSheets();
+        if (!applyCourseChange(data)) loadSheets();
       } else {
         showToast("Error adding course: " + data.error, "danger");
       }